@@ -1,46 +1,64 @@
 """
 Mangaba.AI - Framework para desenvolvimento de agentes autônomos
 """
-import os
-import sys
+import importlib
+import importlib.util
 import logging
-from typing import Optional
+from typing import Any, List
 
-# Configuração de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Bibliotecas não configuram o logging da aplicação: sem handlers definidos
+# pela aplicação, as mensagens do Mangaba.AI são descartadas silenciosamente
+logging.getLogger(__name__).addHandler(logging.NullHandler())
 logger = logging.getLogger(__name__)
 
-# Verifica e instala dependências necessárias
-def check_dependencies():
-    """Verifica e instala dependências necessárias."""
-    try:
-        import google.generativeai
-        import dotenv
-        import aiohttp
-    except ImportError as e:
-        logger.warning(f"Dependência não encontrada: {e}")
-        try:
-            import pip
-            pip.main(['install', 'google-generativeai', 'python-dotenv', 'aiohttp'])
-        except Exception as e:
-            logger.error(f"Erro ao instalar dependências: {e}")
-            raise
-
-# Importa as classes principais
-from mangaba_ai.core.models import (
-    Agent,
-    Task,
-    GeminiModel
-)
-
-from mangaba_ai.main import MangabaAI
+# Dependências opcionais verificadas por ``check_dependencies`` (módulo -> pacote)
+DEPENDENCIES = {
+    "aiohttp": "aiohttp",
+    "dotenv": "python-dotenv",
+    "jsonschema": "jsonschema",
+    "numpy": "numpy",
+}
+
+def check_dependencies() -> List[str]:
+    """Verifica as dependências necessárias sem importá-las.
+
+    Retorna os pacotes ausentes e registra um aviso com o comando de
+    instalação; nada é instalado automaticamente.
+    """
+    missing = [package for module, package in DEPENDENCIES.items()
+               if importlib.util.find_spec(module) is None]
+    if missing:
+        logger.warning(f"Dependências não encontradas: {', '.join(missing)}. "
+                       f"Instale com: pip install {' '.join(missing)}")
+    return missing
+
+# As classes principais são carregadas no primeiro acesso, mantendo o
+# ``import mangaba_ai`` rápido e sem efeitos colaterais
+_LAZY_ATTRIBUTES = {
+    "Agent": "mangaba_ai.core.models",
+    "Task": "mangaba_ai.core.models",
+    "GeminiModel": "mangaba_ai.core.models",
+    "LanguageModel": "mangaba_ai.core.models",
+    "ModelBackend": "mangaba_ai.core.backends",
+    "GeminiBackend": "mangaba_ai.core.backends",
+    "SimulatedBackend": "mangaba_ai.core.backends",
+    "MangabaAI": "mangaba_ai.main",
+}
+
+__all__ = ["Agent", "Task", "GeminiModel", "LanguageModel", "ModelBackend", "GeminiBackend",
+           "SimulatedBackend", "MangabaAI", "check_dependencies"]
 
 __version__ = "0.1.0"
 __author__ = "Mangaba.AI Team"
 __email__ = "contact@mangaba.ai"
 
-# Verifica dependências ao importar
-check_dependencies() 
\ No newline at end of file
+def __getattr__(name: str) -> Any:
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
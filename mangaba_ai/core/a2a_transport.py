@@ -0,0 +1,299 @@
+"""
+Transportes do protocolo A2A entre nós do Mangaba.AI.
+"""
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from .protocols import decode_message, encode_message
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[Dict], Awaitable[bool]]
+
+class A2ATransport(ABC):
+    """Interface dos transportes de mensagens entre nós.
+
+    ``start`` recebe a função que entrega localmente as mensagens vindas de
+    outros nós; ``send`` enfileira uma mensagem para o nó no endereço
+    indicado; ``flush`` aguarda a confirmação de tudo o que foi enviado.
+    """
+
+    @abstractmethod
+    async def start(self, deliver: Deliver) -> None:
+        ...
+
+    @abstractmethod
+    async def send(self, address: str, message: Dict) -> None:
+        ...
+
+    @abstractmethod
+    async def flush(self) -> None:
+        ...
+
+    @abstractmethod
+    async def close(self) -> None:
+        ...
+
+class _Deduplicator:
+    """Lembra os identificadores mais recentes para descartar reenvios.
+
+    ``seen`` já marca a mensagem (reenvios simultâneos são descartados); se a
+    entrega falhar, ``forget`` a desmarca para que o reenvio seja aceito.
+    """
+
+    def __init__(self, size: int = 10000):
+        self.size = size
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+
+    def seen(self, message_id: str) -> bool:
+        if message_id in self._seen:
+            return True
+        self._seen[message_id] = None
+        if len(self._seen) > self.size:
+            self._seen.popitem(last=False)
+        return False
+
+    def forget(self, message_id: str) -> None:
+        self._seen.pop(message_id, None)
+
+    async def deliver(self, deliver: Deliver, message: Dict) -> None:
+        """Entrega ``message`` (codificada) se ainda não vista, desmarcando-a em caso de falha."""
+        if self.seen(message["id"]):
+            return
+        try:
+            await deliver(decode_message(message))
+        except BaseException:
+            self.forget(message["id"])
+            raise
+
+class InMemoryTransport(A2ATransport):
+    """Transporte em memória para testes: os "nós" compartilham um ``hub``.
+
+    Mensagens para endereços ainda não registrados ficam retidas e são
+    entregues quando o nó de destino inicia, simulando a reconexão.
+    """
+
+    def __init__(self, address: str, hub: Optional[Dict[str, "InMemoryTransport"]] = None):
+        self.address = address
+        self.hub = hub if hub is not None else {}
+        self._deliver: Optional[Deliver] = None
+        self._outbox: Dict[str, List[Dict]] = {}
+        self._flushing: Optional[asyncio.Task] = None
+        self._dedup = _Deduplicator()
+        self.sent = 0
+        self.acked = 0
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+        self.hub[self.address] = self
+        # Entrega o que outros nós retiveram enquanto este estava ausente
+        for node in list(self.hub.values()):
+            if node is not self and node._outbox.get(self.address):
+                await node.flush()
+
+    async def send(self, address: str, message: Dict) -> None:
+        self._outbox.setdefault(address, []).append(encode_message(message))
+        self.sent += 1
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self) -> None:
+        for address in list(self._outbox):
+            target = self.hub.get(address)
+            if target is None or target._deliver is None:
+                continue
+            batch = self._outbox.pop(address)
+            for position, message in enumerate(batch):
+                try:
+                    await target._dedup.deliver(target._deliver, message)
+                except BaseException:
+                    # O restante do lote volta à fila, como um lote não confirmado
+                    self.acked += position
+                    self._outbox[address] = batch[position:] + self._outbox.get(address, [])
+                    raise
+            self.acked += len(batch)
+
+    async def close(self) -> None:
+        if self._flushing is not None:
+            await self._flushing
+        if self.hub.get(self.address) is self:
+            del self.hub[self.address]
+        self._deliver = None
+
+def parse_address(address: str) -> Tuple[str, str, Optional[int]]:
+    """Interpreta ``tcp://host:porta`` ou ``unix:///caminho``."""
+    if address.startswith("unix://"):
+        return "unix", address[len("unix://"):], None
+    if address.startswith("tcp://"):
+        host, _, port = address[len("tcp://"):].rpartition(":")
+        return "tcp", host, int(port)
+    raise ValueError(f"Endereço A2A inválido: {address}")
+
+class _Peer:
+    """Conexão de saída para um nó, com envio em lotes e confirmação."""
+
+    def __init__(self, transport: "SocketTransport", address: str):
+        self.transport = transport
+        self.address = address
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=transport.max_pending)
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.frame_id = 0
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def _connect(self) -> None:
+        kind, host, port = parse_address(self.address)
+        if kind == "unix":
+            self.reader, self.writer = await asyncio.open_unix_connection(host)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(host, port)
+
+    def _disconnect(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def _next_batch(self) -> List[Dict]:
+        """Aguarda uma mensagem e agrupa as que chegarem até ``flush_interval``."""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.transport.flush_interval
+        while len(batch) < self.transport.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _send_batch(self, batch: List[Dict]) -> None:
+        if self.writer is None:
+            await self._connect()
+        self.frame_id += 1
+        frame = {"id": self.frame_id, "messages": batch}
+        self.writer.write(json.dumps(frame, ensure_ascii=False).encode("utf-8") + b"\n")
+        await self.writer.drain()
+        line = await asyncio.wait_for(self.reader.readline(), self.transport.ack_timeout)
+        if not line:
+            raise ConnectionError("Conexão encerrada antes da confirmação")
+        if json.loads(line).get("ack") != self.frame_id:
+            raise ConnectionError("Confirmação inesperada")
+
+    async def run(self) -> None:
+        delay = self.transport.reconnect_delay
+        while True:
+            batch = await self._next_batch()
+            # Reenvia o mesmo lote até ser confirmado (entrega "ao menos uma vez";
+            # o receptor descarta duplicatas pelo identificador da mensagem)
+            while True:
+                try:
+                    await self._send_batch(batch)
+                    break
+                except (OSError, ConnectionError, asyncio.TimeoutError, ValueError) as e:
+                    self._disconnect()
+                    self.transport.reconnects += 1
+                    logger.warning(f"Falha ao enviar para {self.address} ({e}); reconectando em {delay:.2f}s")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.transport.max_reconnect_delay)
+            delay = self.transport.reconnect_delay
+            self.transport._acknowledge(len(batch))
+
+    async def close(self) -> None:
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self._disconnect()
+
+class SocketTransport(A2ATransport):
+    """Transporte por TCP ou socket Unix entre nós.
+
+    As mensagens de cada destino são agrupadas em lotes (até ``batch_size``
+    mensagens ou ``flush_interval`` segundos) e enviadas como uma linha JSON.
+    Cada lote é confirmado pelo receptor; sem confirmação em ``ack_timeout``
+    a conexão é refeita, com espera exponencial, e o lote reenviado.
+    """
+
+    def __init__(self, address: str, batch_size: int = 64, flush_interval: float = 0.005,
+                 ack_timeout: float = 5.0, reconnect_delay: float = 0.05,
+                 max_reconnect_delay: float = 5.0, max_pending: int = 10000):
+        self.address = address
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.ack_timeout = ack_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.max_pending = max_pending
+        self.reconnects = 0
+        self.sent = 0
+        self.acked = 0
+        self._deliver: Optional[Deliver] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+        self._peers: Dict[str, _Peer] = {}
+        self._dedup = _Deduplicator()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+        kind, host, port = parse_address(self.address)
+        if kind == "unix":
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=host)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                frame = json.loads(line)
+                for message in frame["messages"]:
+                    # Falha na entrega: o lote não é confirmado e o remetente o reenvia
+                    await self._dedup.deliver(self._deliver, message)
+                writer.write(json.dumps({"ack": frame["id"]}).encode("utf-8") + b"\n")
+                await writer.drain()
+        except Exception as e:
+            logger.warning(f"Conexão A2A encerrada com erro: {e}")
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def send(self, address: str, message: Dict) -> None:
+        peer = self._peers.get(address)
+        if peer is None:
+            peer = self._peers[address] = _Peer(self, address)
+        self.sent += 1
+        self._idle.clear()
+        await peer.queue.put(encode_message(message))
+
+    def _acknowledge(self, count: int) -> None:
+        self.acked += count
+        if self.acked >= self.sent:
+            self._idle.set()
+
+    async def flush(self) -> None:
+        await self._idle.wait()
+
+    async def close(self) -> None:
+        for peer in self._peers.values():
+            await peer.close()
+        self._peers.clear()
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._connections):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
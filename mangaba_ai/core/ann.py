@@ -0,0 +1,267 @@
+"""
+Índice aproximado de vizinhos mais próximos (IVF) para a memória vetorial.
+
+``IVFIndex`` agrupa os vetores em ``n_lists`` listas invertidas, cada uma
+associada a um centróide obtido por k-means esférico. Uma busca compara a
+consulta apenas com os vetores das ``nprobe`` listas de centróides mais
+próximos: aumentar ``nprobe`` melhora a revocação (recall) e aumenta a
+latência; com ``nprobe == n_lists`` a busca é exata.
+
+Os vetores devem estar normalizados (a similaridade é o produto interno, ou
+seja, o cosseno). Requer o pacote opcional ``numpy``.
+"""
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from ..utils.exceptions import ConfigurationError, MemoryError
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dependência opcional
+    np = None
+
+# Pontos de treino por lista; mais que isso pouco melhora os centróides
+TRAINING_POINTS_PER_LIST = 40
+
+# Remoções acumuladas antes de os vetores removidos saírem das listas
+COMPACT_AFTER_REMOVALS = 1024
+
+class _InvertedList:
+    """Vetores e rótulos de uma lista, em arrays contíguos que dobram ao encher."""
+
+    def __init__(self, dim: int, capacity: int = 16):
+        self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.labels = np.empty(capacity, dtype=np.int64)
+        self.size = 0
+
+    def extend(self, vectors: "np.ndarray", labels: "np.ndarray") -> None:
+        end = self.size + len(labels)
+        if end > len(self.labels):
+            capacity = max(end, 2 * len(self.labels))
+            grown_vectors = np.empty((capacity, self.vectors.shape[1]), dtype=np.float32)
+            grown_vectors[:self.size] = self.vectors[:self.size]
+            grown_labels = np.empty(capacity, dtype=np.int64)
+            grown_labels[:self.size] = self.labels[:self.size]
+            self.vectors, self.labels = grown_vectors, grown_labels
+        self.vectors[self.size:end] = vectors
+        self.labels[self.size:end] = labels
+        self.size = end
+
+    def discard(self, removed: "np.ndarray") -> None:
+        """Remove os vetores cujos rótulos estão em ``removed``."""
+        keep = ~np.isin(self.labels[:self.size], removed)
+        kept = int(keep.sum())
+        self.vectors[:kept] = self.vectors[:self.size][keep]
+        self.labels[:kept] = self.labels[:self.size][keep]
+        self.size = kept
+
+def spherical_kmeans(vectors: "np.ndarray", n_clusters: int, iterations: int = 10,
+                     seed: int = 0) -> "np.ndarray":
+    """Centróides normalizados de ``vectors`` por k-means com similaridade de cosseno."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        clusters, starts = np.unique(assignment[order], return_index=True)
+        sums = np.zeros_like(centroids)
+        sums[clusters] = np.add.reduceat(vectors[order], starts, axis=0)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        # Listas vazias recebem pontos aleatórios em vez de ficarem sem uso
+        empty = counts == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.maximum(norms, 1e-12)
+    return centroids.astype(np.float32)
+
+class IVFIndex:
+    """Índice IVF com inserção incremental e persistência em disco.
+
+    Antes do treino (e enquanto houver menos de ``min_train_size`` vetores) o
+    índice faz busca exata; ao atingir esse número, treina os centróides
+    automaticamente com uma amostra dos vetores e os distribui nas listas.
+    ``n_lists`` padrão é ~√n no momento do treino. Remoções marcam o
+    rótulo, filtrado nas buscas, e a cada ``COMPACT_AFTER_REMOVALS`` remoções
+    os vetores marcados saem das listas; rótulos removidos não devem ser
+    reutilizados.
+    """
+
+    def __init__(self, dim: int, n_lists: Optional[int] = None, nprobe: int = 16,
+                 min_train_size: int = 10000, seed: int = 0):
+        if np is None:
+            raise ConfigurationError("IVFIndex requer o pacote numpy. Instale com: pip install numpy")
+        self.dim = dim
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.seed = seed
+        self.centroids: Optional["np.ndarray"] = None
+        self._lists: List[_InvertedList] = []
+        # Vetores ainda não distribuídos em listas (antes do treino)
+        self._pending = _InvertedList(dim)
+        self._removed: set = set()
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def __len__(self) -> int:
+        stored = self._pending.size + sum(inverted.size for inverted in self._lists)
+        return stored - len(self._removed)
+
+    def train(self, vectors: Optional["np.ndarray"] = None) -> None:
+        """Calcula os centróides (com ``vectors`` ou os vetores já inseridos) e redistribui o índice."""
+        stored = self._pending.vectors[:self._pending.size]
+        labels = self._pending.labels[:self._pending.size]
+        sample = stored if vectors is None else np.asarray(vectors, dtype=np.float32)
+        n_lists = self.n_lists or max(1, int(np.sqrt(len(sample))))
+        n_lists = min(n_lists, len(sample))
+        if n_lists < 1:
+            raise MemoryError("Não há vetores para treinar o índice")
+        rng = np.random.default_rng(self.seed)
+        limit = n_lists * TRAINING_POINTS_PER_LIST
+        if len(sample) > limit:
+            sample = sample[rng.choice(len(sample), limit, replace=False)]
+        self.centroids = spherical_kmeans(sample, n_lists, seed=self.seed)
+        self.n_lists = n_lists
+        self._lists = [_InvertedList(self.dim) for _ in range(n_lists)]
+        self._pending = _InvertedList(self.dim)
+        if len(labels):
+            self._assign(stored.copy(), labels.copy())
+
+    def _assign(self, vectors: "np.ndarray", labels: "np.ndarray") -> None:
+        assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        lists, starts = np.unique(assignment[order], return_index=True)
+        for list_id, chunk in zip(lists, np.split(order, starts[1:])):
+            self._lists[list_id].extend(vectors[chunk], labels[chunk])
+
+    def add(self, vectors: "np.ndarray", labels: Sequence[int]) -> None:
+        """Insere vetores normalizados com os seus rótulos inteiros."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        labels = np.asarray(labels, dtype=np.int64)
+        if self.is_trained:
+            self._assign(vectors, labels)
+            return
+        self._pending.extend(vectors, labels)
+        if self._pending.size >= self.min_train_size:
+            self.train()
+
+    def remove(self, labels: Sequence[int]) -> None:
+        """Remove rótulos do índice."""
+        self._removed.update(int(label) for label in labels)
+        if len(self._removed) >= COMPACT_AFTER_REMOVALS:
+            self.compact()
+
+    def compact(self) -> None:
+        """Retira das listas os vetores removidos."""
+        if not self._removed:
+            return
+        removed = np.fromiter(self._removed, dtype=np.int64, count=len(self._removed))
+        for inverted in self._lists + [self._pending]:
+            inverted.discard(removed)
+        self._removed.clear()
+
+    def search(self, queries: "np.ndarray", k: int = 10,
+               nprobe: Optional[int] = None) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Os ``k`` vetores mais similares a cada consulta.
+
+        Retorna ``(scores, labels)``, matrizes (consultas x k) ordenadas da
+        maior para a menor similaridade; posições sem resultado têm rótulo -1.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        # Rótulos removidos ainda ocupam espaço: busca alguns candidatos a mais
+        wanted = k + len(self._removed)
+        if self.is_trained:
+            candidates = self._probe(queries, min(nprobe or self.nprobe, self.n_lists))
+        else:
+            vectors, labels = self._pending.vectors[:self._pending.size], self._pending.labels[:self._pending.size]
+            candidates = [(scores, labels) for scores in queries @ vectors.T]
+
+        removed = np.fromiter(self._removed, dtype=np.int64, count=len(self._removed))
+        result_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        result_labels = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, (scores, labels) in enumerate(candidates):
+            if len(scores) > wanted:
+                top = np.argpartition(-scores, wanted - 1)[:wanted]
+                scores, labels = scores[top], labels[top]
+            order = np.argsort(-scores, kind="stable")
+            if len(removed):
+                order = order[~np.isin(labels[order], removed)]
+            order = order[:k]
+            result_scores[row, :len(order)] = scores[order]
+            result_labels[row, :len(order)] = labels[order]
+        return result_scores, result_labels
+
+    def _probe(self, queries: "np.ndarray", nprobe: int) -> List[Tuple["np.ndarray", "np.ndarray"]]:
+        """Similaridades com os vetores das ``nprobe`` listas mais próximas de cada consulta."""
+        centroid_scores = queries @ self.centroids.T
+        if nprobe < self.n_lists:
+            probes = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            probes = np.broadcast_to(np.arange(self.n_lists), (len(queries), self.n_lists))
+        parts: List[List[Tuple["np.ndarray", "np.ndarray"]]] = [[] for _ in queries]
+        # Agrupa as consultas por lista: um produto de matrizes por lista visitada
+        query_ids = np.repeat(np.arange(len(queries)), probes.shape[1])
+        list_ids = probes.ravel()
+        order = np.argsort(list_ids, kind="stable")
+        lists, starts = np.unique(list_ids[order], return_index=True)
+        for list_id, chunk in zip(lists, np.split(order, starts[1:])):
+            inverted = self._lists[list_id]
+            if not inverted.size:
+                continue
+            rows = query_ids[chunk]
+            scores = queries[rows] @ inverted.vectors[:inverted.size].T
+            labels = inverted.labels[:inverted.size]
+            for query_row, row_scores in zip(rows, scores):
+                parts[query_row].append((row_scores, labels))
+        empty = (np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64))
+        return [
+            (np.concatenate([scores for scores, _ in part]), np.concatenate([labels for _, labels in part]))
+            if part else empty
+            for part in parts
+        ]
+
+    def _arrays(self) -> Dict[str, "np.ndarray"]:
+        """Estado do índice como arrays NumPy (ver ``save``)."""
+        if self.is_trained:
+            sizes = np.array([inverted.size for inverted in self._lists], dtype=np.int64)
+            vectors = np.concatenate([inverted.vectors[:inverted.size] for inverted in self._lists])
+            labels = np.concatenate([inverted.labels[:inverted.size] for inverted in self._lists])
+            centroids = self.centroids
+        else:
+            sizes = np.array([self._pending.size], dtype=np.int64)
+            vectors = self._pending.vectors[:self._pending.size]
+            labels = self._pending.labels[:self._pending.size]
+            centroids = np.empty((0, self.dim), dtype=np.float32)
+        return {
+            "centroids": centroids, "sizes": sizes, "vectors": vectors, "labels": labels,
+            "removed": np.array(sorted(self._removed), dtype=np.int64),
+            "settings": np.array([self.dim, self.n_lists or 0, self.nprobe, self.min_train_size, self.seed],
+                                 dtype=np.int64),
+        }
+
+    @classmethod
+    def _from_arrays(cls, data: Mapping[str, "np.ndarray"]) -> "IVFIndex":
+        dim, n_lists, nprobe, min_train_size, seed = (int(value) for value in data["settings"])
+        index = cls(dim, n_lists or None, nprobe=nprobe, min_train_size=min_train_size, seed=seed)
+        vectors, labels, sizes = data["vectors"], data["labels"], data["sizes"]
+        if len(data["centroids"]):
+            index.centroids = data["centroids"]
+            index._lists = [_InvertedList(dim, max(int(size), 1)) for size in sizes]
+            for inverted, start, size in zip(index._lists, np.cumsum(sizes) - sizes, sizes):
+                inverted.extend(vectors[start:start + size], labels[start:start + size])
+        else:
+            index._pending.extend(vectors, labels)
+        index._removed = set(data["removed"].tolist())
+        return index
+
+    def save(self, path: str) -> None:
+        """Grava o índice em ``path`` (formato ``.npz`` do NumPy)."""
+        with open(path, "wb") as f:
+            np.savez(f, **self._arrays())
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        """Lê um índice gravado com ``save``."""
+        with np.load(path, allow_pickle=False) as data:
+            return cls._from_arrays(data)
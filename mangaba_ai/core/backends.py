@@ -0,0 +1,279 @@
+"""
+Backends de modelos de linguagem do Mangaba.AI.
+"""
+import asyncio
+import hashlib
+import itertools
+import logging
+import random
+import time
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from .tokens import TokenCounter
+from .transport import GeminiTransport
+from ..utils.exceptions import APIError, RateLimitError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GEMINI_MODEL = "gemini-2.5-flash-preview-04-17"
+
+# Tokens de entrada aceitos pelos modelos Gemini 2.5
+GEMINI_CONTEXT_WINDOW = 1_048_576
+
+# Janela usada por backends que não informam a sua
+DEFAULT_CONTEXT_WINDOW = 32_768
+
+# Menor prefixo aceito pelo cache de contexto explícito do Gemini 2.5 Flash
+GEMINI_MIN_CACHED_TOKENS = 1024
+
+class ModelBackend(ABC):
+    """Interface dos backends de modelo.
+
+    Um backend apenas conversa com o modelo: ``generate`` retorna o texto
+    completo, ``stream`` produz fragmentos à medida que chegam e
+    ``count_tokens`` mede um texto com ``token_counter``. ``context_window``
+    é o total de tokens (prompt e resposta) aceito pelo modelo. Contexto,
+    cache e limite de taxa ficam a cargo de ``LanguageModel``.
+
+    Backends com cache de contexto implementam ``create_cached_prefix``: o
+    prefixo é enviado uma vez e as chamadas com ``cached_prefix`` enviam
+    apenas o restante do prompt.
+    """
+
+    model_name: str = ""
+    context_window: int = DEFAULT_CONTEXT_WINDOW
+    token_counter: TokenCounter = TokenCounter()
+    # Prefixos menores que isto não compensam o registro no cache
+    min_cached_prefix_tokens: int = 0
+
+    def __init__(self, context_window: Optional[int] = None,
+                 token_counter: Optional[TokenCounter] = None):
+        if context_window is not None:
+            self.context_window = context_window
+        self.token_counter = token_counter or TokenCounter()
+
+    @abstractmethod
+    async def generate(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                       cached_prefix: Optional[str] = None) -> str:
+        ...
+
+    @abstractmethod
+    def stream(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+               cached_prefix: Optional[str] = None) -> AsyncIterator[str]:
+        ...
+
+    def count_tokens(self, text: str) -> int:
+        return self.token_counter.count(text)
+
+    async def create_cached_prefix(self, prefix: str, ttl: float) -> Optional[str]:
+        """Registra ``prefix`` no cache de contexto por ``ttl`` segundos.
+
+        Retorna o identificador a passar em ``cached_prefix`` ou ``None`` se
+        o backend não tem cache de contexto.
+        """
+        return None
+
+    async def release_cached_prefix(self, handle: str) -> None:
+        """Remove do cache um prefixo registrado com ``create_cached_prefix``."""
+
+    async def close(self) -> None:
+        """Libera os recursos do backend."""
+
+class GeminiBackend(ModelBackend):
+    """Backend da API REST do Gemini.
+
+    A contagem de tokens é calibrada com o ``usageMetadata`` das respostas, e
+    prefixos são registrados como ``systemInstruction`` de um
+    ``cachedContents``.
+    """
+
+    min_cached_prefix_tokens = GEMINI_MIN_CACHED_TOKENS
+
+    def __init__(self, api_key: str, model_name: str = DEFAULT_GEMINI_MODEL,
+                 transport: Optional[GeminiTransport] = None,
+                 context_window: int = GEMINI_CONTEXT_WINDOW):
+        super().__init__(context_window)
+        self.model_name = model_name
+        self.transport = transport or GeminiTransport(api_key)
+        self.transport.on_usage = self._calibrate
+
+    def _calibrate(self, prompt: str, usage: Dict[str, Any]) -> None:
+        prompt_tokens = usage.get("promptTokenCount")
+        if prompt_tokens:
+            self.token_counter.calibrate(prompt, prompt_tokens)
+
+    async def generate(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                       cached_prefix: Optional[str] = None) -> str:
+        if cached_prefix is None:
+            return await self.transport.generate(self.model_name, prompt, generation_config)
+        return await self.transport.generate(self.model_name, prompt, generation_config,
+                                             cached_content=cached_prefix)
+
+    async def stream(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                     cached_prefix: Optional[str] = None) -> AsyncIterator[str]:
+        if cached_prefix is None:
+            chunks = self.transport.stream(self.model_name, prompt, generation_config)
+        else:
+            chunks = self.transport.stream(self.model_name, prompt, generation_config,
+                                           cached_content=cached_prefix)
+        async for chunk in chunks:
+            yield chunk
+
+    async def create_cached_prefix(self, prefix: str, ttl: float) -> Optional[str]:
+        return await self.transport.create_cached_content(self.model_name, prefix, ttl)
+
+    async def release_cached_prefix(self, handle: str) -> None:
+        await self.transport.delete_cached_content(handle)
+
+    async def close(self) -> None:
+        await self.transport.close()
+
+class SimulatedBackend(ModelBackend):
+    """Backend local e determinístico para testes de carga sem rede.
+
+    Cada chamada espera uma latência sorteada de ``latency_distribution``
+    (``constant``, ``uniform``, ``exponential`` ou ``lognormal``) com média
+    ``latency`` segundos, mais o tempo de gerar ``response_tokens`` tokens a
+    ``tokens_per_second``. ``failure_rate`` e ``rate_limit_rate`` são as
+    probabilidades de falhar com ``APIError`` (503) ou ``RateLimitError``
+    (429), e ``max_concurrency`` limita as chamadas atendidas ao mesmo tempo.
+    Com a mesma ``seed`` a sequência de latências e falhas se repete, e a
+    resposta depende apenas do prompt.
+
+    O cache de contexto é emulado localmente: com ``prefill_tokens_per_second``,
+    cada token de entrada fora do cache soma ao tempo até o primeiro token,
+    e ``prompt_tokens``/``cached_tokens`` contam os tokens de entrada
+    processados e os lidos do cache.
+    """
+
+    DISTRIBUTIONS = ("constant", "uniform", "exponential", "lognormal")
+
+    def __init__(self, latency: float = 0.05, latency_distribution: str = "constant",
+                 jitter: float = 0.5, tokens_per_second: Optional[float] = None,
+                 response_tokens: int = 32, failure_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, retry_after: Optional[float] = None,
+                 max_concurrency: Optional[int] = None, seed: Optional[int] = None,
+                 model_name: str = "simulated", chunk_tokens: int = 8,
+                 context_window: int = DEFAULT_CONTEXT_WINDOW,
+                 prefill_tokens_per_second: Optional[float] = None,
+                 min_cached_prefix_tokens: int = 0):
+        if latency_distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Distribuição de latência inválida: {latency_distribution}")
+        super().__init__(context_window)
+        self.model_name = model_name
+        self.latency = latency
+        self.latency_distribution = latency_distribution
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.failure_rate = failure_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.chunk_tokens = chunk_tokens
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.min_cached_prefix_tokens = min_cached_prefix_tokens
+        self.prefixes: Dict[str, Tuple[str, float]] = {}
+        self._prefix_ids = itertools.count(1)
+        self._random = random.Random(seed)
+        self._slots = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self.calls = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def sample_latency(self) -> float:
+        """Sorteia a latência até o primeiro token."""
+        mean = self.latency
+        if mean <= 0 or self.latency_distribution == "constant":
+            return max(mean, 0.0)
+        if self.latency_distribution == "uniform":
+            return self._random.uniform(mean * (1 - self.jitter), mean * (1 + self.jitter))
+        if self.latency_distribution == "exponential":
+            return self._random.expovariate(1 / mean)
+        # Log-normal com média ``mean``: cauda longa, como latências reais
+        sigma = self.jitter
+        return self._random.lognormvariate(-(sigma ** 2) / 2, sigma) * mean
+
+    def _generation_time(self, tokens: int) -> float:
+        return tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    async def create_cached_prefix(self, prefix: str, ttl: float) -> Optional[str]:
+        handle = f"cachedContents/simulated-{next(self._prefix_ids)}"
+        self.prefixes[handle] = (prefix, time.monotonic() + ttl)
+        self.prompt_tokens += self.count_tokens(prefix)
+        return handle
+
+    async def release_cached_prefix(self, handle: str) -> None:
+        self.prefixes.pop(handle, None)
+
+    def _prefill(self, prompt: str, cached_prefix: Optional[str]) -> Tuple[str, float]:
+        """Prompt completo e tempo de processar a parte fora do cache."""
+        if cached_prefix is not None:
+            prefix, expires_at = self.prefixes.get(cached_prefix, ("", 0.0))
+            if expires_at <= time.monotonic():
+                self.prefixes.pop(cached_prefix, None)
+                raise APIError(f"Conteúdo em cache não encontrado: {cached_prefix}", "404")
+            self.cached_tokens += self.count_tokens(prefix)
+            full_prompt = prefix + prompt
+        else:
+            full_prompt = prompt
+        tokens = self.count_tokens(prompt)
+        self.prompt_tokens += tokens
+        rate = self.prefill_tokens_per_second
+        return full_prompt, tokens / rate if rate else 0.0
+
+    def respond(self, prompt: str) -> str:
+        """Resposta determinística para o prompt, com ``response_tokens`` tokens."""
+        digest = hashlib.blake2b(prompt.encode("utf-8"), digest_size=2).hexdigest()
+        return " ".join([digest] + ["tok"] * (self.response_tokens - 1))
+
+    def _check_failure(self) -> None:
+        draw = self._random.random()
+        if draw < self.rate_limit_rate:
+            self.failures += 1
+            raise RateLimitError("Limite de requisições simulado", "429", self.retry_after)
+        if draw < self.rate_limit_rate + self.failure_rate:
+            self.failures += 1
+            raise APIError("Falha simulada do serviço", "503")
+
+    async def _enter(self) -> None:
+        if self._slots is not None:
+            await self._slots.acquire()
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _leave(self) -> None:
+        self.in_flight -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    async def generate(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                       cached_prefix: Optional[str] = None) -> str:
+        await self._enter()
+        try:
+            prompt, prefill = self._prefill(prompt, cached_prefix)
+            await asyncio.sleep(self.sample_latency() + prefill)
+            self._check_failure()
+            await asyncio.sleep(self._generation_time(self.response_tokens))
+            return self.respond(prompt)
+        finally:
+            self._leave()
+
+    async def stream(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                     cached_prefix: Optional[str] = None) -> AsyncIterator[str]:
+        await self._enter()
+        try:
+            prompt, prefill = self._prefill(prompt, cached_prefix)
+            await asyncio.sleep(self.sample_latency() + prefill)
+            self._check_failure()
+            words = self.respond(prompt).split(" ")
+            for start in range(0, len(words), self.chunk_tokens):
+                chunk = words[start:start + self.chunk_tokens]
+                await asyncio.sleep(self._generation_time(len(chunk)))
+                yield (" " if start else "") + " ".join(chunk)
+        finally:
+            self._leave()
@@ -0,0 +1,248 @@
+"""
+Cache de respostas dos modelos do Mangaba.AI.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def make_cache_key(model_name: str, prompt: str, generation_config: Dict[str, Any]) -> str:
+    """Gera a chave de cache a partir do modelo, do prompt fundido e da configuração."""
+    payload = json.dumps([model_name, prompt, generation_config], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """Cache LRU em memória com expiração (TTL) por entrada."""
+
+    def __init__(self, max_size: int = 1000, ttl: float = 3600):
+        if max_size < 1:
+            raise ValueError("max_size deve ser maior que zero")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Retorna a resposta armazenada ou ``None`` se ausente ou expirada."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """Armazena uma resposta, descartando a menos usada se necessário."""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Versão assíncrona de ``get`` (em memória, sem bloquear o loop)."""
+        return self.get(key)
+
+    async def aset(self, key: str, value: str) -> None:
+        """Versão assíncrona de ``set``."""
+        self.set(key, value)
+
+    def clear(self) -> None:
+        """Remove todas as entradas."""
+        self._entries.clear()
+
+    async def aclose(self) -> None:
+        """Nada a liberar (existe para manter a interface de ``SQLiteResponseCache``)."""
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna contadores de acertos, falhas e ocupação."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hit_ratio": self.hits / total if total else 0.0
+        }
+
+class SQLiteResponseCache:
+    """Cache de respostas persistido em SQLite.
+
+    Sobrevive a reinícios e pode ser compartilhado por vários processos no
+    mesmo host: o banco usa o modo WAL e cada processo abre a sua própria
+    conexão. O número de entradas é limitado por ``max_size`` (as menos
+    acessadas são removidas primeiro) e ``compact`` descarta as expiradas e
+    devolve o espaço livre ao sistema de arquivos.
+
+    ``aget``/``aset`` executam a consulta em uma thread: com o banco
+    bloqueado por outro processo, a espera (até ``timeout``) não trava o
+    event loop.
+    """
+
+    # Frequência (em escritas) com que a ocupação é verificada
+    EVICTION_INTERVAL = 64
+
+    def __init__(self, path: str, max_size: int = 1000, ttl: float = 3600, timeout: float = 5.0):
+        if max_size < 1:
+            raise ValueError("max_size deve ser maior que zero")
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._writes = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Retorna a conexão do processo atual, reabrindo-a após um fork."""
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False, isolation_level=None)
+            self._enable_wal(conn)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def _enable_wal(self, conn: sqlite3.Connection) -> None:
+        """Liga o modo WAL, aguardando até ``timeout`` se outro processo o estiver ligando.
+
+        A troca do modo de journal não respeita o ``timeout`` da conexão: com
+        vários processos abrindo um banco novo ao mesmo tempo, o SQLite
+        responde "database is locked" imediatamente.
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                return
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) or time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.01)
+
+    def get(self, key: str) -> Optional[str]:
+        """Retorna a resposta armazenada ou ``None`` se ausente ou expirada."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        """Armazena uma resposta, removendo as menos acessadas se necessário."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now)
+            )
+            self._writes += 1
+            if self._writes % self.EVICTION_INTERVAL == 0:
+                self._evict(conn, now)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Versão assíncrona de ``get``, executada fora do event loop."""
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: str) -> None:
+        """Versão assíncrona de ``set``, executada fora do event loop."""
+        await asyncio.to_thread(self.set, key, value)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """Remove entradas expiradas e as excedentes menos acessadas."""
+        conn.execute("DELETE FROM responses WHERE expires_at < ?", (now,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        if count > self.max_size:
+            conn.execute(
+                """DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY accessed_at LIMIT ?
+                )""",
+                (count - self.max_size,)
+            )
+
+    def compact(self) -> None:
+        """Aplica os limites, consolida o WAL e reduz o arquivo do banco."""
+        with self._lock:
+            conn = self._connection()
+            self._evict(conn, time.time())
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+
+    def clear(self) -> None:
+        """Remove todas as entradas."""
+        with self._lock:
+            self._connection().execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        """Fecha a conexão do processo atual."""
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+    async def aclose(self) -> None:
+        """Versão assíncrona de ``close``, executada fora do event loop."""
+        await asyncio.to_thread(self.close)
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._connection().execute(
+                "SELECT COUNT(*) FROM responses WHERE expires_at >= ?", (time.time(),)
+            ).fetchone()
+            return count
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna contadores de acertos, falhas e ocupação."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self),
+            "max_size": self.max_size,
+            "hit_ratio": self.hits / total if total else 0.0
+        }
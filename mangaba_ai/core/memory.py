@@ -0,0 +1,306 @@
+"""
+Memória contextual compartilhada pelos agentes do Mangaba.AI.
+
+``ContextualMemory`` guarda três coleções limitadas:
+
+- contexto: pares chave/valor com expiração (TTL) por entrada e descarte da
+  entrada menos usada (LRU, O(1)) acima de ``max_size``;
+- cache: resultados reaproveitáveis, com TTL e limite ``cache_size``;
+- histórico: as ações mais recentes dos agentes, até ``max_history``.
+
+Entradas expiradas são removidas ao serem lidas e por uma tarefa de limpeza
+em segundo plano a cada ``cleanup_interval`` segundos. ``footprint`` informa
+quantas entradas e quantos bytes (estimados) a memória ocupa.
+"""
+import asyncio
+import sys
+import time
+import weakref
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from ..utils.metrics import metrics
+
+MEMORY_ENTRIES = metrics.gauge(
+    "mangaba_memory_entries", "Entradas na memória contextual (context, cache, history)", ("store",)
+)
+MEMORY_BYTES = metrics.gauge(
+    "mangaba_memory_bytes", "Bytes estimados ocupados pela memória contextual", ("store",)
+)
+MEMORY_EVICTIONS = metrics.counter(
+    "mangaba_memory_evictions_total", "Entradas removidas da memória contextual", ("reason",)
+)
+_EVICTED = {reason: MEMORY_EVICTIONS.labels(reason=reason) for reason in ("lru", "expired")}
+
+# Memórias ativas, consultadas apenas quando as métricas são lidas
+_MEMORIES: "weakref.WeakSet[ContextualMemory]" = weakref.WeakSet()
+
+def _collect_footprint() -> None:
+    totals = {store: [0, 0] for store in ("context", "cache", "history")}
+    for memory in list(_MEMORIES):
+        for store, (entries, size) in memory._stores().items():
+            total = totals[store]
+            total[0] += entries
+            total[1] += size
+    for store, (entries, size) in totals.items():
+        MEMORY_ENTRIES.set(entries, store=store)
+        MEMORY_BYTES.set(size, store=store)
+
+metrics.register_collector(_collect_footprint)
+
+# Tipos sem conteúdo a percorrer (evita as verificações de ABC, mais lentas)
+_ATOMIC_TYPES = frozenset({str, bytes, int, float, bool, type(None)})
+
+def estimate_size(value: Any) -> int:
+    """Estimativa em bytes do espaço ocupado por ``value`` e seu conteúdo."""
+    size = sys.getsizeof(value)
+    if type(value) in _ATOMIC_TYPES:
+        return size
+    if isinstance(value, (dict, Mapping)):
+        size += sum(estimate_size(key) + estimate_size(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset, deque)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+class _Entry(NamedTuple):
+    value: Any
+    expires_at: float
+    size: int
+
+class _Store:
+    """Coleção chave/valor com LRU e TTL por entrada."""
+
+    def __init__(self, max_size: int, ttl: Optional[float]):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.size = 0
+
+    def set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else float("inf")
+        self.discard(key)
+        entry = _Entry(value, expires_at, estimate_size(key) + estimate_size(value))
+        self.entries[key] = entry
+        self.size += entry.size
+        self.trim()
+
+    def get(self, key: str) -> Optional[_Entry]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self.discard(key)
+            _EVICTED["expired"].inc()
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def discard(self, key: str) -> bool:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        self.size -= entry.size
+        return True
+
+    def trim(self) -> None:
+        while len(self.entries) > self.max_size:
+            _, entry = self.entries.popitem(last=False)
+            self.size -= entry.size
+            _EVICTED["lru"].inc()
+
+    def purge_expired(self, now: float) -> int:
+        expired = [key for key, entry in self.entries.items() if entry.expires_at <= now]
+        for key in expired:
+            self.discard(key)
+        if expired:
+            _EVICTED["expired"].inc(len(expired))
+        return len(expired)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.size = 0
+
+async def _sweep(memory_ref: "weakref.ref[ContextualMemory]") -> None:
+    # Guarda apenas uma referência fraca: a tarefa termina quando a memória
+    # deixa de ser usada
+    while True:
+        memory = memory_ref()
+        if memory is None:
+            return
+        interval = memory.cleanup_interval
+        del memory
+        await asyncio.sleep(interval)
+        memory = memory_ref()
+        if memory is None:
+            return
+        memory.purge_expired()
+        del memory
+
+class ContextualMemory:
+    """Memória de contexto, histórico e cache compartilhada por agentes.
+
+    ``ttl`` é a expiração padrão, em segundos, das entradas de contexto e de
+    cache (``None`` ou ``0``: sem expiração); cada ``add`` ou ``cache`` pode
+    informar o seu. ``max_context_size`` é um nome alternativo para
+    ``max_size``. A limpeza em segundo plano começa no primeiro acesso feito
+    dentro de um event loop.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: Optional[float] = 3600, cleanup_interval: float = 300,
+                 cache_size: int = 1000, max_history: Optional[int] = None,
+                 max_context_size: Optional[int] = None):
+        if max_context_size is not None:
+            max_size = max_context_size
+        if max_size < 1 or cache_size < 1:
+            raise ValueError("max_size e cache_size devem ser maiores que zero")
+        self.cleanup_interval = cleanup_interval
+        self._context = _Store(max_size, ttl)
+        self._cache = _Store(cache_size, ttl)
+        # (bytes estimados, ação) das ações mais recentes
+        self._history: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=max_history or max_size)
+        self._history_size = 0
+        self._sweeper: Optional[asyncio.Task] = None
+        _MEMORIES.add(self)
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "ContextualMemory":
+        """Cria a memória a partir da seção ``memory`` da configuração."""
+        memory = config["memory"]
+        return cls(
+            max_size=memory["max_size"],
+            ttl=memory["ttl"],
+            cleanup_interval=memory["cleanup_interval"],
+            cache_size=memory["cache_size"]
+        )
+
+    def reconfigure(self, config: Mapping[str, Any]) -> None:
+        """Aplica novos limites da seção ``memory``, descartando o excedente."""
+        memory = config["memory"]
+        self.max_size = memory.get("max_size", self.max_size)
+        self.ttl = memory.get("ttl", self.ttl)
+        self._cache.max_size = memory.get("cache_size", self._cache.max_size)
+        self._cache.trim()
+        self.cleanup_interval = memory.get("cleanup_interval", self.cleanup_interval)
+
+    @property
+    def max_size(self) -> int:
+        return self._context.max_size
+
+    @max_size.setter
+    def max_size(self, value: int) -> None:
+        self._context.max_size = value
+        self._context.trim()
+
+    @property
+    def ttl(self) -> Optional[float]:
+        return self._context.ttl
+
+    @ttl.setter
+    def ttl(self, value: Optional[float]) -> None:
+        self._context.ttl = self._cache.ttl = value
+
+    def _ensure_sweeper(self) -> None:
+        if self._sweeper is not None and not self._sweeper.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._sweeper = loop.create_task(_sweep(weakref.ref(self)))
+
+    # Contexto
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Armazena ``value`` em ``key``, expirando em ``ttl`` segundos."""
+        self._ensure_sweeper()
+        self._context.set(key, value, ttl)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Valor de ``key`` ou ``default`` se ausente ou expirado."""
+        entry = self._context.get(key)
+        return default if entry is None else entry.value
+
+    def remove(self, key: str) -> bool:
+        """Remove ``key``; retorna se a chave existia."""
+        return self._context.discard(key)
+
+    def __contains__(self, key: str) -> bool:
+        return self._context.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._context.entries)
+
+    # Histórico
+
+    def add_to_history(self, action: str, result: Any = None, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Registra uma ação no histórico, descartando a mais antiga se cheio."""
+        entry = {"action": action, "result": result, "metadata": metadata or {}, "timestamp": time.time()}
+        size = estimate_size(entry)
+        if len(self._history) == self._history.maxlen:
+            self._history_size -= self._history[0][0]
+        self._history.append((size, entry))
+        self._history_size += size
+
+    def get_history(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Ações do histórico, da mais antiga para a mais recente (as ``limit`` últimas)."""
+        entries = [dict(entry) for _, entry in self._history]
+        return entries[-limit:] if limit else entries
+
+    # Cache
+
+    def cache(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Armazena um resultado em cache, expirando em ``ttl`` segundos."""
+        self._ensure_sweeper()
+        self._cache.set(key, value, ttl)
+
+    def get_cached(self, key: str, default: Any = None) -> Any:
+        """Resultado em cache de ``key`` ou ``default`` se ausente ou expirado."""
+        entry = self._cache.get(key)
+        return default if entry is None else entry.value
+
+    def remove_cached(self, key: str) -> bool:
+        return self._cache.discard(key)
+
+    def clear_cache(self) -> None:
+        self._cache.clear()
+
+    # Manutenção
+
+    def purge_expired(self) -> int:
+        """Remove as entradas expiradas; retorna quantas foram removidas."""
+        now = time.monotonic()
+        return self._context.purge_expired(now) + self._cache.purge_expired(now)
+
+    def clear(self) -> None:
+        """Remove todo o contexto, o histórico e o cache."""
+        self._context.clear()
+        self._cache.clear()
+        self._history.clear()
+        self._history_size = 0
+
+    def _stores(self) -> Dict[str, Tuple[int, int]]:
+        return {
+            "context": (len(self._context.entries), self._context.size),
+            "cache": (len(self._cache.entries), self._cache.size),
+            "history": (len(self._history), self._history_size),
+        }
+
+    def footprint(self) -> Dict[str, Any]:
+        """Entradas e bytes estimados de cada coleção e o total de bytes."""
+        stores = self._stores()
+        footprint: Dict[str, Any] = {
+            store: {"entries": entries, "bytes": size} for store, (entries, size) in stores.items()
+        }
+        footprint["bytes"] = sum(size for _, size in stores.values())
+        return footprint
+
+    async def close(self) -> None:
+        """Interrompe a limpeza em segundo plano."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
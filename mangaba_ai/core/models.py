@@ -2,51 +2,401 @@
 Modelos e agentes do Mangaba.AI.
 """
 import asyncio
-import google.generativeai as genai
 import logging
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Mapping, Optional, Tuple
+from .backends import DEFAULT_GEMINI_MODEL, GEMINI_CONTEXT_WINDOW, GeminiBackend, ModelBackend
+from .cache import ResponseCache, SQLiteResponseCache, make_cache_key
+from .memory import ContextualMemory
 from .protocols import A2AProtocol, MCPProtocol
+from .ratelimit import RateLimiter, get_rate_limiter
+from .retry import RetryPolicy
+from .singleflight import SingleFlight
+from .tokens import PromptSegment, TokenCounter, fit_segments, token_usage
+from .transport import GeminiTransport
+from ..utils.context import current_agent, current_task, isolate_stream
+from ..utils.exceptions import APIError, ConfigurationError, RateLimitError
+from ..utils.metrics import metrics
+from ..utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
-class GeminiModel:
-    """Implementação do modelo Gemini."""
+# Parâmetros de geração lidos de ``models.gemini`` na configuração
+GENERATION_SETTINGS = ("temperature", "top_p", "top_k", "max_output_tokens")
+
+MODEL_REQUESTS = metrics.counter(
+    "mangaba_model_requests_total", "Chamadas ao backend do modelo", ("model", "agent", "outcome")
+)
+MODEL_LATENCY = metrics.histogram(
+    "mangaba_model_request_seconds", "Latência das chamadas ao backend do modelo", ("model", "agent")
+)
+MODEL_TOKENS = metrics.counter(
+    "mangaba_model_tokens_total", "Tokens enviados (in) e recebidos (out) do modelo", ("model", "agent", "direction")
+)
+MODEL_IN_FLIGHT = metrics.gauge(
+    "mangaba_model_in_flight", "Chamadas ao modelo em andamento", ("model", "agent")
+)
+CACHE_REQUESTS = metrics.counter(
+    "mangaba_cache_requests_total", "Consultas ao cache de respostas (hit ou miss)", ("model", "result")
+)
+COALESCED_CALLS = metrics.counter(
+    "mangaba_model_coalesced_total", "Chamadas idênticas atendidas por outra chamada em andamento", ("model",)
+)
+AGENT_TASKS = metrics.counter(
+    "mangaba_agent_tasks_total", "Tarefas executadas pelos agentes", ("agent", "outcome")
+)
+AGENT_LATENCY = metrics.histogram(
+    "mangaba_agent_task_seconds", "Duração das tarefas executadas pelos agentes", ("agent",)
+)
+AGENT_IN_FLIGHT = metrics.gauge(
+    "mangaba_agent_in_flight", "Tarefas em execução por agente", ("agent",)
+)
+
+class _CallMetrics:
+    """Métricas das chamadas de um modelo por um agente, com os rótulos já fixados."""
+
+    __slots__ = ("tokens_in", "tokens_out", "tokens_cached", "in_flight", "latency", "outcomes")
+
+    def __init__(self, model: str, agent: str):
+        labels = {"model": model, "agent": agent}
+        self.tokens_in = MODEL_TOKENS.labels(direction="in", **labels)
+        self.tokens_out = MODEL_TOKENS.labels(direction="out", **labels)
+        self.tokens_cached = MODEL_TOKENS.labels(direction="cached", **labels)
+        self.in_flight = MODEL_IN_FLIGHT.labels(**labels)
+        self.latency = MODEL_LATENCY.labels(**labels)
+        self.outcomes = {outcome: MODEL_REQUESTS.labels(outcome=outcome, **labels) for outcome in ("ok", "error")}
+
+class LanguageModel:
+    """Modelo de linguagem sobre um backend.
+
+    Acrescenta ao ``backend`` a fusão de contexto do MCP, o cache de
+    respostas, o agrupamento de chamadas idênticas simultâneas e, se
+    ``rate_limiter`` for informado, o limite de taxa. Antes do envio, o
+    prompt fundido é ajustado a ``max_prompt_tokens``.
+
+    Um ``prefix`` estático (como o preâmbulo de um agente) é registrado uma
+    vez no cache de contexto do backend, quando disponível, e renovado antes
+    de expirar (``context_fusion.prefix_cache_ttl``); as chamadas seguintes
+    enviam apenas o restante do prompt.
+    """
     
-    def __init__(self, api_key: str, model_id: str = "default"):
-        self.model = genai.GenerativeModel('gemini-2.5-flash-preview-04-17')
+    def __init__(self, backend: ModelBackend, model_id: str = "default",
+                 config: Optional[Dict[str, Any]] = None, cache=None,
+                 rate_limiter: Optional[RateLimiter] = None):
+        self.backend = backend
         self.model_id = model_id
-        self.mcp = MCPProtocol()
-        genai.configure(api_key=api_key)
+        self.generation_config = {
+            "temperature": 0.7,
+            "top_p": 0.8,
+            "top_k": 40,
+            "max_output_tokens": 2048,
+        }
+        config = config or {}
+        self._apply_generation_settings(config)
+        fusion = config.get("context_fusion", {})
+        self.prefix_ttl = fusion.get("prefix_cache_ttl", 3600)
+        self.mcp = MCPProtocol(
+            max_contexts=fusion.get("max_contexts", 10),
+            context_ttl=fusion.get("context_ttl", 3600),
+            max_context_tokens=fusion.get("max_context_tokens", 4096),
+            retrieval_k=fusion.get("retrieval_k"),
+            max_memories=fusion.get("retrieval_max_memories")
+        )
+        memory = config.get("memory", {})
+        if cache is None and memory.get("cache_path"):
+            cache = SQLiteResponseCache(
+                memory["cache_path"],
+                max_size=memory.get("cache_size", 1000),
+                ttl=memory.get("ttl", 3600)
+            )
+        # Caches vazios são falsos (``__len__``): compara com None
+        self.cache = cache if cache is not None else ResponseCache(
+            max_size=memory.get("cache_size", 1000),
+            ttl=memory.get("ttl", 3600)
+        )
+        self.singleflight = SingleFlight()
+        self.rate_limiter = rate_limiter
+        # Prefixo -> (identificador no cache do backend ou None, renovação)
+        self._prefixes: Dict[str, Tuple[Optional[str], float]] = {}
+        self._call_metrics: Dict[str, _CallMetrics] = {}
         self.mcp.add_model(model_id, self)
 
-    async def generate(self, prompt: str) -> str:
-        """Gera texto com base no prompt."""
+    def _apply_generation_settings(self, config: Mapping[str, Any]) -> None:
+        gemini = config.get("models", {}).get("gemini", {})
+        settings = {key: gemini[key] for key in GENERATION_SETTINGS if key in gemini}
+        # Troca o dicionário inteiro: cada chamada usa a configuração anterior
+        # ou a nova, nunca uma mistura das duas
+        self.generation_config = {**self.generation_config, **settings}
+
+    def reconfigure(self, config: Mapping[str, Any]) -> None:
+        """Aplica as seções ``models`` e ``memory`` de uma configuração recarregada."""
+        self._apply_generation_settings(config)
+        memory = config.get("memory", {})
+        self.cache.max_size = memory.get("cache_size", self.cache.max_size)
+        self.cache.ttl = memory.get("ttl", self.cache.ttl)
+
+    @property
+    def model_name(self) -> str:
+        return self.backend.model_name
+
+    @property
+    def max_prompt_tokens(self) -> int:
+        """Tokens disponíveis para o prompt: a janela do modelo menos a resposta."""
+        return self.backend.context_window - self.generation_config.get("max_output_tokens", 0)
+
+    async def _fuse(self, prompt: str, prefix: str = "") -> str:
+        max_tokens = self.max_prompt_tokens - self.backend.count_tokens(prefix)
+        return await self.mcp.fuse_context(prompt, self.model_id, max_tokens, self.backend.token_counter)
+
+    async def generate(self, prompt: str, use_cache: bool = True, prefix: str = "") -> str:
+        """Gera texto com base no prompt.
+        
+        Respostas são reaproveitadas do cache quando o prompt fundido, o
+        modelo e a configuração de geração coincidem; use ``use_cache=False``
+        para forçar uma nova chamada. Chamadas idênticas simultâneas são
+        agrupadas em uma única requisição, e apenas a primeira registra o
+        turno no contexto. ``prefix`` antecede o prompt fundido e não entra
+        no contexto do MCP.
+        """
+        try:
+            with tracer.span("model.generate", {"model": self.model_name}) as span:
+                # Usa o MCP para fundir o contexto
+                full_prompt = await self._fuse(prompt, prefix)
+                
+                key = make_cache_key(self.model_name, prefix + full_prompt, self.generation_config)
+                text = await self._cached(key) if use_cache else None
+                span.set_attribute("cache.hit", text is not None)
+                if text is not None:
+                    self.mcp.update_context(self.model_id, prompt, text)
+                    return text
+                
+                text, leader = await self.singleflight.do(key, lambda: self._call(full_prompt, prefix))
+                span.set_attribute("coalesced", not leader)
+                if leader:
+                    await self.cache.aset(key, text)
+                    self.mcp.update_context(self.model_id, prompt, text)
+                else:
+                    COALESCED_CALLS.inc(model=self.model_name)
+                return text
+        except Exception as e:
+            logger.error(f"Erro ao gerar resposta: {e}")
+            raise
+
+    async def _cached(self, key: str) -> Optional[str]:
+        """Consulta o cache, contabilizando acertos e faltas."""
+        text = await self.cache.aget(key)
+        CACHE_REQUESTS.inc(model=self.model_name, result="miss" if text is None else "hit")
+        return text
+
+    @contextmanager
+    def _observe_call(self, prompt_tokens: int, cached_tokens: int = 0) -> Iterator[Any]:
+        """Registra latência, tokens, chamadas em andamento e o span da chamada."""
+        agent = current_agent.get()
+        bound = self._metrics_for(agent)
+        bound.tokens_in.inc(prompt_tokens)
+        if cached_tokens:
+            bound.tokens_cached.inc(cached_tokens)
+        token_usage.record(agent, calls=1, prompt_tokens=prompt_tokens, cached_tokens=cached_tokens)
+        bound.in_flight.inc()
+        start = time.perf_counter()
+        outcome = "error"
+        attributes = {"model": self.model_name, "agent": agent,
+                      "tokens.in": prompt_tokens, "tokens.cached": cached_tokens}
+        try:
+            with tracer.span("model.call", attributes, kind="client") as span:
+                yield span
+            outcome = "ok"
+        finally:
+            bound.in_flight.dec()
+            bound.latency.observe(time.perf_counter() - start)
+            bound.outcomes[outcome].inc()
+
+    def _metrics_for(self, agent: str) -> _CallMetrics:
+        bound = self._call_metrics.get(agent)
+        if bound is None:
+            bound = self._call_metrics[agent] = _CallMetrics(self.model_name, agent)
+        return bound
+
+    def _record_output(self, text: str, span: Any) -> None:
+        tokens = self.backend.count_tokens(text)
+        span.set_attribute("tokens.out", tokens)
+        agent = current_agent.get()
+        self._metrics_for(agent).tokens_out.inc(tokens)
+        token_usage.record(agent, completion_tokens=tokens)
+
+    async def _prefix_handle(self, prefix: str) -> Optional[str]:
+        """Identificador do prefixo no cache de contexto do backend, registrando-o se preciso."""
+        entry = self._prefixes.get(prefix)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        handle, _ = await self.singleflight.do(f"prefix:{prefix}", lambda: self._register_prefix(prefix))
+        return handle
+
+    async def _register_prefix(self, prefix: str) -> Optional[str]:
+        handle = None
+        if self.backend.count_tokens(prefix) >= self.backend.min_cached_prefix_tokens:
+            try:
+                handle = await self.backend.create_cached_prefix(prefix, self.prefix_ttl)
+            except Exception as e:
+                logger.warning(f"Falha ao registrar prefixo no cache de contexto: {e}")
+        # Renova antes que o backend descarte o prefixo
+        self._prefixes[prefix] = (handle, time.monotonic() + self.prefix_ttl * 0.9)
+        return handle
+
+    async def _prepare(self, full_prompt: str, prefix: str) -> Tuple[str, Optional[str], int]:
+        """Texto a enviar, prefixo em cache (se houver) e tokens lidos do cache."""
+        handle = await self._prefix_handle(prefix) if prefix else None
+        if handle is None:
+            return prefix + full_prompt, None, 0
+        return full_prompt, handle, self.backend.count_tokens(prefix)
+
+    def _send(self, prompt: str, handle: Optional[str]) -> Any:
+        if handle is None:
+            return self.backend.generate(prompt, self.generation_config)
+        return self.backend.generate(prompt, self.generation_config, cached_prefix=handle)
+
+    async def _call(self, full_prompt: str, prefix: str = "", reregister: bool = True) -> str:
+        """Faz a chamada ao backend respeitando o limitador de taxa."""
+        prompt, handle, cached_tokens = await self._prepare(full_prompt, prefix)
+        prompt_tokens = self.backend.count_tokens(prompt)
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(prompt_tokens)
+        try:
+            with self._observe_call(prompt_tokens, cached_tokens) as span:
+                text = await self._send(prompt, handle)
+                self._record_output(text, span)
+        except RateLimitError as e:
+            if self.rate_limiter is not None:
+                self.rate_limiter.on_rate_limited(e.retry_after)
+            raise
+        except APIError as e:
+            # O backend descartou o prefixo antes do previsto: registra de novo
+            if handle is None or e.error_code != "404" or not reregister:
+                raise
+            self._prefixes.pop(prefix, None)
+            return await self._call(full_prompt, prefix, reregister=False)
+        if self.rate_limiter is not None:
+            self.rate_limiter.on_success()
+        return text
+
+    def generate_stream(self, prompt: str, use_cache: bool = True, prefix: str = "") -> AsyncIterator[str]:
+        """Gera texto com base no prompt, produzindo fragmentos à medida que chegam.
+        
+        O texto completo é registrado no contexto do MCP e no cache ao final;
+        se o consumo for interrompido antes do fim, nada é registrado. A
+        geração roda em uma tarefa própria (``isolate_stream``): o span da
+        chamada não fica ativo no contexto de quem consome.
+        """
+        return isolate_stream(self._generate_stream(prompt, use_cache, prefix))
+
+    async def _generate_stream(self, prompt: str, use_cache: bool, prefix: str) -> AsyncIterator[str]:
         try:
-            # Usa o MCP para fundir o contexto
-            full_prompt = await self.mcp.fuse_context(prompt, self.model_id)
+            full_prompt = await self._fuse(prompt, prefix)
             
-            response = await asyncio.to_thread(
-                self.model.generate_content,
-                full_prompt,
-                generation_config={
-                    "temperature": 0.7,
-                    "top_p": 0.8,
-                    "top_k": 40,
-                    "max_output_tokens": 2048,
-                }
-            )
-            return response.text
+            key = make_cache_key(self.model_name, prefix + full_prompt, self.generation_config)
+            text = await self._cached(key) if use_cache else None
+            if text is not None:
+                yield text
+            else:
+                chunks = []
+                sent, handle, cached_tokens = await self._prepare(full_prompt, prefix)
+                prompt_tokens = self.backend.count_tokens(sent)
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire(prompt_tokens)
+                if handle is None:
+                    stream = self.backend.stream(sent, self.generation_config)
+                else:
+                    stream = self.backend.stream(sent, self.generation_config, cached_prefix=handle)
+                try:
+                    with self._observe_call(prompt_tokens, cached_tokens) as span:
+                        async for chunk in stream:
+                            chunks.append(chunk)
+                            yield chunk
+                        text = "".join(chunks)
+                        self._record_output(text, span)
+                except RateLimitError as e:
+                    if self.rate_limiter is not None:
+                        self.rate_limiter.on_rate_limited(e.retry_after)
+                    raise
+                except APIError as e:
+                    # Prefixo descartado pelo backend: a próxima chamada o registra de novo
+                    if handle is not None and e.error_code == "404":
+                        self._prefixes.pop(prefix, None)
+                    raise
+                if self.rate_limiter is not None:
+                    self.rate_limiter.on_success()
+                await self.cache.aset(key, text)
+            
+            self.mcp.update_context(self.model_id, prompt, text)
         except Exception as e:
             logger.error(f"Erro ao gerar resposta: {e}")
             raise
 
+    async def close(self) -> None:
+        """Remove os prefixos registrados e libera o cache de respostas e o backend."""
+        handles = [handle for handle, _ in self._prefixes.values() if handle is not None]
+        self._prefixes.clear()
+        for handle in handles:
+            try:
+                await self.backend.release_cached_prefix(handle)
+            except Exception as e:
+                logger.warning(f"Falha ao remover prefixo do cache de contexto: {e}")
+        await self.cache.aclose()
+        await self.backend.close()
+
+class GeminiModel(LanguageModel):
+    """Implementação do modelo Gemini.
+    
+    O nome do modelo vem de ``models.gemini.model`` na configuração; o
+    limitador de taxa é compartilhado por todos os modelos da mesma chave.
+    """
+    
+    def __init__(self, api_key: str, model_id: str = "default", config: Optional[Dict[str, Any]] = None,
+                 cache=None, transport: Optional[GeminiTransport] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
+        config = config or {}
+        gemini = config.get("models", {}).get("gemini", {})
+        backend = GeminiBackend(api_key, gemini.get("model", DEFAULT_GEMINI_MODEL), transport,
+                                gemini.get("context_window", GEMINI_CONTEXT_WINDOW))
+        super().__init__(
+            backend,
+            model_id=model_id,
+            config=config,
+            cache=cache,
+            rate_limiter=rate_limiter or get_rate_limiter(
+                api_key,
+                requests_per_minute=gemini.get("requests_per_minute", 1000),
+                tokens_per_minute=gemini.get("tokens_per_minute")
+            )
+        )
+        self.transport = backend.transport
+
+RESULT_SEPARATOR = "\n\n"
+
 class Agent:
-    """Agente autônomo para execução de tarefas."""
-    def __init__(self, name: str, role: str, model: GeminiModel, goal: str = ""):
+    """Agente autônomo para execução de tarefas.
+    
+    O agente usa ``model`` ou, se apenas ``backend`` for informado, um
+    ``LanguageModel`` próprio sobre esse backend. ``memory`` pode ser
+    compartilhada entre agentes; sem ela, o agente tem uma memória própria.
+    Cada tarefa concluída entra no histórico da memória, com o nome do agente.
+    """
+    def __init__(self, name: str, role: str, model: Optional[LanguageModel] = None, goal: str = "",
+                 retry_policy: Optional[RetryPolicy] = None, a2a: Optional[A2AProtocol] = None,
+                 backend: Optional[ModelBackend] = None, memory: Optional[ContextualMemory] = None):
+        if model is None:
+            if backend is None:
+                raise ConfigurationError(f"Agente {name} precisa de um modelo ou backend")
+            model = LanguageModel(backend, model_id=name)
         self.name = name
         self.role = role
         self.goal = goal
         self.model = model
-        self.a2a = A2AProtocol()
+        self.retry_policy = retry_policy or RetryPolicy(max_retries=0)
+        self.a2a = a2a or A2AProtocol()
+        self.memory = memory if memory is not None else ContextualMemory()
         
         # Registra callback para receber mensagens
         self.a2a.register_callback(self.name, self.handle_message)
@@ -61,29 +411,143 @@ class Agent:
             await self.a2a.send_message(
                 self.name,
                 message["sender"],
-                response
+                response,
+                priority=message.get("priority"),
+                hops=message.get("hops", 0) + 1
             )
         except Exception as e:
             logger.error(f"Erro ao processar mensagem: {e}")
 
-    async def execute(self, task: str) -> str:
-        """Executa uma tarefa."""
-        try:
-            prompt = f"""Você é um agente {self.role} chamado {self.name}.
+    def build_prompt(self, task: str, context: Optional[Dict[str, str]] = None,
+                     max_tokens: Optional[int] = None, counter: Optional[TokenCounter] = None) -> str:
+        """Monta o prompt de uma tarefa.
+
+        ``context`` recebe os resultados das tarefas das quais esta depende,
+        indexados pela descrição de cada uma. Com ``max_tokens``, esses
+        resultados são truncados ou descartados (os primeiros antes) até o
+        prompt caber no limite; a tarefa em si nunca é cortada.
+        """
+        results = [f"- {description}:\n{result}" for description, result in (context or {}).items()]
+        prompt = self._render_prompt(task, results)
+        if max_tokens is None or not results:
+            return prompt
+        counter = counter or TokenCounter()
+        if counter.count(prompt) <= max_tokens:
+            return prompt
+
+        budget = (max_tokens - counter.count(self._render_prompt(task, [""]))
+                  - len(results) * counter.count(RESULT_SEPARATOR))
+        fitted = fit_segments([PromptSegment(result) for result in results], max(budget, 0), counter)
+        kept = [segment.text for segment in fitted if segment is not None]
+        dropped = sum(map(counter.count, results)) - sum(map(counter.count, kept))
+        token_usage.record(self.name, dropped_tokens=dropped)
+        return self._render_prompt(task, kept)
+
+    @property
+    def preamble(self) -> str:
+        """Início fixo dos prompts do agente (papel e objetivo)."""
+        return f"""Você é um agente {self.role} chamado {self.name}.
 Seu objetivo é: {self.goal}
 
-Tarefa atual: {task}
+"""
+
+    def _split_prompt(self, task: str, context: Optional[Dict[str, str]]) -> Tuple[str, str]:
+        """Prompt da tarefa ajustado à janela, separado em preâmbulo e restante.
+
+        O preâmbulo vai ao modelo como ``prefix``, registrado uma vez no cache
+        de contexto; modelos que não são ``LanguageModel`` (dublês,
+        adaptadores) recebem o prompt inteiro.
+        """
+        if not isinstance(self.model, LanguageModel):
+            return "", self.build_prompt(task, context)
+        prompt = self.build_prompt(task, context, self.model.max_prompt_tokens, self.model.backend.token_counter)
+        preamble = self.preamble
+        return preamble, prompt[len(preamble):]
+
+    def _render_prompt(self, task: str, results: List[str]) -> str:
+        upstream = ""
+        if results:
+            upstream = "\n\nResultados das tarefas anteriores:\n" + RESULT_SEPARATOR.join(results)
+
+        return self.preamble + f"""Tarefa atual: {task}{upstream}
 
 Por favor, execute esta tarefa de forma detalhada e profissional."""
+
+    @contextmanager
+    def _running(self) -> Iterator[Any]:
+        """Atribui ao agente o que ocorre no bloco: contexto, span e métricas."""
+        token = current_agent.set(self.name)
+        in_flight = AGENT_IN_FLIGHT.labels(agent=self.name)
+        in_flight.inc()
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            with tracer.span("agent.execute", {"agent": self.name, "agent.role": self.role}) as span:
+                yield span
+            outcome = "ok"
+        finally:
+            in_flight.dec()
+            AGENT_LATENCY.observe(time.perf_counter() - start, agent=self.name)
+            AGENT_TASKS.inc(agent=self.name, outcome=outcome)
+            current_agent.reset(token)
+
+    async def execute(self, task: str, context: Optional[Dict[str, str]] = None) -> str:
+        """Executa uma tarefa."""
+        try:
+            with self._running():
+                prefix, prompt = self._split_prompt(task, context)
+                if prefix:
+                    result = await self.retry_policy.run(lambda: self.model.generate(prompt, prefix=prefix))
+                else:
+                    result = await self.retry_policy.run(lambda: self.model.generate(prompt))
+            self._remember(task, result)
+            return result
             
-            return await self.model.generate(prompt)
+        except Exception as e:
+            logger.error(f"Erro ao executar tarefa: {e}")
+            raise
+
+    def _remember(self, task: str, result: str) -> None:
+        """Registra a tarefa concluída no histórico da memória."""
+        self.memory.add_to_history(task, result, {"agent": self.name, "task": current_task.get()})
+
+    def execute_stream(self, task: str, context: Optional[Dict[str, str]] = None) -> AsyncIterator[str]:
+        """Executa uma tarefa, produzindo a resposta em fragmentos.
+
+        A execução roda em uma tarefa própria (``isolate_stream``), de modo que
+        o agente e o span atuais não vazam para o contexto de quem consome,
+        mesmo se o consumo for interrompido.
+        """
+        return isolate_stream(self._execute_stream(task, context))
+
+    async def _execute_stream(self, task: str, context: Optional[Dict[str, str]]) -> AsyncIterator[str]:
+        try:
+            with self._running():
+                prefix, prompt = self._split_prompt(task, context)
+                chunks = (self.model.generate_stream(prompt, prefix=prefix) if prefix
+                          else self.model.generate_stream(prompt))
+                parts = []
+                async for chunk in chunks:
+                    parts.append(chunk)
+                    yield chunk
+            self._remember(task, "".join(parts))
             
         except Exception as e:
             logger.error(f"Erro ao executar tarefa: {e}")
             raise
 
 class Task:
-    """Representa uma tarefa a ser executada."""
-    def __init__(self, description: str, agent: Agent):
+    """Representa uma tarefa a ser executada.
+    
+    ``trace_context`` (``traceparent`` W3C) liga o span da tarefa a um rastro
+    já existente; após a execução, guarda o contexto do span da tarefa.
+    ``id`` identifica a tarefa nos logs.
+    """
+    def __init__(self, description: str, agent: Agent, priority: int = 0,
+                 dependencies: Optional[List["Task"]] = None, trace_context: Optional[str] = None):
         self.description = description
-        self.agent = agent 
\ No newline at end of file
+        self.agent = agent
+        self.priority = priority
+        self.dependencies = list(dependencies or [])
+        self.trace_context = trace_context
+        self.id = uuid.uuid4().hex 
\ No newline at end of file
@@ -2,70 +2,541 @@
 Protocolos de comunicação do Mangaba.AI
 """
 import asyncio
+import heapq
+import itertools
 import logging
-from typing import Dict, List, Optional
+import time
+import uuid
+import weakref
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+from .tokens import PromptSegment, TokenCounter, estimate_tokens, fit_segments, token_usage
+from ..utils.context import current_agent
+from ..utils.exceptions import ModelError
+from ..utils.metrics import metrics
+from ..utils.tracing import extract, tracer
 
 logger = logging.getLogger(__name__)
 
+A2A_MESSAGES = metrics.counter(
+    "mangaba_a2a_messages_total",
+    "Mensagens A2A por destino (delivered, queued, routed) ou descarte (dropped, rejected, expired)",
+    ("outcome",)
+)
+A2A_OUTCOMES = {
+    outcome: A2A_MESSAGES.labels(outcome=outcome)
+    for outcome in ("delivered", "queued", "routed", "dropped", "rejected", "expired")
+}
+A2A_QUEUE_DEPTH = metrics.gauge(
+    "mangaba_a2a_queue_depth", "Mensagens A2A aguardando cada agente", ("agent", "queue")
+)
+
+# Protocolos ativos, consultados apenas quando as métricas são lidas
+_PROTOCOLS: "weakref.WeakSet[A2AProtocol]" = weakref.WeakSet()
+
+def _collect_queue_depth() -> None:
+    depths: Dict[Tuple[str, str], int] = {}
+    for protocol in list(_PROTOCOLS):
+        for agent_id, queue in list(protocol.messages.items()):
+            depths[(agent_id, "mailbox")] = depths.get((agent_id, "mailbox"), 0) + len(queue)
+        for agent_id, inbox in list(protocol.inboxes.items()):
+            depths[(agent_id, "inbox")] = depths.get((agent_id, "inbox"), 0) + inbox.qsize()
+    A2A_QUEUE_DEPTH.clear()
+    for (agent_id, kind), depth in depths.items():
+        A2A_QUEUE_DEPTH.set(depth, agent=agent_id, queue=kind)
+
+metrics.register_collector(_collect_queue_depth)
+
 class A2AProtocol:
-    """Protocolo de comunicação entre agentes."""
+    """Protocolo de comunicação entre agentes.
+    
+    Funciona como um intermediário compartilhado: cada destinatário sem
+    callback registrado possui uma fila de prioridade limitada a
+    ``max_messages`` mensagens, e mensagens mais antigas que ``message_ttl``
+    segundos são descartadas. Quando a fila está cheia, a política
+    ``overflow`` decide o que acontece:
+    
+    - ``"drop_lowest"``: descarta a mensagem de menor prioridade (a mais
+      antiga, em caso de empate), que pode ser a própria mensagem nova;
+    - ``"reject"``: recusa a mensagem nova.
+    
+    Destinatários com callback recebem as mensagens por uma caixa de entrada
+    (``asyncio.PriorityQueue`` de até ``inbox_size`` itens) consumida por uma
+    tarefa própria. O remetente só aguarda espaço na caixa (backpressure,
+    limitado a ``send_timeout`` segundos), nunca o processamento, e mensagens
+    que já passaram por ``max_hops`` agentes são descartadas para
+    interromper ciclos de ida e volta.
+    """
     
-    def __init__(self):
-        self.messages: Dict[str, List[Dict]] = {}
+    OVERFLOW_POLICIES = ("drop_lowest", "reject")
+    
+    def __init__(self, max_messages: int = 1000, message_ttl: float = 3600,
+                 priority_levels: Sequence[str] = ("high", "medium", "low"),
+                 overflow: str = "drop_lowest", inbox_size: int = 100, max_hops: int = 8,
+                 send_timeout: Optional[float] = 30):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Política de estouro desconhecida: {overflow}")
+        self.max_messages = max_messages
+        self.message_ttl = message_ttl
+        self.priority_levels = list(priority_levels)
+        self.overflow = overflow
+        self.messages: Dict[str, List[Tuple[int, int, Dict]]] = {}
         self.callbacks = {}
+        self.inbox_size = inbox_size
+        self.max_hops = max_hops
+        self.send_timeout = send_timeout
+        self.inboxes: Dict[str, asyncio.PriorityQueue] = {}
+        # Encaminha mensagens para destinatários fora deste protocolo (outros processos ou nós)
+        self.router: Optional[Callable[[Dict], Awaitable[Optional[bool]]]] = None
+        self.transport = None
+        self.routes: Dict[str, str] = {}
+        self.workers: Dict[str, asyncio.Task] = {}
+        self.dropped = 0
+        self.expired = 0
+        self._sequence = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        _PROTOCOLS.add(self)
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "A2AProtocol":
+        """Cria o protocolo a partir da seção ``communication`` da configuração."""
+        communication = config["communication"]
+        return cls(
+            max_messages=communication["max_messages"],
+            message_ttl=communication["message_ttl"],
+            priority_levels=communication["priority_levels"]
+        )
+    
+    def _priority_index(self, priority: Union[str, int, None]) -> int:
+        """Converte o nível de prioridade (nome ou índice) em posição na lista."""
+        if priority is None:
+            return len(self.priority_levels) // 2
+        if isinstance(priority, int):
+            return min(max(priority, 0), len(self.priority_levels) - 1)
+        try:
+            return self.priority_levels.index(priority)
+        except ValueError:
+            raise ValueError(f"Prioridade desconhecida: {priority}") from None
+    
+    def _purge_expired(self, queue: List[Tuple[int, int, Dict]]) -> None:
+        """Remove mensagens expiradas de uma fila, preservando a ordem de heap."""
+        now = time.monotonic()
+        alive = [item for item in queue if item[2]["expires_at"] > now]
+        if len(alive) != len(queue):
+            self.expired += len(queue) - len(alive)
+            A2A_OUTCOMES["expired"].inc(len(queue) - len(alive))
+            queue[:] = alive
+            heapq.heapify(queue)
     
-    async def send_message(self, sender: str, receiver: str, content: str) -> None:
-        """Envia uma mensagem de um agente para outro."""
-        if receiver not in self.messages:
-            self.messages[receiver] = []
+    async def send_message(self, sender: str, receiver: str, content: str,
+                           priority: Union[str, int, None] = None, hops: int = 0) -> bool:
+        """Envia uma mensagem de um agente para outro.
         
+        ``hops`` indica quantos agentes já encaminharam a conversa. Retorna
+        ``False`` se a mensagem foi descartada (estouro de fila, caixa de
+        entrada cheia por mais de ``send_timeout`` ou limite de saltos).
+        """
+        return await self.deliver(self.build_message(sender, receiver, content, priority, hops))
+    
+    def build_message(self, sender: str, receiver: str, content: str,
+                      priority: Union[str, int, None] = None, hops: int = 0) -> Dict:
+        """Monta uma mensagem com prioridade normalizada, prazo de expiração e contexto de rastreamento."""
+        now = time.monotonic()
         message = {
             "sender": sender,
+            "receiver": receiver,
             "content": content,
-            "timestamp": asyncio.get_event_loop().time()
+            "priority": self.priority_levels[self._priority_index(priority)],
+            "hops": hops,
+            "timestamp": now,
+            "expires_at": now + self.message_ttl
         }
+        # O contexto de rastreamento acompanha a mensagem entre agentes, processos e nós
+        traceparent = tracer.current_traceparent()
+        if traceparent:
+            message["trace"] = traceparent
+        return message
+    
+    async def deliver(self, message: Dict) -> bool:
+        """Entrega uma mensagem já montada (local ou recebida de outro processo)."""
+        sender, receiver = message["sender"], message["receiver"]
+        if message["hops"] > self.max_hops:
+            self.dropped += 1
+            A2A_OUTCOMES["dropped"].inc()
+            logger.warning(f"Mensagem de {sender} para {receiver} descartada após {message['hops']} saltos")
+            return False
+        
+        # Destinatários que não estão neste protocolo são encaminhados pelo
+        # roteador; ``None`` indica que a mensagem deve ficar neste protocolo
+        if receiver not in self.callbacks and self.router is not None:
+            routed = await self.router(message)
+            if routed is not None:
+                A2A_OUTCOMES["routed" if routed else "dropped"].inc()
+                return routed
         
-        self.messages[receiver].append(message)
+        level = self._priority_index(message["priority"])
+        item = (level, next(self._sequence), message)
         
-        # Notifica o receptor se houver um callback registrado
+        # Entrega pela caixa de entrada se houver um callback registrado
         if receiver in self.callbacks:
-            await self.callbacks[receiver](message)
+            inbox = self._inbox(receiver)
+            self._in_flight += 1
+            self._idle.clear()
+            try:
+                await asyncio.wait_for(inbox.put(item), self.send_timeout)
+            except asyncio.TimeoutError:
+                self._done()
+                self.dropped += 1
+                A2A_OUTCOMES["dropped"].inc()
+                logger.warning(f"Caixa de entrada de {receiver} cheia; mensagem de {sender} descartada")
+                return False
+            A2A_OUTCOMES["delivered"].inc()
+            return True
+        
+        queue = self.messages.setdefault(receiver, [])
+        if len(queue) >= self.max_messages:
+            self._purge_expired(queue)
+        if len(queue) >= self.max_messages:
+            self.dropped += 1
+            if self.overflow == "reject":
+                A2A_OUTCOMES["rejected"].inc()
+                logger.warning(f"Fila de {receiver} cheia; mensagem de {sender} recusada")
+                return False
+            A2A_OUTCOMES["dropped"].inc()
+            # Menor prioridade = maior nível; em empate, a mais antiga (menor sequência)
+            victim = max(queue, key=lambda queued: (queued[0], -queued[1]))
+            if (level, -item[1]) >= (victim[0], -victim[1]):
+                logger.warning(f"Fila de {receiver} cheia; mensagem de {sender} descartada")
+                return False
+            queue.remove(victim)
+            heapq.heapify(queue)
+        
+        heapq.heappush(queue, item)
+        A2A_OUTCOMES["queued"].inc()
+        return True
     
-    async def receive_messages(self, agent_id: str) -> List[Dict]:
-        """Recebe todas as mensagens para um agente."""
-        messages = self.messages.get(agent_id, [])
-        self.messages[agent_id] = []  # Limpa as mensagens após recebê-las
+    async def receive_messages(self, agent_id: str, limit: Optional[int] = None) -> List[Dict]:
+        """Recebe as mensagens de um agente, da maior para a menor prioridade."""
+        queue = self.messages.get(agent_id)
+        if not queue:
+            return []
+        
+        now = time.monotonic()
+        messages = []
+        while queue and (limit is None or len(messages) < limit):
+            _, _, message = heapq.heappop(queue)
+            if message["expires_at"] <= now:
+                self.expired += 1
+                A2A_OUTCOMES["expired"].inc()
+                continue
+            messages.append(message)
+        
+        if not queue:
+            del self.messages[agent_id]
         return messages
     
+    def pending(self, agent_id: str) -> int:
+        """Número de mensagens aguardando um agente."""
+        return len(self.messages.get(agent_id, []))
+    
     def register_callback(self, agent_id: str, callback):
         """Registra uma função de callback para notificação de mensagens."""
         self.callbacks[agent_id] = callback
+    
+    async def connect(self, transport, routes: Optional[Dict[str, str]] = None) -> None:
+        """Liga o protocolo a um transporte entre nós.
+        
+        ``routes`` associa nomes de agentes remotos ao endereço do nó que os
+        hospeda; mensagens para eles são enviadas pelo transporte e as
+        recebidas de outros nós são entregues localmente.
+        """
+        self.transport = transport
+        self.routes.update(routes or {})
+        self.router = self._route
+        await transport.start(self.deliver)
+    
+    def add_route(self, agent_id: str, address: str) -> None:
+        """Associa um agente remoto ao endereço do nó que o hospeda."""
+        self.routes[agent_id] = address
+    
+    async def _route(self, message: Dict) -> Optional[bool]:
+        address = self.routes.get(message["receiver"])
+        if address is None:
+            return None
+        await self.transport.send(address, message)
+        return True
+    
+    def _inbox(self, agent_id: str) -> asyncio.PriorityQueue:
+        """Retorna a caixa de entrada do agente, iniciando sua tarefa consumidora."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Filas e tarefas pertencem ao event loop em que foram criadas
+            self.inboxes.clear()
+            self.workers.clear()
+            self._loop = loop
+            self._in_flight = 0
+            self._idle = asyncio.Event()
+            self._idle.set()
+        if agent_id not in self.inboxes:
+            self.inboxes[agent_id] = asyncio.PriorityQueue(maxsize=self.inbox_size)
+            self.workers[agent_id] = loop.create_task(self._drain(agent_id))
+        return self.inboxes[agent_id]
+    
+    async def _drain(self, agent_id: str) -> None:
+        """Consome a caixa de entrada de um agente, uma mensagem por vez."""
+        inbox = self.inboxes[agent_id]
+        while True:
+            _, _, message = await inbox.get()
+            try:
+                if message["expires_at"] <= time.monotonic():
+                    self.expired += 1
+                    A2A_OUTCOMES["expired"].inc()
+                    continue
+                parent = extract(message.get("trace"))
+                if parent is None:
+                    await self.callbacks[agent_id](message)
+                    continue
+                attributes = {
+                    "a2a.sender": message["sender"],
+                    "a2a.receiver": agent_id,
+                    "a2a.hops": message["hops"],
+                    "a2a.queue_seconds": time.monotonic() - message["timestamp"]
+                }
+                with tracer.span("a2a.receive", attributes, parent=parent, kind="consumer"):
+                    await self.callbacks[agent_id](message)
+            except Exception as e:
+                logger.error(f"Erro ao entregar mensagem para {agent_id}: {e}")
+            finally:
+                inbox.task_done()
+                self._done()
+    
+    def _done(self) -> None:
+        self._in_flight -= 1
+        if self._in_flight == 0:
+            self._idle.set()
+    
+    def queue_depth(self, agent_id: str) -> int:
+        """Número de mensagens aguardando na caixa de entrada ou na fila do agente."""
+        inbox = self.inboxes.get(agent_id)
+        return (inbox.qsize() if inbox else 0) + self.pending(agent_id)
+    
+    async def join(self) -> None:
+        """Aguarda até que todas as mensagens entregues por caixa de entrada sejam processadas."""
+        await self._idle.wait()
+    
+    async def close(self) -> None:
+        """Encerra as tarefas consumidoras das caixas de entrada e o transporte."""
+        if self.transport is not None:
+            await self.transport.close()
+        workers = list(self.workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self.workers.clear()
+        self.inboxes.clear()
+        self._loop = None
+        self._in_flight = 0
+        self._idle.set()
+
+def encode_message(message: Dict) -> Dict:
+    """Prepara uma mensagem para outro processo ou nó.
+    
+    O prazo de expiração é convertido em tempo restante, pois o relógio
+    monotônico não é compartilhado, e a mensagem recebe um identificador
+    único para descarte de duplicatas.
+    """
+    encoded = dict(message)
+    encoded["expires_in"] = encoded.pop("expires_at") - time.monotonic()
+    encoded.pop("timestamp", None)
+    encoded.setdefault("id", uuid.uuid4().hex)
+    return encoded
+
+def decode_message(encoded: Dict) -> Dict:
+    """Reconstrói uma mensagem recebida de outro processo ou nó."""
+    message = dict(encoded)
+    now = time.monotonic()
+    message["timestamp"] = now
+    message["expires_at"] = now + message.pop("expires_in")
+    return message
+
+TURN_SEPARATOR = "\n\n"
+
+class ContextWindow:
+    """Janela limitada de turnos (entrada e resposta) de um modelo.
+
+    Mantém no máximo ``max_contexts`` turnos, descarta turnos mais antigos que
+    ``context_ttl`` segundos e respeita um orçamento de ``max_tokens``,
+    removendo sempre os turnos mais antigos primeiro.
+    """
+
+    def __init__(self, max_contexts: int = 10, context_ttl: float = 3600, max_tokens: int = 4096):
+        self.max_contexts = max_contexts
+        self.context_ttl = context_ttl
+        self.max_tokens = max_tokens
+        self.turns: Deque[Dict] = deque()
+        self.tokens = 0
+
+    def append(self, prompt: str, response: str = "") -> None:
+        """Adiciona um turno e aplica os limites da janela."""
+        text = self._render_turn(prompt, response)
+        turn = {"text": text, "tokens": estimate_tokens(text), "timestamp": time.monotonic()}
+        self.turns.append(turn)
+        self.tokens += turn["tokens"]
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove turnos expirados ou excedentes, dos mais antigos para os mais novos."""
+        deadline = time.monotonic() - self.context_ttl
+        while self.turns and (
+            len(self.turns) > self.max_contexts
+            or self.tokens > self.max_tokens
+            or self.turns[0]["timestamp"] < deadline
+        ):
+            self.tokens -= self.turns.popleft()["tokens"]
+
+    def render(self) -> str:
+        """Retorna o texto da janela atual."""
+        self.evict()
+        return TURN_SEPARATOR.join(turn["text"] for turn in self.turns)
+
+    def clear(self) -> None:
+        """Descarta todos os turnos."""
+        self.turns.clear()
+        self.tokens = 0
+
+    @staticmethod
+    def _render_turn(prompt: str, response: str) -> str:
+        if response:
+            return f"Entrada: {prompt}\nResposta: {response}"
+        return f"Entrada: {prompt}"
+
+FUSED_PROMPT = """Contexto anterior:
+{context}
+
+Nova entrada:
+{prompt}
+
+Por favor, considere o contexto anterior ao gerar sua resposta."""
 
 class MCPProtocol:
-    """Protocolo de fusão de contexto entre modelos."""
+    """Protocolo de fusão de contexto entre modelos.
+    
+    Por padrão, funde a janela de turnos mais recentes. Com ``retrieval_k``,
+    cada turno também é guardado em uma ``VectorMemory`` (até
+    ``max_memories`` por modelo) e apenas os ``retrieval_k`` turnos mais
+    relevantes para o novo prompt são fundidos, em ordem cronológica; requer
+    o pacote opcional ``numpy``.
+    """
     
-    def __init__(self):
-        self.context: Dict[str, str] = {}
+    def __init__(self, max_contexts: int = 10, context_ttl: float = 3600, max_context_tokens: int = 4096,
+                 retrieval_k: Optional[int] = None, max_memories: Optional[int] = None, embedder=None):
+        self.context: Dict[str, ContextWindow] = {}
         self.models = {}
+        self.max_contexts = max_contexts
+        self.context_ttl = context_ttl
+        self.max_context_tokens = max_context_tokens
+        self.retrieval_k = retrieval_k
+        self.max_memories = max_memories
+        self.embedder = embedder
+        self.memories: Dict[str, Any] = {}
+        self._turns = 0
     
     def add_model(self, model_id: str, model) -> None:
         """Adiciona um modelo ao protocolo."""
         self.models[model_id] = model
     
-    async def fuse_context(self, prompt: str, model_id: str) -> str:
-        """Funde o contexto atual com um novo prompt."""
-        current_context = self.context.get(model_id, "")
-        full_prompt = f"""Contexto anterior:
-{current_context}
+    def _window(self, model_id: str) -> ContextWindow:
+        if model_id not in self.context:
+            self.context[model_id] = ContextWindow(
+                self.max_contexts, self.context_ttl, self.max_context_tokens
+            )
+        return self.context[model_id]
+    
+    async def fuse_context(self, prompt: str, model_id: str, max_tokens: Optional[int] = None,
+                           counter: Optional[TokenCounter] = None) -> str:
+        """Funde o contexto atual com um novo prompt.
+        
+        Apenas a janela limitada de turnos anteriores é incluída, de modo que
+        o custo da fusão é proporcional à janela e não ao histórico completo.
+        O novo turno é registrado com ``update_context`` após a resposta.
 
-Nova entrada:
-{prompt}
+        Com ``max_tokens``, o resultado é ajustado a esse limite (contado por
+        ``counter``): os turnos mais antigos são truncados ou descartados
+        primeiro e, se o próprio prompt não couber, levanta ``ModelError``.
+        """
+        with tracer.span("mcp.fuse_context", {"mcp.model_id": model_id}) as span:
+            if self.retrieval_k:
+                current_context = TURN_SEPARATOR.join(self._retrieve(prompt, model_id))
+            else:
+                current_context = self.get_context(model_id)
+            if tracer.enabled:
+                span.set_attribute("mcp.context_tokens", estimate_tokens(current_context))
+        fused = FUSED_PROMPT.format(context=current_context, prompt=prompt) if current_context else prompt
+        if max_tokens is None:
+            return fused
+        counter = counter or TokenCounter()
+        if counter.count(fused) <= max_tokens:
+            return fused
+        return self._fit_context(prompt, model_id, max_tokens, counter)
 
-Por favor, considere o contexto anterior ao gerar sua resposta."""
-        
-        self.context[model_id] = full_prompt
-        return full_prompt
+    def _fit_context(self, prompt: str, model_id: str, max_tokens: int, counter: TokenCounter) -> str:
+        """Funde apenas os turnos que cabem em ``max_tokens``, priorizando os mais recentes."""
+        prompt_tokens = counter.count(prompt)
+        if prompt_tokens > max_tokens:
+            raise ModelError(
+                f"Prompt com {prompt_tokens} tokens excede o limite de {max_tokens} tokens",
+                "context_length"
+            )
+        if self.retrieval_k:
+            turns = self._retrieve(prompt, model_id)
+        else:
+            turns = [turn["text"] for turn in self._window(model_id).turns]
+        budget = (max_tokens - counter.count(FUSED_PROMPT.format(context="", prompt=prompt))
+                  - len(turns) * counter.count(TURN_SEPARATOR))
+        fitted = fit_segments([PromptSegment(text, keep="tail") for text in turns], max(budget, 0), counter)
+        kept = [segment.text for segment in fitted if segment is not None]
+
+        dropped = sum(map(counter.count, turns)) - sum(map(counter.count, kept))
+        token_usage.record(current_agent.get(), dropped_tokens=dropped)
+        if not kept:
+            return prompt
+        return FUSED_PROMPT.format(context=TURN_SEPARATOR.join(kept), prompt=prompt)
+
+    def _retrieve(self, prompt: str, model_id: str) -> List[str]:
+        """Turnos mais relevantes para ``prompt``, do mais antigo para o mais recente."""
+        memory = self.memories.get(model_id)
+        if memory is None:
+            return []
+        matches = memory.search(prompt, self.retrieval_k)
+        matches.sort(key=lambda match: match.metadata["turn"])
+        return [match.metadata["text"] for match in matches]
+
+    def update_context(self, model_id: str, prompt: str, response: str = "") -> None:
+        """Registra um turno (entrada original e resposta) no contexto do modelo."""
+        self._window(model_id).append(prompt, response)
+        if self.retrieval_k:
+            memory = self.memories.get(model_id)
+            if memory is None:
+                # Importado sob demanda: a recuperação exige o numpy
+                from .vector_memory import VectorMemory
+
+                memory = self.memories[model_id] = VectorMemory(self.embedder, max_size=self.max_memories)
+            self._turns += 1
+            # Apenas a entrada e a resposta são comparadas; os rótulos do turno
+            # são comuns a todos e só adicionariam ruído à similaridade
+            memory.add(f"{prompt}\n{response}",
+                       {"turn": self._turns, "text": ContextWindow._render_turn(prompt, response)})
 
     def get_context(self, model_id: str) -> str:
         """Obtém o contexto atual de um modelo."""
-        return self.context.get(model_id, "") 
\ No newline at end of file
+        window = self.context.get(model_id)
+        return window.render() if window else ""
+
+    def clear_context(self, model_id: str) -> None:
+        """Remove o contexto de um modelo."""
+        self.context.pop(model_id, None)
+        self.memories.pop(model_id, None)
@@ -0,0 +1,139 @@
+"""
+Limitação de taxa de requisições aos modelos do Mangaba.AI.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Balde de fichas com reposição contínua.
+
+    As retiradas funcionam como reservas: o saldo pode ficar negativo e quem
+    reservou aguarda o tempo necessário para que ele volte a zero, o que
+    preserva a ordem de chegada.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def set_rate(self, rate_per_minute: float) -> None:
+        """Altera a taxa de reposição, preservando o saldo acumulado."""
+        self._refill(time.monotonic())
+        self.rate = rate_per_minute / 60.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, amount: float) -> float:
+        """Retira ``amount`` fichas e retorna quantos segundos aguardar."""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def release(self, amount: float) -> None:
+        """Devolve fichas de uma reserva que não foi usada."""
+        self._refill(time.monotonic())
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+class RateLimiter:
+    """Limitador assíncrono de requisições e tokens por minuto.
+
+    A taxa efetiva se adapta aos sinais do provedor: cada erro 429 reduz a
+    taxa multiplicativamente (no máximo uma vez por janela de resfriamento)
+    e respeita o ``retry_after`` informado; cada sucesso recupera uma
+    fração da taxa configurada, até o teto. Assim a vazão converge para
+    perto da cota em vez de oscilar.
+    """
+
+    def __init__(self, requests_per_minute: float = 1000, tokens_per_minute: Optional[float] = None,
+                 burst: Optional[float] = None, decrease_factor: float = 0.5, recovery_step: float = 0.05,
+                 min_scale: float = 0.05, cooldown: float = 1.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.decrease_factor = decrease_factor
+        self.recovery_step = recovery_step
+        self.min_scale = min_scale
+        self.cooldown = cooldown
+        self.scale = 1.0
+        self.requests = TokenBucket(requests_per_minute, burst)
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.blocked_until = 0.0
+        self.last_decrease = float("-inf")
+        self.throttled = 0
+        self.rate_limited = 0
+
+    def _apply_scale(self) -> None:
+        self.requests.set_rate(self.requests_per_minute * self.scale)
+        if self.tokens is not None:
+            self.tokens.set_rate(self.tokens_per_minute * self.scale)
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """Aguarda permissão para uma requisição que consumirá ``tokens`` tokens.
+
+        Se a espera for cancelada (inclusive por um prazo expirado), a reserva
+        é devolvida para não atrasar as próximas requisições.
+        """
+        wait = self.requests.reserve(1)
+        reserved = min(tokens, self.tokens.capacity) if self.tokens is not None and tokens else 0
+        if reserved:
+            wait = max(wait, self.tokens.reserve(reserved))
+        wait = max(wait, self.blocked_until - time.monotonic())
+        if wait > 0:
+            self.throttled += 1
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.requests.release(1)
+                if reserved:
+                    self.tokens.release(reserved)
+                raise
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> None:
+        """Registra um erro 429 do provedor, reduzindo a taxa efetiva."""
+        now = time.monotonic()
+        self.rate_limited += 1
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+        if now - self.last_decrease < max(self.cooldown, retry_after or 0):
+            return
+        self.last_decrease = now
+        self.scale = max(self.min_scale, self.scale * self.decrease_factor)
+        self._apply_scale()
+        logger.warning(f"Limite de requisições atingido; taxa reduzida para {self.scale:.0%} da cota")
+
+    def on_success(self) -> None:
+        """Registra uma requisição bem-sucedida, recuperando a taxa gradualmente."""
+        if self.scale < 1.0:
+            self.scale = min(1.0, self.scale + self.recovery_step)
+            self._apply_scale()
+
+    def stats(self) -> Dict[str, float]:
+        """Retorna o estado atual do limitador."""
+        return {
+            "scale": self.scale,
+            "requests_per_minute": self.requests_per_minute * self.scale,
+            "tokens_per_minute": (self.tokens_per_minute or 0) * self.scale,
+            "throttled": self.throttled,
+            "rate_limited": self.rate_limited
+        }
+
+_limiters: Dict[str, RateLimiter] = {}
+
+def get_rate_limiter(api_key: str, requests_per_minute: float = 1000,
+                     tokens_per_minute: Optional[float] = None) -> RateLimiter:
+    """Retorna o limitador compartilhado de uma chave de API, criando-o se necessário."""
+    key = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+    if key not in _limiters:
+        _limiters[key] = RateLimiter(requests_per_minute, tokens_per_minute)
+    return _limiters[key]
@@ -0,0 +1,112 @@
+"""
+Política de novas tentativas e prazos do Mangaba.AI.
+"""
+import asyncio
+import contextvars
+import logging
+import random
+import sys
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from ..utils.context import current_agent
+from ..utils.exceptions import APIError, MangabaError, RateLimitError, TimeoutError
+from ..utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+RETRIES = metrics.counter("mangaba_retries_total", "Novas tentativas após falhas transitórias", ("agent", "error"))
+
+# Prazo absoluto (relógio do event loop) do workflow em execução
+current_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "mangaba_deadline", default=None
+)
+
+def classify_error(error: BaseException) -> BaseException:
+    """Converte erros de rede e de tempo nas exceções do Mangaba.AI."""
+    if isinstance(error, MangabaError):
+        return error
+    if isinstance(error, asyncio.TimeoutError):
+        return TimeoutError(f"Tempo esgotado: {error or 'operação excedeu o limite'}")
+    if isinstance(error, (ConnectionError, OSError)):
+        return APIError(f"Falha de comunicação: {error}")
+    # Se o aiohttp não foi carregado, o erro não pode ter vindo dele
+    aiohttp = sys.modules.get("aiohttp")
+    if aiohttp is not None and isinstance(error, aiohttp.ClientError):
+        return APIError(f"Falha de comunicação: {error}")
+    return error
+
+def is_transient(error: BaseException) -> bool:
+    """Indica se vale a pena tentar novamente após o erro."""
+    if isinstance(error, (TimeoutError, RateLimitError)):
+        return True
+    if isinstance(error, APIError):
+        # Erros 4xx (exceto 408) indicam problema na requisição, não no serviço
+        code = error.error_code
+        return code is None or not code.isdigit() or int(code) >= 500 or int(code) == 408
+    return False
+
+class RetryPolicy:
+    """Executa corrotinas com novas tentativas, backoff exponencial com jitter e prazos.
+
+    Cada tentativa é limitada por ``timeout`` segundos e todas respeitam o
+    prazo do workflow (``current_deadline``), de modo que uma chamada lenta
+    não segura o lote inteiro.
+    """
+
+    def __init__(self, max_retries: int = 3, timeout: Optional[float] = None, base_delay: float = 0.5,
+                 max_delay: float = 30.0, retry_on: Optional[Tuple[Type[BaseException], ...]] = None):
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = retry_on
+        self.retries = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "RetryPolicy":
+        """Cria a política de um agente a partir de ``agents.max_retries``."""
+        return cls(max_retries=config["agents"]["max_retries"])
+
+    def should_retry(self, error: BaseException) -> bool:
+        if self.retry_on is not None:
+            return isinstance(error, self.retry_on)
+        return is_transient(error)
+
+    def backoff(self, attempt: int) -> float:
+        """Atraso antes da próxima tentativa ("full jitter")."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def run(self, fn: Callable[[], Awaitable[Any]], deadline: Optional[float] = None) -> Any:
+        """Executa ``fn`` até obter sucesso, esgotar as tentativas ou o prazo."""
+        loop = asyncio.get_running_loop()
+        if deadline is None:
+            deadline = current_deadline.get()
+
+        for attempt in range(self.max_retries + 1):
+            timeout = self.timeout
+            if deadline is not None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise TimeoutError("Prazo do workflow esgotado")
+                timeout = remaining if timeout is None else min(timeout, remaining)
+
+            try:
+                return await asyncio.wait_for(fn(), timeout)
+            except Exception as e:
+                error = classify_error(e)
+                delay = self.backoff(attempt)
+                if isinstance(error, RateLimitError) and error.retry_after:
+                    delay = max(delay, error.retry_after)
+
+                if (attempt == self.max_retries or not self.should_retry(error)
+                        or (deadline is not None and loop.time() + delay >= deadline)):
+                    if error is e:
+                        raise
+                    raise error from e
+
+                self.retries += 1
+                RETRIES.inc(agent=current_agent.get(), error=type(error).__name__)
+                logger.warning(
+                    f"Tentativa {attempt + 1} falhou ({error}); nova tentativa em {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
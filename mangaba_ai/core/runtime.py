@@ -0,0 +1,347 @@
+"""
+Execução de agentes em múltiplos processos.
+"""
+import asyncio
+import bisect
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .protocols import A2AProtocol, decode_message, encode_message
+from ..utils.exceptions import WorkflowError
+from ..utils.tracing import extract, tracer
+
+logger = logging.getLogger(__name__)
+
+# Intervalo, em segundos, entre verificações de processos de trabalho encerrados
+LIVENESS_INTERVAL = 0.2
+
+class HashRing:
+    """Anel de hash consistente que associa chaves (nomes de agentes) a nós.
+
+    Cada nó ocupa ``replicas`` posições virtuais, o que distribui as chaves de
+    forma equilibrada e move apenas uma fração delas quando nós mudam.
+    """
+
+    def __init__(self, nodes: Sequence[Any], replicas: int = 64):
+        self.replicas = replicas
+        self._ring: List[int] = []
+        self._nodes: Dict[int, Any] = {}
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+    def add(self, node: Any) -> None:
+        """Adiciona um nó ao anel."""
+        for i in range(self.replicas):
+            position = self._hash(f"{node}#{i}")
+            bisect.insort(self._ring, position)
+            self._nodes[position] = node
+
+    def remove(self, node: Any) -> None:
+        """Remove um nó do anel."""
+        for i in range(self.replicas):
+            position = self._hash(f"{node}#{i}")
+            index = bisect.bisect_left(self._ring, position)
+            if index < len(self._ring) and self._ring[index] == position:
+                del self._ring[index]
+                del self._nodes[position]
+
+    def get(self, key: str) -> Any:
+        """Retorna o nó responsável pela chave."""
+        if not self._ring:
+            raise WorkflowError("Anel de hash vazio")
+        index = bisect.bisect(self._ring, self._hash(key)) % len(self._ring)
+        return self._nodes[self._ring[index]]
+
+def _portable_error(error: BaseException) -> BaseException:
+    """Garante que a exceção possa ser enviada a outro processo."""
+    try:
+        pickle.loads(pickle.dumps(error))
+        return error
+    except Exception:
+        return WorkflowError(f"{type(error).__name__}: {error}")
+
+def _forward(source, loop: asyncio.AbstractEventLoop, target: asyncio.Queue, last: str) -> None:
+    """Repassa os itens de uma fila de ``multiprocessing`` ao event loop.
+
+    Roda em uma thread própria, para que a leitura bloqueante não ocupe o
+    executor padrão do loop; termina após repassar um item do tipo ``last``.
+    """
+    while True:
+        item = source.get()
+        try:
+            loop.call_soon_threadsafe(target.put_nowait, item)
+        except RuntimeError:
+            return  # loop já encerrado
+        if item[0] == last:
+            return
+
+async def _worker_loop(index: int, specs: List[Dict], model_factory: Callable[[], Any],
+                       a2a_options: Dict[str, Any], inboxes: List, results) -> None:
+    """Hospeda os agentes de um processo e atende os comandos recebidos."""
+    from .models import Agent
+
+    loop = asyncio.get_running_loop()
+    owners = {spec["name"]: spec["worker"] for spec in specs}
+    a2a = A2AProtocol(**a2a_options)
+
+    async def route(message: Dict) -> bool:
+        # Agentes de outros processos recebem direto na fila do processo dono;
+        # os demais destinatários ficam na caixa de mensagens do processo principal
+        owner = owners.get(message["receiver"])
+        target = inboxes[owner] if owner is not None else results
+        # Filas sem limite de tamanho: ``put`` não bloqueia
+        target.put(("message", encode_message(message)))
+        return True
+
+    a2a.router = route
+    model = model_factory()
+    agents = {
+        spec["name"]: Agent(spec["name"], spec["role"], model, spec["goal"], a2a=a2a)
+        for spec in specs if spec["worker"] == index
+    }
+
+    async def execute(request_id: int, name: str, task: str, context: Optional[Dict],
+                      traceparent: Optional[str]) -> None:
+        try:
+            attributes = {"agent": name, "runtime.worker": index}
+            with tracer.span("runtime.execute", attributes, parent=extract(traceparent), kind="server"):
+                result = ("result", request_id, True, await agents[name].execute(task, context=context))
+        except Exception as e:
+            result = ("result", request_id, False, _portable_error(e))
+        results.put(result)
+
+    pending = set()
+    commands: asyncio.Queue = asyncio.Queue()
+    threading.Thread(target=_forward, args=(inboxes[index], loop, commands, "stop"), daemon=True).start()
+    while True:
+        command = await commands.get()
+        if command[0] == "stop":
+            break
+        if command[0] == "execute":
+            job = loop.create_task(execute(*command[1:]))
+        else:
+            job = loop.create_task(a2a.deliver(decode_message(command[1])))
+        pending.add(job)
+        job.add_done_callback(pending.discard)
+
+    await asyncio.gather(*pending, return_exceptions=True)
+    await a2a.join()
+    await a2a.close()
+    # Processos de trabalho não executam os handlers de ``atexit``
+    tracer.flush()
+
+def _worker_main(*args) -> None:
+    """Ponto de entrada dos processos de trabalho."""
+    asyncio.run(_worker_loop(*args))
+
+class RemoteAgent:
+    """Representante local de um agente hospedado em outro processo.
+
+    Pode ser usado em ``Task`` e em ``MangabaAI.execute`` como um ``Agent``.
+    """
+
+    def __init__(self, runtime: "ProcessRuntime", name: str, role: str, goal: str):
+        self.runtime = runtime
+        self.name = name
+        self.role = role
+        self.goal = goal
+
+    async def execute(self, task: str, context: Optional[Dict[str, str]] = None) -> str:
+        """Executa uma tarefa no processo que hospeda o agente."""
+        return await self.runtime.execute(self.name, task, context)
+
+class ProcessRuntime:
+    """Distribui agentes em um conjunto de processos de trabalho.
+
+    Cada agente é atribuído a um processo por hash consistente do nome. Cada
+    processo tem seu próprio event loop e ``A2AProtocol``; mensagens entre
+    agentes de processos diferentes trafegam por filas de
+    ``multiprocessing`` diretamente entre os processos, de modo que a vazão
+    acompanha o número de núcleos. Mensagens destinadas a nomes que não são
+    agentes (por exemplo, o próprio usuário) ficam disponíveis em
+    ``receive_messages``. Se um processo de trabalho terminar inesperadamente,
+    as tarefas pendentes nele falham com ``WorkflowError``.
+
+    ``model_factory`` é chamado em cada processo para criar o modelo dos
+    agentes; com o método de início ``spawn`` ele precisa ser serializável
+    (uma função ou classe de módulo).
+    """
+
+    def __init__(self, model_factory: Callable[[], Any], workers: Optional[int] = None,
+                 config: Optional[Dict[str, Any]] = None, start_method: Optional[str] = None):
+        self.model_factory = model_factory
+        self.workers = workers or os.cpu_count() or 1
+        self.ring = HashRing(range(self.workers))
+        self.a2a = A2AProtocol.from_config(config) if config else A2AProtocol()
+        self._context = multiprocessing.get_context(start_method)
+        self._specs: List[Dict] = []
+        self._processes: List = []
+        self._inboxes: List = []
+        self._results = None
+        self._reader: Optional[asyncio.Task] = None
+        self._futures: Dict[int, asyncio.Future] = {}
+        # Processo de trabalho que atende cada requisição pendente
+        self._owners: Dict[int, int] = {}
+        self._stopping = False
+        self._ids = itertools.count()
+
+    def add_agent(self, name: str, role: str, goal: str = "") -> RemoteAgent:
+        """Registra um agente; deve ser chamado antes de ``start``."""
+        if self._processes:
+            raise WorkflowError("Agentes devem ser adicionados antes de iniciar o runtime")
+        self._specs.append({"name": name, "role": role, "goal": goal, "worker": self.ring.get(name)})
+        return RemoteAgent(self, name, role, goal)
+
+    def worker_of(self, name: str) -> int:
+        """Índice do processo que hospeda o agente."""
+        return self.ring.get(name)
+
+    async def start(self) -> None:
+        """Inicia os processos de trabalho."""
+        if self._processes:
+            return
+        a2a_options = {
+            "max_messages": self.a2a.max_messages,
+            "message_ttl": self.a2a.message_ttl,
+            "priority_levels": self.a2a.priority_levels,
+            "max_hops": self.a2a.max_hops
+        }
+        self._inboxes = [self._context.Queue() for _ in range(self.workers)]
+        self._results = self._context.Queue()
+        for index in range(self.workers):
+            process = self._context.Process(
+                target=_worker_main,
+                args=(index, self._specs, self.model_factory, a2a_options, self._inboxes, self._results),
+                daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+        self._stopping = False
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        threading.Thread(target=self._watch_results, args=(loop, items), daemon=True).start()
+        self._reader = loop.create_task(self._read_results(items))
+
+    def _watch_results(self, loop: asyncio.AbstractEventLoop, items: asyncio.Queue) -> None:
+        """Thread que lê a fila de resultados e detecta processos encerrados."""
+        results, processes, reported = self._results, list(self._processes), set()
+        while True:
+            try:
+                item = results.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                # Resultados já enviados por um processo chegam antes do aviso de término
+                for index, process in enumerate(processes):
+                    if index not in reported and process.exitcode is not None:
+                        reported.add(index)
+                        item = ("exited", index, process.exitcode)
+                        try:
+                            loop.call_soon_threadsafe(items.put_nowait, item)
+                        except RuntimeError:
+                            return
+                continue
+            try:
+                loop.call_soon_threadsafe(items.put_nowait, item)
+            except RuntimeError:
+                return
+            if item[0] == "closed":
+                return
+
+    async def _read_results(self, items: asyncio.Queue) -> None:
+        """Recebe resultados e mensagens enviados pelos processos de trabalho."""
+        while True:
+            item = await items.get()
+            if item[0] == "closed":
+                break
+            if item[0] == "message":
+                await self.a2a.deliver(decode_message(item[1]))
+                continue
+            if item[0] == "exited":
+                self._fail_worker(*item[1:])
+                continue
+            _, request_id, ok, value = item
+            self._owners.pop(request_id, None)
+            future = self._futures.pop(request_id, None)
+            if future is None or future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def _fail_worker(self, worker: int, exitcode: int) -> None:
+        """Falha as requisições pendentes de um processo de trabalho encerrado."""
+        if not self._stopping:
+            logger.error("Processo de trabalho %s encerrou inesperadamente (código %s)", worker, exitcode)
+        for request_id in [request_id for request_id, owner in self._owners.items() if owner == worker]:
+            del self._owners[request_id]
+            future = self._futures.pop(request_id)
+            if not future.done():
+                future.set_exception(WorkflowError(
+                    f"Processo de trabalho {worker} encerrou (código {exitcode}) antes de responder"
+                ))
+
+    async def _submit(self, worker: int, command: tuple) -> None:
+        # Filas sem limite de tamanho: ``put`` não bloqueia
+        self._inboxes[worker].put(command)
+
+    async def execute(self, name: str, task: str, context: Optional[Dict[str, str]] = None) -> str:
+        """Executa uma tarefa no agente indicado."""
+        if not self._processes:
+            raise WorkflowError("Runtime não iniciado")
+        worker = self.worker_of(name)
+        exitcode = self._processes[worker].exitcode
+        if exitcode is not None:
+            raise WorkflowError(f"Processo de trabalho {worker} encerrou (código {exitcode})")
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._futures[request_id] = future
+        self._owners[request_id] = worker
+        command = ("execute", request_id, name, task, context, tracer.current_traceparent())
+        await self._submit(worker, command)
+        return await future
+
+    async def send_message(self, sender: str, receiver: str, content: str,
+                           priority: Optional[str] = None) -> bool:
+        """Envia uma mensagem a um agente hospedado pelo runtime."""
+        message = self.a2a.build_message(sender, receiver, content, priority)
+        if receiver not in {spec["name"] for spec in self._specs}:
+            return await self.a2a.deliver(message)
+        await self._submit(self.worker_of(receiver), ("message", encode_message(message)))
+        return True
+
+    async def receive_messages(self, agent_id: str) -> List[Dict]:
+        """Recebe as mensagens enviadas pelos agentes a um destinatário externo."""
+        return await self.a2a.receive_messages(agent_id)
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Encerra os processos de trabalho após concluírem o que está em andamento."""
+        loop = asyncio.get_running_loop()
+        self._stopping = True
+        for worker in range(len(self._processes)):
+            await self._submit(worker, ("stop",))
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                process.terminate()
+        if self._results is not None:
+            self._results.put(("closed",))
+        if self._reader is not None:
+            await self._reader
+        for future in self._futures.values():
+            if not future.done():
+                future.set_exception(WorkflowError("Runtime encerrado"))
+        self._futures.clear()
+        self._owners.clear()
+        self._processes = []
+        self._reader = None
@@ -0,0 +1,158 @@
+"""
+Escalonador de tarefas do Mangaba.AI.
+"""
+import asyncio
+import heapq
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from .retry import RetryPolicy
+from ..utils.context import current_task
+from ..utils.exceptions import WorkflowError
+from ..utils.metrics import metrics
+from ..utils.tracing import extract, tracer
+
+logger = logging.getLogger(__name__)
+
+TASKS = metrics.counter("mangaba_tasks_total", "Tarefas concluídas pelo escalonador", ("outcome",))
+TASK_LATENCY = metrics.histogram("mangaba_task_seconds", "Duração das tarefas, incluindo novas tentativas")
+TASKS_RUNNING = metrics.gauge("mangaba_tasks_running", "Tarefas em execução")
+TASKS_READY = metrics.gauge("mangaba_tasks_ready", "Tarefas prontas aguardando uma vaga de execução")
+
+class TaskScheduler:
+    """Executa tarefas respeitando o grafo de dependências (DAG).
+
+    Tarefas prontas (sem dependências pendentes) são executadas em paralelo,
+    até ``max_concurrent_tasks`` por vez, em ordem decrescente de prioridade.
+    Os resultados das dependências são repassados à tarefa seguinte, de modo
+    que o tempo total acompanha a profundidade do grafo e não o número de
+    tarefas.
+    """
+
+    def __init__(self, max_concurrent_tasks: int = 5, retry_policy: Optional[RetryPolicy] = None):
+        if max_concurrent_tasks < 1:
+            raise ValueError("max_concurrent_tasks deve ser maior que zero")
+        self.max_concurrent_tasks = max_concurrent_tasks
+        self.retry_policy = retry_policy or RetryPolicy(max_retries=0)
+
+    def _build_graph(self, tasks: list):
+        """Monta a lista de dependentes e o número de dependências de cada tarefa."""
+        index = {id(task): i for i, task in enumerate(tasks)}
+        dependents: List[List[int]] = [[] for _ in tasks]
+        pending = [0] * len(tasks)
+
+        for i, task in enumerate(tasks):
+            for dependency in getattr(task, "dependencies", []):
+                j = index.get(id(dependency))
+                if j is None:
+                    raise WorkflowError(
+                        f"Dependência '{dependency.description}' da tarefa "
+                        f"'{task.description}' não faz parte do lote"
+                    )
+                dependents[j].append(i)
+                pending[i] += 1
+
+        # Ordenação topológica (Kahn) apenas para detectar ciclos antes de executar
+        remaining = list(pending)
+        queue = [i for i, count in enumerate(remaining) if count == 0]
+        visited = 0
+        while queue:
+            i = queue.pop()
+            visited += 1
+            for j in dependents[i]:
+                remaining[j] -= 1
+                if remaining[j] == 0:
+                    queue.append(j)
+        if visited != len(tasks):
+            raise WorkflowError("Ciclo de dependências detectado entre as tarefas")
+
+        return index, dependents, pending
+
+    async def _run_task(self, task: Any, upstream: Dict[str, Any]) -> Any:
+        """Executa uma tarefa, com novas tentativas, dentro do seu span."""
+        attributes = {
+            "task.description": task.description,
+            "task.priority": getattr(task, "priority", 0),
+            "task.agent": getattr(task.agent, "name", ""),
+            "task.dependencies": len(upstream)
+        }
+        token = current_task.set(getattr(task, "id", "") or task.description)
+        parent = extract(getattr(task, "trace_context", None))
+        try:
+            with tracer.span("task", attributes, parent=parent) as span:
+                if span.traceparent:
+                    task.trace_context = span.traceparent
+                return await self.retry_policy.run(
+                    lambda: task.agent.execute(task.description, context=upstream or None)
+                )
+        finally:
+            current_task.reset(token)
+
+    async def run(self, tasks: list) -> Dict[int, Any]:
+        """Executa as tarefas e retorna um dicionário índice -> resultado.
+
+        Falhas são retornadas como a própria exceção; tarefas cujas
+        dependências falharam não são executadas.
+        """
+        index, dependents, pending = self._build_graph(tasks)
+        results: Dict[int, Any] = {}
+        ready = [(-getattr(task, "priority", 0), i) for i, task in enumerate(tasks) if pending[i] == 0]
+        heapq.heapify(ready)
+        running: Dict[asyncio.Future, int] = {}
+        started: Dict[asyncio.Future, float] = {}
+        # Parcela deste lote no medidor de tarefas prontas (compartilhado entre lotes)
+        reported_ready = 0
+
+        def release(i: int) -> None:
+            for j in dependents[i]:
+                pending[j] -= 1
+                if pending[j] == 0:
+                    heapq.heappush(ready, (-getattr(tasks[j], "priority", 0), j))
+
+        try:
+            while ready or running:
+                while ready and len(running) < self.max_concurrent_tasks:
+                    _, i = heapq.heappop(ready)
+                    task = tasks[i]
+                    dependencies = getattr(task, "dependencies", [])
+                    failed = [dep for dep in dependencies if isinstance(results[index[id(dep)]], BaseException)]
+                    if failed:
+                        results[i] = WorkflowError(
+                            f"Dependência '{failed[0].description}' falhou"
+                        )
+                        TASKS.inc(outcome="skipped")
+                        release(i)
+                        continue
+
+                    upstream = {dep.description: results[index[id(dep)]] for dep in dependencies}
+                    future = asyncio.ensure_future(self._run_task(task, upstream))
+                    running[future] = i
+                    started[future] = time.perf_counter()
+                    TASKS_RUNNING.inc()
+
+                TASKS_READY.inc(len(ready) - reported_ready)
+                reported_ready = len(ready)
+                if not running:
+                    break
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    i = running.pop(future)
+                    TASKS_RUNNING.dec()
+                    TASK_LATENCY.observe(time.perf_counter() - started.pop(future))
+                    try:
+                        results[i] = future.result()
+                        TASKS.inc(outcome="ok")
+                    except Exception as e:
+                        logger.error(f"Erro ao executar tarefa: {e}")
+                        results[i] = e
+                        TASKS.inc(outcome="error")
+                    release(i)
+        finally:
+            for future in running:
+                future.cancel()
+            TASKS_RUNNING.dec(len(running))
+            TASKS_READY.dec(reported_ready)
+
+        return results
@@ -0,0 +1,67 @@
+"""
+Coalescência de chamadas idênticas em andamento (single-flight).
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """Agrupa chamadas concorrentes com a mesma chave em uma única execução.
+
+    A primeira chamada (líder) dispara a corrotina; as demais aguardam o mesmo
+    resultado. Se todos os interessados forem cancelados, a execução
+    compartilhada também é cancelada.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self._waiters: Dict[str, int] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Executa ``fn`` uma única vez por chave em andamento.
+
+        Retorna o resultado e ``True`` para o líder (quem de fato executou a
+        chamada) ou ``False`` para quem apenas reaproveitou o resultado.
+        """
+        future = self._calls.get(key)
+        leader = future is None
+        if leader:
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+            self._waiters[key] = 0
+            future.add_done_callback(lambda done: self._forget(key, done))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(future), leader
+        except asyncio.CancelledError:
+            if not future.done() and self._waiters.get(key) == 1:
+                future.cancel()
+            raise
+        finally:
+            if key in self._waiters and self._calls.get(key) is future:
+                self._waiters[key] -= 1
+
+    def _forget(self, key: str, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+            del self._waiters[key]
+
+    def in_flight(self) -> int:
+        """Número de chamadas distintas em andamento."""
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        """Retorna o número de chamadas executadas e economizadas."""
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls)
+        }
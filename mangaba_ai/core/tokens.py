@@ -0,0 +1,168 @@
+"""
+Contagem de tokens e ajuste de prompts à janela do modelo.
+
+``TokenCounter`` conta tokens com um tokenizador, se houver, ou por uma
+estimativa de caracteres por token calibrada com as contagens reais
+devolvidas pelo modelo. ``fit_segments`` reduz um prompt em partes
+(``PromptSegment``) ao orçamento de tokens, truncando ou descartando primeiro
+as partes de menor prioridade, e ``TokenLedger`` acumula o consumo de tokens
+de cada agente.
+"""
+import math
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from ..utils.exceptions import ModelError
+
+# Caracteres por token de textos comuns em português e inglês
+DEFAULT_CHARS_PER_TOKEN = 4.0
+
+# Marcador inserido no ponto em que um texto foi truncado
+TRUNCATION_MARKER = " [...] "
+
+# Partes que ficariam com menos tokens que isto são descartadas, não truncadas
+MIN_TRUNCATED_TOKENS = 16
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa barata do número de tokens de um texto (~4 caracteres por token)."""
+    return (len(text) + 3) // 4
+
+class TokenCounter:
+    """Conta tokens de textos.
+
+    Com ``tokenizer`` (função que recebe o texto e retorna o número de
+    tokens) a contagem é exata; sem ele, usa ``chars_per_token``, ajustado por
+    ``calibrate`` a cada contagem real observada (média móvel com peso
+    ``smoothing``).
+    """
+
+    def __init__(self, chars_per_token: float = DEFAULT_CHARS_PER_TOKEN,
+                 tokenizer: Optional[Callable[[str], int]] = None, smoothing: float = 0.2):
+        self.chars_per_token = chars_per_token
+        self.tokenizer = tokenizer
+        self.smoothing = smoothing
+
+    def count(self, text: str) -> int:
+        if self.tokenizer is not None:
+            return self.tokenizer(text)
+        return math.ceil(len(text) / self.chars_per_token) if text else 0
+
+    def calibrate(self, text: str, tokens: int) -> None:
+        """Ajusta a estimativa com a contagem real de tokens de ``text``."""
+        if tokens <= 0 or not text:
+            return
+        observed = len(text) / tokens
+        self.chars_per_token += self.smoothing * (observed - self.chars_per_token)
+
+    def truncate(self, text: str, max_tokens: int, keep: str = "head") -> str:
+        """Reduz ``text`` a no máximo ``max_tokens`` tokens.
+
+        ``keep="head"`` preserva o início do texto e ``keep="tail"`` o final;
+        o trecho removido é indicado por ``TRUNCATION_MARKER``.
+        """
+        if self.count(text) <= max_tokens:
+            return text
+        chars = int((max_tokens - self.count(TRUNCATION_MARKER)) * self.chars_per_token)
+        while chars > 0:
+            truncated = (text[:chars] + TRUNCATION_MARKER if keep == "head"
+                         else TRUNCATION_MARKER + text[-chars:])
+            if self.count(truncated) <= max_tokens:
+                return truncated
+            # Tokenizadores reais podem contar mais que a estimativa
+            chars = int(chars * 0.9)
+        return ""
+
+class PromptSegment(NamedTuple):
+    """Parte de um prompt.
+
+    Partes com ``required`` nunca são alteradas; as demais são reduzidas em
+    ordem crescente de ``priority`` (e, no empate, na ordem em que aparecem),
+    preservando o início (``keep="head"``) ou o final (``keep="tail"``).
+    """
+
+    text: str
+    priority: int = 0
+    required: bool = False
+    keep: str = "head"
+
+def fit_segments(segments: Sequence[PromptSegment], max_tokens: int,
+                 counter: Optional[TokenCounter] = None) -> List[Optional[PromptSegment]]:
+    """Ajusta as partes a ``max_tokens`` tokens no total.
+
+    Retorna uma lista alinhada a ``segments`` com cada parte mantida,
+    truncada ou, se descartada, ``None``. Levanta ``ModelError`` se as partes
+    obrigatórias sozinhas excederem o orçamento.
+    """
+    counter = counter or TokenCounter()
+    counts = [counter.count(segment.text) for segment in segments]
+    total = sum(counts)
+    fitted: List[Optional[PromptSegment]] = list(segments)
+    if total <= max_tokens:
+        return fitted
+
+    required = sum(count for segment, count in zip(segments, counts) if segment.required)
+    if required > max_tokens:
+        raise ModelError(
+            f"Prompt com {required} tokens obrigatórios excede o limite de {max_tokens} tokens",
+            "context_length"
+        )
+
+    optional = sorted((i for i, segment in enumerate(segments) if not segment.required),
+                      key=lambda i: (segments[i].priority, i))
+    for i in optional:
+        excess = total - max_tokens
+        if excess <= 0:
+            break
+        segment = segments[i]
+        if counts[i] - excess >= MIN_TRUNCATED_TOKENS:
+            text = counter.truncate(segment.text, counts[i] - excess, segment.keep)
+            fitted[i] = segment._replace(text=text)
+            total -= counts[i] - counter.count(text)
+        else:
+            fitted[i] = None
+            total -= counts[i]
+    return fitted
+
+class TokenLedger:
+    """Consumo de tokens por agente.
+
+    ``prompt_tokens`` e ``completion_tokens`` somam os tokens enviados e
+    recebidos nas chamadas ao modelo; ``cached_tokens`` soma os tokens lidos
+    do cache de contexto em vez de enviados, e ``dropped_tokens`` os tokens
+    de contexto removidos para o prompt caber na janela.
+    """
+
+    FIELDS = ("calls", "prompt_tokens", "completion_tokens", "cached_tokens", "dropped_tokens")
+
+    def __init__(self):
+        self._usage: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, agent: str, calls: int = 0, prompt_tokens: int = 0, completion_tokens: int = 0,
+               cached_tokens: int = 0, dropped_tokens: int = 0) -> None:
+        with self._lock:
+            usage = self._usage.get(agent)
+            if usage is None:
+                usage = self._usage[agent] = dict.fromkeys(self.FIELDS, 0)
+            usage["calls"] += calls
+            usage["prompt_tokens"] += prompt_tokens
+            usage["completion_tokens"] += completion_tokens
+            usage["cached_tokens"] += cached_tokens
+            usage["dropped_tokens"] += dropped_tokens
+
+    def usage(self, agent: str) -> Dict[str, int]:
+        """Consumo de um agente, com o total de tokens enviados e recebidos."""
+        usage = dict(self._usage.get(agent) or dict.fromkeys(self.FIELDS, 0))
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        return usage
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """Consumo de todos os agentes, por nome."""
+        return {agent: self.usage(agent) for agent in sorted(self._usage)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._usage.clear()
+
+# Consumo de tokens do processo, atualizado pelas chamadas ao modelo
+token_usage = TokenLedger()
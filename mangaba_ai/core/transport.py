@@ -0,0 +1,235 @@
+"""
+Transporte HTTP assíncrono para a API do Gemini.
+"""
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, Mapping, Optional
+
+from ..utils.exceptions import APIError, AuthenticationError, ModelError, RateLimitError, TimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Conversão das chaves de configuração de geração para o formato da API REST
+GENERATION_CONFIG_KEYS = {
+    "temperature": "temperature",
+    "top_p": "topP",
+    "top_k": "topK",
+    "max_output_tokens": "maxOutputTokens",
+    "candidate_count": "candidateCount",
+    "stop_sequences": "stopSequences",
+}
+
+class GeminiTransport:
+    """Cliente assíncrono da API REST do Gemini baseado em aiohttp.
+
+    Mantém uma sessão com conexões persistentes (keep-alive) reutilizadas
+    entre chamadas, com limite total e por host. Cada chamada é uma corrotina
+    comum no event loop, sem thread dedicada, e pode ser cancelada.
+
+    Se definido, ``on_usage`` é chamado com o prompt e o ``usageMetadata``
+    (contagens de tokens) de cada resposta.
+    """
+
+    BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, limit: int = 100,
+                 limit_per_host: int = 100, keepalive_timeout: float = 30, timeout: Optional[float] = None):
+        self.api_key = api_key
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.on_usage: Optional[Callable[[str, Dict[str, Any]], None]] = None
+        self._session = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def _get_session(self):
+        """Retorna a sessão do event loop atual, criando-a na primeira chamada."""
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"x-goog-api-key": self.api_key}
+            )
+            self._loop = loop
+        return self._session
+
+    @staticmethod
+    def build_request(prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                      cached_content: Optional[str] = None) -> Dict[str, Any]:
+        """Monta o corpo da requisição ``generateContent``.
+
+        ``cached_content`` é o nome de um conteúdo criado com
+        ``create_cached_content``, usado como início do prompt.
+        """
+        body: Dict[str, Any] = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if cached_content:
+            body["cachedContent"] = cached_content
+        if generation_config:
+            body["generationConfig"] = {
+                GENERATION_CONFIG_KEYS.get(key, key): value for key, value in generation_config.items()
+            }
+        return body
+
+    @staticmethod
+    def extract_text(data: Dict[str, Any]) -> str:
+        """Extrai o texto do primeiro candidato de uma resposta."""
+        candidates = data.get("candidates") or []
+        if not candidates:
+            reason = data.get("promptFeedback", {}).get("blockReason", "sem candidatos")
+            raise ModelError(f"Resposta vazia do modelo: {reason}")
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+
+    @staticmethod
+    def extract_chunk(data: Dict[str, Any]) -> str:
+        """Extrai o texto de um fragmento de streaming (que pode não ter candidatos)."""
+        candidates = data.get("candidates") or []
+        if not candidates:
+            return ""
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+
+    @staticmethod
+    def parse_retry_after(body: str, headers: Optional[Mapping[str, str]] = None) -> Optional[float]:
+        """Obtém o tempo de espera sugerido pelo cabeçalho ``Retry-After`` ou pelo ``RetryInfo``."""
+        value = (headers or {}).get("Retry-After")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+        try:
+            details = json.loads(body).get("error", {}).get("details", [])
+        except (ValueError, AttributeError):
+            return None
+        for detail in details:
+            delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+            if isinstance(delay, str) and delay.endswith("s"):
+                try:
+                    return float(delay[:-1])
+                except ValueError:
+                    pass
+        return None
+
+    @staticmethod
+    def raise_for_status(status: int, body: str, headers: Optional[Mapping[str, str]] = None) -> None:
+        """Converte respostas de erro HTTP nas exceções do Mangaba.AI."""
+        if status < 400:
+            return
+        message = f"Gemini API retornou {status}: {body[:500]}"
+        if status == 429:
+            raise RateLimitError(
+                message,
+                error_code=str(status),
+                retry_after=GeminiTransport.parse_retry_after(body, headers)
+            )
+        if status in (401, 403):
+            raise AuthenticationError(message, error_code=str(status))
+        raise APIError(message, error_code=str(status))
+
+    async def generate(self, model_name: str, prompt: str,
+                       generation_config: Optional[Dict[str, Any]] = None,
+                       cached_content: Optional[str] = None) -> str:
+        """Gera texto chamando ``models/{model_name}:generateContent``."""
+        import aiohttp
+
+        session = await self._get_session()
+        url = f"{self.base_url}/models/{model_name}:generateContent"
+        request = self.build_request(prompt, generation_config, cached_content)
+        try:
+            async with session.post(url, json=request) as response:
+                body = await response.text()
+                self.raise_for_status(response.status, body, response.headers)
+                data = json.loads(body)
+        except asyncio.TimeoutError as e:
+            raise TimeoutError(f"Tempo esgotado na chamada ao Gemini: {e}") from e
+        except aiohttp.ClientError as e:
+            raise APIError(f"Falha de comunicação com o Gemini: {e}") from e
+        except json.JSONDecodeError as e:
+            raise APIError(f"Resposta inválida do Gemini: {e}") from e
+        if self.on_usage is not None and data.get("usageMetadata"):
+            self.on_usage(prompt, data["usageMetadata"])
+        return self.extract_text(data)
+
+    async def stream(self, model_name: str, prompt: str,
+                     generation_config: Optional[Dict[str, Any]] = None,
+                     cached_content: Optional[str] = None) -> AsyncIterator[str]:
+        """Gera texto em fragmentos via ``streamGenerateContent`` (Server-Sent Events)."""
+        import aiohttp
+
+        session = await self._get_session()
+        url = f"{self.base_url}/models/{model_name}:streamGenerateContent"
+        request = self.build_request(prompt, generation_config, cached_content)
+        try:
+            async with session.post(url, params={"alt": "sse"}, json=request) as response:
+                if response.status >= 400:
+                    self.raise_for_status(response.status, await response.text(), response.headers)
+                usage = None
+                async for line in response.content:
+                    line = line.strip()
+                    if not line.startswith(b"data:"):
+                        continue
+                    data = json.loads(line[5:])
+                    usage = data.get("usageMetadata") or usage
+                    chunk = self.extract_chunk(data)
+                    if chunk:
+                        yield chunk
+                if self.on_usage is not None and usage:
+                    self.on_usage(prompt, usage)
+        except asyncio.TimeoutError as e:
+            raise TimeoutError(f"Tempo esgotado na chamada ao Gemini: {e}") from e
+        except aiohttp.ClientError as e:
+            raise APIError(f"Falha de comunicação com o Gemini: {e}") from e
+        except json.JSONDecodeError as e:
+            raise APIError(f"Resposta inválida do Gemini: {e}") from e
+
+    async def create_cached_content(self, model_name: str, system_instruction: str, ttl: float) -> str:
+        """Registra ``system_instruction`` no cache de contexto (``cachedContents``).
+
+        Retorna o nome do conteúdo, válido por ``ttl`` segundos, para uso em
+        ``generate(..., cached_content=nome)``.
+        """
+        data = await self._request("POST", "cachedContents", {
+            "model": f"models/{model_name}",
+            "systemInstruction": {"parts": [{"text": system_instruction}]},
+            "ttl": f"{max(int(ttl), 1)}s",
+        })
+        return data["name"]
+
+    async def delete_cached_content(self, name: str) -> None:
+        """Remove um conteúdo do cache de contexto."""
+        await self._request("DELETE", name)
+
+    async def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        import aiohttp
+
+        session = await self._get_session()
+        try:
+            async with session.request(method, f"{self.base_url}/{path}", json=payload) as response:
+                body = await response.text()
+                self.raise_for_status(response.status, body, response.headers)
+                return json.loads(body) if body.strip() else {}
+        except asyncio.TimeoutError as e:
+            raise TimeoutError(f"Tempo esgotado na chamada ao Gemini: {e}") from e
+        except aiohttp.ClientError as e:
+            raise APIError(f"Falha de comunicação com o Gemini: {e}") from e
+        except json.JSONDecodeError as e:
+            raise APIError(f"Resposta inválida do Gemini: {e}") from e
+
+    async def close(self) -> None:
+        """Fecha a sessão e as conexões abertas."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
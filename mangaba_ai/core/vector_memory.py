@@ -0,0 +1,286 @@
+"""
+Memória vetorial do Mangaba.AI: recuperação das memórias mais relevantes.
+
+``VectorMemory`` guarda os embeddings normalizados de textos em uma única
+matriz NumPy contígua e responde consultas por similaridade de cosseno com um
+produto de matrizes e ``argpartition`` (top-k sem ordenar tudo), em lote para
+várias consultas. A função de embedding é plugável; ``HashingEmbedder`` gera
+embeddings localmente, sem rede nem modelos, a partir das palavras do texto.
+
+Requer o pacote opcional ``numpy``.
+"""
+import json
+import re
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from uuid import uuid4
+
+from ..utils.exceptions import ConfigurationError, MemoryError
+
+if TYPE_CHECKING:
+    from .ann import IVFIndex
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dependência opcional
+    np = None
+
+# Recebe textos e retorna uma matriz (número de textos x dimensão)
+Embedder = Callable[[Sequence[str]], "np.ndarray"]
+
+# Palavras com menos de 3 letras (artigos, preposições) são ignoradas
+_WORD = re.compile(r"\w{3,}")
+
+@lru_cache(maxsize=65536)
+def _feature_slot(feature: str, dim: int) -> Tuple[int, float]:
+    digest = zlib.crc32(feature.encode("utf-8"))
+    return digest % dim, 1.0 if digest & 0x80000000 else -1.0
+
+class HashingEmbedder:
+    """Embeddings locais por "hashing trick" de palavras e pares de palavras.
+
+    Textos com palavras em comum ficam próximos; não captura sinônimos, mas
+    dispensa rede e modelos e é determinístico entre processos.
+    """
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def __call__(self, texts: Sequence[str]) -> "np.ndarray":
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text.lower())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                column, sign = _feature_slot(feature, self.dim)
+                matrix[row, column] += sign
+        return matrix
+
+class VectorMatch(NamedTuple):
+    """Memória recuperada e sua similaridade de cosseno com a consulta."""
+
+    id: str
+    text: str
+    score: float
+    metadata: Dict[str, Any]
+
+class VectorMemory:
+    """Memórias textuais recuperáveis por similaridade.
+
+    Inserções são amortizadas em O(1) (a matriz dobra de capacidade quando
+    enche) e remoções movem a última linha para o lugar da removida, mantendo
+    a matriz contígua. Com ``max_size``, as memórias mais antigas são
+    descartadas ao exceder o limite.
+
+    Para centenas de milhares de memórias, ``index`` (um ``IVFIndex`` de
+    ``core.ann``) troca a busca exata por uma aproximada, bem mais rápida,
+    assim que o índice estiver treinado. O índice deve começar vazio; para
+    reaproveitar um índice gravado, use ``save``/``load`` da própria memória,
+    que guardam também textos, metadados e rótulos.
+    """
+
+    def __init__(self, embedder: Optional[Embedder] = None, max_size: Optional[int] = None,
+                 initial_capacity: int = 1024, index: Optional["IVFIndex"] = None):
+        if np is None:
+            raise ConfigurationError("VectorMemory requer o pacote numpy. Instale com: pip install numpy")
+        if index is not None and len(index):
+            raise MemoryError("O índice deve estar vazio; para reabrir memórias gravadas use VectorMemory.load")
+        self.embedder = embedder or HashingEmbedder()
+        self.max_size = max_size
+        self._capacity = initial_capacity
+        self._vectors: Optional["np.ndarray"] = None
+        self._size = 0
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        # Identificador -> linha da matriz, em ordem de inserção
+        self._rows: "OrderedDict[str, int]" = OrderedDict()
+        self.index = index
+        # Rótulo de cada linha no índice e linha de cada rótulo
+        self._labels: List[int] = []
+        self._label_rows: Dict[int, int] = {}
+        self._next_label = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, memory_id: str) -> bool:
+        return memory_id in self._rows
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes ocupados pela matriz de embeddings."""
+        return self._vectors.nbytes if self._vectors is not None else 0
+
+    def _embed(self, texts: Sequence[str]) -> "np.ndarray":
+        vectors = np.asarray(self.embedder(texts), dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(texts):
+            raise MemoryError("O embedder deve retornar uma matriz com uma linha por texto")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _reserve(self, size: int, dim: int) -> None:
+        if self._vectors is None:
+            self._vectors = np.empty((max(self._capacity, size), dim), dtype=np.float32)
+        elif self._vectors.shape[1] != dim:
+            raise MemoryError(f"Embedding de dimensão {dim} difere da memória ({self._vectors.shape[1]})")
+        elif size > self._vectors.shape[0]:
+            grown = np.empty((max(size, 2 * self._vectors.shape[0]), dim), dtype=np.float32)
+            grown[:self._size] = self._vectors[:self._size]
+            self._vectors = grown
+
+    def add(self, text: str, metadata: Optional[Dict[str, Any]] = None, memory_id: Optional[str] = None) -> str:
+        """Armazena uma memória e retorna o seu identificador."""
+        return self.add_many([text], [metadata or {}], [memory_id] if memory_id else None)[0]
+
+    def add_many(self, texts: Sequence[str], metadata: Optional[Sequence[Dict[str, Any]]] = None,
+                 ids: Optional[Sequence[str]] = None) -> List[str]:
+        """Armazena várias memórias, calculando os embeddings em lote."""
+        if not texts:
+            return []
+        ids = list(ids) if ids is not None else [uuid4().hex for _ in texts]
+        metadata = list(metadata) if metadata is not None else [{} for _ in texts]
+        for memory_id in ids:
+            self.delete(memory_id)
+        vectors = self._embed(texts)
+        self._reserve(self._size + len(texts), vectors.shape[1])
+        self._vectors[self._size:self._size + len(texts)] = vectors
+        labels = list(range(self._next_label, self._next_label + len(texts)))
+        self._next_label += len(texts)
+        for memory_id, label in zip(ids, labels):
+            self._rows[memory_id] = self._label_rows[label] = self._size
+            self._size += 1
+        self._labels.extend(labels)
+        if self.index is not None:
+            self.index.add(vectors, labels)
+        self._ids.extend(ids)
+        self._texts.extend(texts)
+        self._metadata.extend(metadata)
+        if self.max_size is not None:
+            while self._size > self.max_size:
+                self.delete(next(iter(self._rows)))
+        return ids
+
+    def delete(self, memory_id: str) -> bool:
+        """Remove uma memória; retorna se ela existia."""
+        row = self._rows.pop(memory_id, None)
+        if row is None:
+            return False
+        label = self._labels[row]
+        del self._label_rows[label]
+        if self.index is not None:
+            self.index.remove([label])
+        last = self._size - 1
+        if row != last:
+            self._vectors[row] = self._vectors[last]
+            moved = self._ids[last]
+            self._ids[row], self._texts[row], self._metadata[row] = moved, self._texts[last], self._metadata[last]
+            self._labels[row] = self._labels[last]
+            self._rows[moved] = self._label_rows[self._labels[row]] = row
+        self._labels.pop()
+        self._ids.pop()
+        self._texts.pop()
+        self._metadata.pop()
+        self._size = last
+        return True
+
+    def search(self, query: str, k: int = 5, min_score: Optional[float] = None) -> List[VectorMatch]:
+        """As ``k`` memórias mais similares a ``query``, da mais para a menos similar."""
+        return self.search_many([query], k, min_score)[0]
+
+    def search_many(self, queries: Sequence[str], k: int = 5,
+                    min_score: Optional[float] = None) -> List[List[VectorMatch]]:
+        """Busca em lote: uma lista de resultados por consulta."""
+        if not self._size or k < 1 or not queries:
+            return [[] for _ in queries]
+        if self.index is not None and self.index.is_trained:
+            return self._search_index(self._embed(queries), k, min_score)
+        scores = self._embed(queries) @ self._vectors[:self._size].T
+        k = min(k, self._size)
+        if k < self._size:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(self._size), (len(queries), self._size))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        results = []
+        for rows, row_scores in zip(top.tolist(), top_scores.tolist()):
+            results.append([
+                VectorMatch(self._ids[row], self._texts[row], score, self._metadata[row])
+                for row, score in zip(rows, row_scores)
+                if min_score is None or score >= min_score
+            ])
+        return results
+
+    def _search_index(self, queries: "np.ndarray", k: int,
+                      min_score: Optional[float]) -> List[List[VectorMatch]]:
+        scores, labels = self.index.search(queries, k)
+        results = []
+        for row_labels, row_scores in zip(labels.tolist(), scores.tolist()):
+            matches = []
+            for label, score in zip(row_labels, row_scores):
+                if label < 0 or (min_score is not None and score < min_score):
+                    continue
+                row = self._label_rows[label]
+                matches.append(VectorMatch(self._ids[row], self._texts[row], score, self._metadata[row]))
+            results.append(matches)
+        return results
+
+    def save(self, path: str) -> None:
+        """Grava memórias, embeddings e índice em ``path`` (formato ``.npz``).
+
+        Os metadados devem ser serializáveis em JSON; o embedder não é gravado.
+        """
+        records = json.dumps({
+            "ids": self._ids, "texts": self._texts, "metadata": self._metadata,
+            "max_size": self.max_size, "next_label": self._next_label,
+        }, ensure_ascii=False)
+        arrays = {
+            "vectors": self._vectors[:self._size] if self._vectors is not None else np.empty((0, 0), np.float32),
+            "labels": np.array(self._labels, dtype=np.int64),
+            "records": np.array(records),
+        }
+        if self.index is not None:
+            arrays.update({f"index_{name}": value for name, value in self.index._arrays().items()})
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: str, embedder: Optional[Embedder] = None) -> "VectorMemory":
+        """Lê memórias gravadas com ``save``; ``embedder`` deve ser o mesmo usado antes."""
+        from .ann import IVFIndex
+
+        with np.load(path, allow_pickle=False) as data:
+            records = json.loads(str(data["records"]))
+            memory = cls(embedder, max_size=records["max_size"])
+            if "index_settings" in data:
+                memory.index = IVFIndex._from_arrays(
+                    {name[len("index_"):]: data[name] for name in data.files if name.startswith("index_")}
+                )
+            vectors = data["vectors"]
+            if len(vectors):
+                memory._reserve(len(vectors), vectors.shape[1])
+                memory._vectors[:len(vectors)] = vectors
+            memory._labels = data["labels"].tolist()
+        memory._ids, memory._texts, memory._metadata = records["ids"], records["texts"], records["metadata"]
+        memory._next_label = records["next_label"]
+        memory._size = len(memory._ids)
+        for row, (memory_id, label) in enumerate(zip(memory._ids, memory._labels)):
+            memory._rows[memory_id] = memory._label_rows[label] = row
+        return memory
+
+    def clear(self) -> None:
+        """Remove todas as memórias (a matriz já alocada é reaproveitada)."""
+        if self.index is not None:
+            self.index.remove(self._labels)
+        self._labels.clear()
+        self._label_rows.clear()
+        self._size = 0
+        self._ids.clear()
+        self._texts.clear()
+        self._metadata.clear()
+        self._rows.clear()
@@ -3,72 +3,191 @@ Módulo principal do Mangaba.AI
 """
 import asyncio
 import logging
-from .core.models import Agent, Task, GeminiModel
+import weakref
+from typing import Any, Dict, List, Mapping, Optional
+from .core.backends import ModelBackend
+from .core.memory import ContextualMemory
+from .core.models import Agent, Task, GeminiModel, LanguageModel
+from .core.protocols import A2AProtocol
+from .core.retry import RetryPolicy, current_deadline
+from .core.scheduler import TaskScheduler
+from .core.tokens import token_usage
+from .utils.config import Config, ConfigWatcher
+from .utils.config_validator import ConfigValidator
+from .utils.exceptions import ConfigurationError, TimeoutError, WorkflowError
+from .utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
 class MangabaAI:
     """Classe principal do Mangaba.AI."""
     
-    def __init__(self, api_key: str):
-        """Inicializa o sistema Mangaba.AI."""
+    def __init__(self, api_key: Optional[str] = None, config: Optional[Mapping[str, Any]] = None,
+                 backend: Optional[ModelBackend] = None):
+        """Inicializa o sistema Mangaba.AI.
+        
+        Sem ``backend``, os agentes usam o Gemini com ``api_key``; com um
+        backend (por exemplo ``SimulatedBackend``), a chave é dispensada.
+        """
         self.api_key = api_key
-        self.model = GeminiModel(api_key)
+        self.config = Config(config or ConfigValidator().get_default_config())
+        if backend is not None:
+            self.model = LanguageModel(backend, config=self.config)
+        elif api_key:
+            self.model = GeminiModel(api_key, config=self.config)
+        else:
+            raise ConfigurationError("Informe uma chave de API ou um backend de modelo")
+        self.a2a = A2AProtocol.from_config(self.config)
+        # Memória compartilhada pelos agentes criados por este sistema
+        self.memory = ContextualMemory.from_config(self.config)
+        self.scheduler = self._build_scheduler(self.config)
+        self.config_watcher: Optional[ConfigWatcher] = None
+        self._agents: "weakref.WeakSet[Agent]" = weakref.WeakSet()
+    
+    @staticmethod
+    def _build_scheduler(config: Mapping[str, Any]) -> TaskScheduler:
+        # Agentes repetem chamadas ao modelo com falhas transitórias; o
+        # workflow repete apenas tarefas que excederam agents.task_timeout
+        return TaskScheduler(
+            config["agents"]["max_concurrent_tasks"],
+            retry_policy=RetryPolicy(
+                max_retries=config["workflow"]["retry_attempts"],
+                timeout=config["agents"]["task_timeout"],
+                retry_on=(TimeoutError,)
+            )
+        )
+    
+    def apply_config(self, config: Mapping[str, Any]) -> None:
+        """Aplica uma nova configuração sem reiniciar.
+        
+        Workflows e tarefas em execução mantêm o escalonador e as políticas
+        de novas tentativas com que começaram; os seguintes usam os novos
+        valores de ``agents``. Os parâmetros de geração (``models``) e os
+        limites do cache de respostas valem a partir da próxima chamada ao
+        modelo; a memória compartilhada (``memory``) descarta na hora o que
+        exceder os novos limites.
+        """
+        if not isinstance(config, Config):
+            config = Config(config)
+        self.model.reconfigure(config)
+        self.memory.reconfigure(config)
+        retry_policy = RetryPolicy.from_config(config)
+        for agent in list(self._agents):
+            agent.retry_policy = retry_policy
+        self.scheduler = self._build_scheduler(config)
+        self.config = config
+    
+    def watch_config(self, path: str, interval: float = 1.0) -> ConfigWatcher:
+        """Recarrega a configuração quando o arquivo ``path`` for alterado.
+        
+        Deve ser chamado dentro do event loop; as alterações de ``models``,
+        ``agents`` e ``memory`` são aplicadas com ``apply_config``.
+        """
+        if self.config_watcher is None:
+            self.config_watcher = ConfigWatcher(path, interval, config=self.config)
+            self.config_watcher.subscribe(self.apply_config)
+            self.config_watcher.start()
+        return self.config_watcher
     
     def create_agent(self, name: str, role: str, goal: str) -> Agent:
         """Cria um novo agente."""
-        return Agent(
+        agent = Agent(
             name=name,
             role=role,
             model=self.model,
-            goal=goal
+            goal=goal,
+            retry_policy=RetryPolicy.from_config(self.config),
+            a2a=self.a2a,
+            memory=self.memory
         )
+        self._agents.add(agent)
+        return agent
     
-    def create_task(self, description: str, agent: Agent) -> Task:
+    def create_task(self, description: str, agent: Agent, priority: int = 0,
+                    dependencies: Optional[List[Task]] = None) -> Task:
         """Cria uma nova tarefa."""
         return Task(
             description=description,
-            agent=agent
+            agent=agent,
+            priority=priority,
+            dependencies=dependencies
         )
     
+    def _build_tasks(self, tasks: list) -> List[Task]:
+        """Converte a lista recebida (objetos ``Task`` ou dicionários) em tarefas."""
+        task_objs = []
+        by_description = {}
+        for task in tasks:
+            if isinstance(task, dict):
+                agent = self.create_agent(
+                    name=f"agent_{task['type']}",
+                    role=task["type"],
+                    goal=task["description"]
+                )
+                task_obj = self.create_task(
+                    description=task["description"],
+                    agent=agent,
+                    priority=task.get("priority", 0)
+                )
+            else:
+                task_obj = task
+            task_objs.append(task_obj)
+            by_description[task_obj.description] = task_obj
+        
+        # Dependências de tarefas em dicionário são referenciadas pela descrição
+        for task, task_obj in zip(tasks, task_objs):
+            if isinstance(task, dict):
+                for description in task.get("dependencies", []):
+                    if description not in by_description:
+                        raise WorkflowError(f"Dependência desconhecida: {description}")
+                    task_obj.dependencies.append(by_description[description])
+        
+        return task_objs
+    
     async def execute(self, tasks: list) -> dict:
-        """Executa uma lista de tarefas."""
+        """Executa uma lista de tarefas.
+        
+        Tarefas independentes são executadas em paralelo, até
+        ``agents.max_concurrent_tasks`` por vez; tarefas com dependências
+        aguardam e recebem os resultados das tarefas das quais dependem.
+        Nenhuma tarefa ultrapassa o prazo ``workflow.timeout`` do lote.
+        """
         results = {}
         
         try:
-            for task in tasks:
-                task_description = None
-                try:
-                    if isinstance(task, dict):
-                        task_description = task["description"]
-                        agent = self.create_agent(
-                            name=f"agent_{task['type']}",
-                            role=task["type"],
-                            goal=task["description"]
-                        )
-                        task_obj = self.create_task(
-                            description=task_description,
-                            agent=agent
-                        )
-                    else:
-                        task_description = task.description
-                        task_obj = task
-                    
-                    result = await task_obj.agent.execute(task_obj.description)
-                    results[task_description] = result
-                
-                except Exception as e:
-                    logger.error(f"Erro ao executar tarefa: {e}")
-                    if task_description:
-                        results[task_description] = f"Erro: {str(e)}"
-                    else:
-                        results["unknown_task"] = f"Erro: {str(e)}"
+            task_objs = self._build_tasks(tasks)
+            deadline = asyncio.get_running_loop().time() + self.config["workflow"]["timeout"]
+            token = current_deadline.set(deadline)
+            try:
+                with tracer.span("workflow", {"workflow.tasks": len(task_objs)}):
+                    outcomes = await self.scheduler.run(task_objs)
+            finally:
+                current_deadline.reset(token)
+            
+            for i, task_obj in enumerate(task_objs):
+                outcome = outcomes[i]
+                if isinstance(outcome, BaseException):
+                    results[task_obj.description] = f"Erro: {str(outcome)}"
+                else:
+                    results[task_obj.description] = outcome
             
             return results
         
         except Exception as e:
             logger.error(f"Erro geral na execução: {e}")
             raise
+    
+    def token_usage(self) -> Dict[str, Dict[str, int]]:
+        """Tokens enviados, recebidos e descartados por agente."""
+        return token_usage.snapshot()
+    
+    async def close(self) -> None:
+        """Libera os recursos do sistema (conexões com o modelo e a limpeza da memória)."""
+        if self.config_watcher is not None:
+            await self.config_watcher.stop()
+            self.config_watcher = None
+        await self.memory.close()
+        await self.model.close()
 
 async def main():
     """Função principal de execução."""
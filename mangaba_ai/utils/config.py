@@ -0,0 +1,184 @@
+"""
+Configuração imutável do Mangaba.AI e recarga a quente do arquivo de configuração.
+
+``Config`` é uma visão somente leitura (compatível com ``Mapping``) de uma
+configuração já validada. ``ConfigWatcher`` acompanha o arquivo de
+configuração e, quando ele muda, publica uma nova ``Config`` com as seções
+``models``, ``agents`` e ``memory`` atualizadas; as demais seções exigem
+reinício e mantêm os valores anteriores.
+"""
+import asyncio
+import json
+import logging
+import os
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from .config_validator import ConfigValidator
+from .exceptions import ConfigurationError, MangabaError
+
+logger = logging.getLogger(__name__)
+
+# Seções que podem ser trocadas sem reiniciar o processo
+HOT_RELOAD_SECTIONS = ("models", "agents", "memory")
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+class Config(Mapping):
+    """Configuração somente leitura.
+
+    As seções e subseções são ``Mapping`` imutáveis e as listas viram tuplas,
+    de modo que uma ``Config`` pode ser compartilhada entre tarefas sem cópias:
+    para alterá-la, crie outra com ``replace``.
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: Mapping[str, Any]):
+        self._data = data._data if isinstance(data, Config) else _freeze(data)
+
+    @classmethod
+    def load(cls, data: Mapping[str, Any], validator: Optional[ConfigValidator] = None) -> "Config":
+        """Valida ``data`` contra o schema e cria a configuração."""
+        data = _thaw(data)
+        (validator or ConfigValidator()).validate(data)
+        return cls(data)
+
+    @classmethod
+    def from_file(cls, path: str, validator: Optional[ConfigValidator] = None) -> "Config":
+        """Lê, valida e cria a configuração de um arquivo JSON."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            raise ConfigurationError(f"Configuration file not found: {path}")
+        except json.JSONDecodeError:
+            raise ConfigurationError(f"Invalid JSON in configuration file: {path}")
+        return cls.load(data, validator)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"Config({_thaw(self._data)!r})"
+
+    def replace(self, **sections: Any) -> "Config":
+        """Nova configuração com as seções informadas substituídas.
+
+        As demais seções são compartilhadas com esta configuração, sem cópia.
+        """
+        config = Config.__new__(Config)
+        config._data = MappingProxyType({**self._data, **{key: _freeze(value) for key, value in sections.items()}})
+        return config
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Cópia mutável (dicionários e listas) da configuração."""
+        return _thaw(self._data)
+
+class ConfigWatcher:
+    """Recarrega a configuração quando o arquivo ``path`` muda.
+
+    O arquivo é verificado a cada ``interval`` segundos (data de modificação e
+    tamanho). Uma versão válida que altere ``models``, ``agents`` ou
+    ``memory`` vira a nova ``current``, trocada de uma só vez, e é entregue a
+    cada função registrada com ``subscribe``; versões inválidas são ignoradas
+    e mudanças em outras seções só valem após reiniciar.
+    """
+
+    def __init__(self, path: str, interval: float = 1.0, config: Optional[Config] = None,
+                 validator: Optional[ConfigValidator] = None):
+        self.path = path
+        self.interval = interval
+        self.validator = validator or ConfigValidator()
+        self._stamp = self._stat()
+        self.current = config if config is not None else Config.from_file(path, self.validator)
+        self._subscribers: List[Callable[[Config], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, callback: Callable[[Config], None]) -> None:
+        """Registra ``callback``, chamado com cada nova configuração."""
+        self._subscribers.append(callback)
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self) -> Optional[Config]:
+        """Lê o arquivo se ele mudou desde a última leitura."""
+        stamp = self._stat()
+        if stamp is None or stamp == self._stamp:
+            return None
+        self._stamp = stamp
+        try:
+            return Config.from_file(self.path, self.validator)
+        except MangabaError as e:
+            logger.error(f"Configuração recarregada inválida ignorada: {e.message}")
+            return None
+
+    def apply(self, config: Config) -> bool:
+        """Publica as seções recarregáveis de ``config``; retorna se algo mudou."""
+        restart = [key for key in config if key not in HOT_RELOAD_SECTIONS and config[key] != self.current.get(key)]
+        if restart:
+            logger.warning(f"Alterações em {', '.join(restart)} só valem após reiniciar")
+        changed = {key: config[key] for key in HOT_RELOAD_SECTIONS
+                   if key in config and config[key] != self.current.get(key)}
+        if not changed:
+            return False
+        self.current = self.current.replace(**changed)
+        logger.info(f"Configuração recarregada: {', '.join(changed)}")
+        for callback in self._subscribers:
+            try:
+                callback(self.current)
+            except Exception as e:
+                logger.error(f"Erro ao aplicar configuração recarregada: {e}")
+        return True
+
+    def check(self) -> bool:
+        """Verifica o arquivo agora; retorna se a configuração mudou."""
+        config = self._read()
+        return config is not None and self.apply(config)
+
+    async def run(self) -> None:
+        """Verifica o arquivo periodicamente até ser cancelado."""
+        while True:
+            await asyncio.sleep(self.interval)
+            # A leitura do disco fica fora do event loop; a troca, dentro dele
+            config = await asyncio.to_thread(self._read)
+            if config is not None:
+                self.apply(config)
+
+    def start(self) -> asyncio.Task:
+        """Inicia a verificação periódica no event loop atual."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+        return self._task
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
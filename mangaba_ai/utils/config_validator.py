@@ -1,33 +1,52 @@
+from functools import lru_cache
 from typing import Dict, Any
-import jsonschema
 from pathlib import Path
 import json
 from .exceptions import ConfigurationError, ValidationError
 from .logging import logger
 
+SCHEMA_PATH = Path(__file__).parent.parent / 'schemas' / 'config_schema.json'
+
+@lru_cache(maxsize=None)
+def _load_schema() -> Dict[str, Any]:
+    """Carrega o schema de validação (uma vez por processo)."""
+    try:
+        with open(SCHEMA_PATH, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logger.error(f"Schema file not found: {SCHEMA_PATH}")
+        raise ConfigurationError("Configuration schema not found")
+    except json.JSONDecodeError:
+        logger.error("Invalid JSON in schema file")
+        raise ConfigurationError("Invalid configuration schema")
+
+@lru_cache(maxsize=None)
+def _compiled_validator():
+    """Validador do schema, compilado uma vez por processo."""
+    # Importado sob demanda: o jsonschema é lento de carregar
+    import jsonschema
+
+    schema = _load_schema()
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema)
+
 class ConfigValidator:
-    """Classe para validação de configurações do sistema."""
+    """Classe para validação de configurações do sistema.
     
-    def __init__(self):
-        self.schema = self._load_schema()
+    O schema e o validador compilado são compartilhados por todas as
+    instâncias.
+    """
     
-    def _load_schema(self) -> Dict[str, Any]:
-        """Carrega o schema de validação."""
-        schema_path = Path(__file__).parent.parent / 'schemas' / 'config_schema.json'
-        try:
-            with open(schema_path, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            logger.error(f"Schema file not found: {schema_path}")
-            raise ConfigurationError("Configuration schema not found")
-        except json.JSONDecodeError:
-            logger.error("Invalid JSON in schema file")
-            raise ConfigurationError("Invalid configuration schema")
+    def __init__(self):
+        self.schema = _load_schema()
     
     def validate(self, config: Dict[str, Any]) -> bool:
         """Valida uma configuração contra o schema."""
+        import jsonschema
+
         try:
-            jsonschema.validate(instance=config, schema=self.schema)
+            _compiled_validator().validate(config)
             return True
         except jsonschema.exceptions.ValidationError as e:
             logger.error(f"Configuration validation error: {e.message}")
@@ -61,7 +80,9 @@ class ConfigValidator:
                 "gemini": {
                     "temperature": 0.7,
                     "top_k": 40,
-                    "top_p": 0.95
+                    "top_p": 0.95,
+                    "requests_per_minute": 1000,
+                    "tokens_per_minute": 1000000
                 },
                 "openai": {
                     "model": "gpt-4",
@@ -93,7 +114,8 @@ class ConfigValidator:
             },
             "context_fusion": {
                 "max_contexts": 10,
-                "context_ttl": 3600
+                "context_ttl": 3600,
+                "max_context_tokens": 4096
             },
             "workflow": {
                 "max_agents": 10,
@@ -0,0 +1,56 @@
+"""
+Variáveis de contexto do Mangaba.AI, propagadas entre tarefas assíncronas.
+"""
+import asyncio
+import contextvars
+from typing import Any, AsyncIterator, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Nome do agente que está executando a tarefa atual ("" fora de agentes)
+current_agent: contextvars.ContextVar[str] = contextvars.ContextVar("mangaba_agent", default="")
+
+# Identificador da tarefa em execução ("" fora do escalonador)
+current_task: contextvars.ContextVar[str] = contextvars.ContextVar("mangaba_task", default="")
+
+async def isolate_stream(stream: AsyncIterator[T]) -> AsyncIterator[T]:
+    """Consome ``stream`` em uma tarefa própria, com uma cópia do contexto atual.
+
+    Variáveis de contexto definidas pelo gerador (agente, span) nunca ficam
+    ativas no contexto de quem consome entre um fragmento e outro, e são
+    restauradas na mesma tarefa mesmo se o consumo for interrompido. Os
+    fragmentos são entregues um a um (fila de uma posição).
+    """
+    handoff: "asyncio.Queue[Tuple[bool, Any]]" = asyncio.Queue(maxsize=1)
+
+    async def produce() -> None:
+        try:
+            try:
+                async for item in stream:
+                    await handoff.put((True, item))
+            finally:
+                await stream.aclose()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await handoff.put((False, e))
+            return
+        await handoff.put((False, None))
+
+    producer = asyncio.get_running_loop().create_task(produce())
+    try:
+        while True:
+            ok, value = await handoff.get()
+            if ok:
+                yield value
+            elif value is None:
+                return
+            else:
+                raise value
+    finally:
+        if not producer.done():
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
@@ -1,5 +1,4 @@
 from typing import Optional
-from .logging import logger
 
 class MangabaError(Exception):
     """Classe base para exceções do Mangaba.AI."""
@@ -7,7 +6,6 @@ class MangabaError(Exception):
     def __init__(self, message: str, error_code: Optional[str] = None):
         self.message = message
         self.error_code = error_code
-        logger.error(f"Error {error_code}: {message}")
         super().__init__(message)
 
 class ConfigurationError(MangabaError):
@@ -44,7 +42,10 @@ class AuthenticationError(MangabaError):
 
 class RateLimitError(MangabaError):
     """Erro de limite de requisições."""
-    pass
+    
+    def __init__(self, message: str, error_code: Optional[str] = None, retry_after: Optional[float] = None):
+        self.retry_after = retry_after
+        super().__init__(message, error_code)
 
 class TimeoutError(MangabaError):
     """Erro de timeout em operações."""
@@ -1,62 +1,287 @@
+"""
+Logs do Mangaba.AI.
+
+Os registros do logger ``mangaba_ai`` passam por uma fila e são formatados e
+gravados por uma thread própria, de modo que a escrita em disco nunca bloqueia
+o event loop dos agentes. ``configure_logging`` escolhe o formato (texto ou
+JSON com agente, tarefa e trace de cada registro), a rotação do arquivo e a
+amostragem de registros DEBUG.
+"""
+import atexit
+import json
 import logging
+import os
+import queue
 import sys
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional
+
+from .context import current_agent, current_task
+from .tracing import current_span
+
+LOGGER_NAME = "mangaba_ai"
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Atributos presentes em todo ``LogRecord``; os demais vêm de ``extra=``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+_CONTEXT_ATTRIBUTES = ("agent", "task", "trace_id", "span_id")
+
+class _CreatesDirectory:
+    """Cria o diretório do arquivo de log apenas no primeiro registro."""
+
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+class LazyFileHandler(_CreatesDirectory, logging.FileHandler):
+    """Handler de arquivo que só cria o diretório e o arquivo no primeiro registro."""
+
+    def __init__(self, filename: Path, **kwargs):
+        super().__init__(filename, delay=True, **kwargs)
+
+def _file_handler(path: Path, rotation: Optional[str], max_bytes: int,
+                  backup_count: int, when: str) -> logging.Handler:
+    if rotation is None:
+        return LazyFileHandler(path)
+    from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
+
+    if rotation == "size":
+        cls = type("LazyRotatingFileHandler", (_CreatesDirectory, RotatingFileHandler), {})
+        return cls(path, maxBytes=max_bytes, backupCount=backup_count, delay=True)
+    if rotation == "time":
+        cls = type("LazyTimedRotatingFileHandler", (_CreatesDirectory, TimedRotatingFileHandler), {})
+        return cls(path, when=when, backupCount=backup_count, delay=True)
+    raise ValueError(f"Rotação de log inválida: {rotation}")
+
+class ContextFilter(logging.Filter):
+    """Anota cada registro com o agente, a tarefa e o span atuais.
+
+    Roda na thread que emitiu o registro, onde as variáveis de contexto do
+    event loop ainda estão disponíveis.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.agent = current_agent.get()
+        record.task = current_task.get()
+        span = current_span.get()
+        record.trace_id = span.context.trace_id if span is not None else ""
+        record.span_id = span.context.span_id if span is not None else ""
+        return True
+
+class DebugSampler(logging.Filter):
+    """Mantém uma fração ``rate`` dos registros DEBUG de cada ponto de log.
+
+    A amostragem é determinística: de cada linha que emite DEBUG passam o
+    primeiro registro e, depois, um a cada ``1 / rate``. Registros de nível
+    INFO ou acima nunca são descartados.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = round(1 / rate) if rate > 0 else 0
+        self._counts: Dict[tuple, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        if not self.every:
+            return False
+        key = (record.pathname, record.lineno)
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        return count % self.every == 0
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro como uma linha JSON.
+
+    Inclui horário (UTC, ISO 8601), nível, logger, mensagem, agente, tarefa,
+    trace e span, os campos passados em ``extra=`` e, se houver, a exceção.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name in _CONTEXT_ATTRIBUTES:
+            value = getattr(record, name, "")
+            if value:
+                entry[name] = value
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES and name not in _CONTEXT_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class QueueingHandler(logging.Handler):
+    """Enfileira os registros para a thread de escrita sem nunca bloquear.
+
+    Se a fila estiver cheia o registro é descartado e contado em ``dropped``.
+    """
+
+    def __init__(self, records: queue.Queue):
+        super().__init__()
+        self.queue = records
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # A mensagem e a exceção viram texto aqui, pois os argumentos podem
+        # mudar (ou não ser seguros entre threads) até a escrita
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
 
 class Logger:
     """Classe para gerenciamento centralizado de logs."""
-    
+
     _instance: Optional['Logger'] = None
-    
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
-            cls._instance._setup_logger()
+            cls._instance._configured = False
+            cls._instance._handlers = []
+            cls._instance._listener = None
+            cls._instance._queue_handler = None
+            atexit.register(cls._instance.shutdown)
+            if hasattr(os, "register_at_fork"):
+                os.register_at_fork(after_in_child=cls._instance._restart_listener)
         return cls._instance
-    
-    def _setup_logger(self):
-        """Configura o logger com handlers para console e arquivo."""
-        self.logger = logging.getLogger('mangaba_ai')
-        self.logger.setLevel(logging.DEBUG)
-        
-        # Formato do log
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        
-        # Handler para console
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(logging.INFO)
-        console_handler.setFormatter(formatter)
-        self.logger.addHandler(console_handler)
-        
-        # Handler para arquivo
-        log_dir = Path('logs')
-        log_dir.mkdir(exist_ok=True)
-        file_handler = logging.FileHandler(log_dir / 'mangaba_ai.log')
-        file_handler.setLevel(logging.DEBUG)
-        file_handler.setFormatter(formatter)
-        self.logger.addHandler(file_handler)
-    
+
+    @property
+    def logger(self) -> logging.Logger:
+        """Logger do Mangaba.AI, configurado no primeiro uso."""
+        if not self._configured:
+            self.configure()
+        return logging.getLogger(LOGGER_NAME)
+
+    @property
+    def dropped(self) -> int:
+        """Registros descartados por falta de espaço na fila."""
+        return self._queue_handler.dropped if self._queue_handler is not None else 0
+
+    def configure(self, level: int = logging.DEBUG, console_level: Optional[int] = logging.INFO,
+                  file: Optional[str] = str(Path('logs') / 'mangaba_ai.log'), file_level: int = logging.DEBUG,
+                  json_format: bool = False, rotation: Optional[str] = "size",
+                  max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5, when: str = "midnight",
+                  debug_sample_rate: float = 1.0, async_mode: bool = True,
+                  max_queue: int = 10000) -> "Logger":
+        """(Re)configura os handlers do logger ``mangaba_ai``.
+
+        ``rotation`` é ``"size"`` (a cada ``max_bytes``), ``"time"`` (a cada
+        ``when``, como ``"midnight"`` ou ``"H"``) ou ``None``; ``file=None``
+        desliga o arquivo e ``console_level=None`` o console. Com
+        ``async_mode`` os registros são gravados por uma thread própria a partir
+        de uma fila de ``max_queue`` posições.
+        """
+        self.shutdown()
+        logger = logging.getLogger(LOGGER_NAME)
+        logger.setLevel(level)
+
+        formatter = JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+        handlers: List[logging.Handler] = []
+        if console_level is not None:
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setLevel(console_level)
+            handlers.append(console_handler)
+        if file:
+            file_handler = _file_handler(Path(file), rotation, max_bytes, backup_count, when)
+            file_handler.setLevel(file_level)
+            handlers.append(file_handler)
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        filters: List[logging.Filter] = [ContextFilter()]
+        if debug_sample_rate < 1:
+            filters.append(DebugSampler(debug_sample_rate))
+
+        if async_mode:
+            from logging.handlers import QueueListener
+
+            self._queue_handler = QueueingHandler(queue.Queue(maxsize=max_queue))
+            self._listener = QueueListener(
+                self._queue_handler.queue, *handlers, respect_handler_level=True
+            )
+            self._listener.start()
+            attached = [self._queue_handler]
+        else:
+            attached = handlers
+        for handler in attached:
+            for log_filter in filters:
+                handler.addFilter(log_filter)
+            logger.addHandler(handler)
+
+        self._handlers = attached + ([] if attached is handlers else handlers)
+        self._configured = True
+        return self
+
+    def flush(self) -> None:
+        """Aguarda a gravação dos registros já enfileirados."""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener.start()
+
+    def shutdown(self) -> None:
+        """Grava os registros pendentes e remove os handlers configurados."""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        logger = logging.getLogger(LOGGER_NAME)
+        for handler in self._handlers:
+            logger.removeHandler(handler)
+            handler.close()
+        self._handlers = []
+        self._queue_handler = None
+        self._configured = False
+
+    def _restart_listener(self) -> None:
+        # A thread de escrita não sobrevive ao fork; o processo filho cria a sua
+        if self._listener is not None:
+            self._queue_handler.queue = queue.Queue(maxsize=self._queue_handler.queue.maxsize)
+            self._listener.queue = self._queue_handler.queue
+            self._listener._thread = None
+            self._listener.start()
+
     def debug(self, message: str):
         """Registra mensagem de debug."""
         self.logger.debug(message)
-    
+
     def info(self, message: str):
         """Registra mensagem informativa."""
         self.logger.info(message)
-    
+
     def warning(self, message: str):
         """Registra mensagem de aviso."""
         self.logger.warning(message)
-    
+
     def error(self, message: str):
         """Registra mensagem de erro."""
         self.logger.error(message)
-    
+
     def critical(self, message: str):
         """Registra mensagem crítica."""
         self.logger.critical(message)
 
 # Instância global do logger
-logger = Logger() 
\ No newline at end of file
+logger = Logger()
+
+def configure_logging(**options: Any) -> Logger:
+    """Configura os logs do Mangaba.AI; veja ``Logger.configure``."""
+    return logger.configure(**options)
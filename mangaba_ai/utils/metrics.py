@@ -0,0 +1,291 @@
+"""
+Métricas do Mangaba.AI: contadores, medidores e histogramas.
+
+As métricas ficam em um registro (``metrics``) consultado sob demanda por
+``snapshot()`` ou exportado no formato texto do Prometheus por
+``render_prometheus()`` e ``serve_metrics()``.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Limites dos histogramas de latência, em segundos
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[str, ...]
+
+class Metric:
+    """Base das métricas: valores indexados pelos rótulos ``labelnames``."""
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Labels:
+        # Rótulos ausentes ficam vazios; rótulos desconhecidos são ignorados
+        if not self.labelnames:
+            return ()
+        return tuple([labels.get(name, "") for name in self.labelnames])
+
+    def labels(self, **labels: Any) -> "BoundMetric":
+        """Métrica com os rótulos fixados, para atualizações frequentes."""
+        return BoundMetric(self, self._key(labels))
+
+    def samples(self) -> List[Tuple[Dict[str, str], Any]]:
+        """Valores atuais, com os rótulos de cada um."""
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labelnames, map(str, key))), self._export(value)) for key, value in items]
+
+    def _add(self, key: Labels, amount: float) -> None:
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _export(self, value: Any) -> Any:
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+class Counter(Metric):
+    """Contador que só cresce (requisições, erros, tokens)."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        self._add(self._key(labels), amount)
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+class Gauge(Metric):
+    """Medidor que sobe e desce (chamadas em andamento, profundidade de filas)."""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        self._set(self._key(labels), value)
+
+    def _set(self, key: Labels, value: float) -> None:
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        self._add(self._key(labels), amount)
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self._add(self._key(labels), -amount)
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+class Histogram(Metric):
+    """Distribuição de observações em faixas cumulativas (latências)."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        self._observe(self._key(labels), value)
+
+    def _observe(self, key: Labels, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Contagens por faixa (a última é +Inf), soma e total
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observa a duração do bloco ``with``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _export(self, value: Any) -> Dict[str, Any]:
+        counts, total, count = value
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            running += bucket_count
+            cumulative[bound] = running
+        return {"buckets": cumulative, "sum": total, "count": count}
+
+    def count(self, **labels: Any) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+class BoundMetric:
+    """Métrica com rótulos fixados (``metric.labels(...)``)."""
+
+    __slots__ = ("metric", "key")
+
+    def __init__(self, metric: Metric, key: Labels):
+        self.metric = metric
+        self.key = key
+
+    def inc(self, amount: float = 1) -> None:
+        self.metric._add(self.key, amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self.metric._add(self.key, -amount)
+
+    def set(self, value: float) -> None:
+        self.metric._set(self.key, value)
+
+    def observe(self, value: float) -> None:
+        self.metric._observe(self.key, value)
+
+class MetricsRegistry:
+    """Registro das métricas do processo.
+
+    ``counter``, ``gauge`` e ``histogram`` retornam a métrica já registrada
+    com o mesmo nome ou criam uma nova.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Métrica {name} já registrada como {metric.type}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def register_collector(self, collector: Callable[[], None]) -> None:
+        """Registra uma função que atualiza métricas no momento da leitura.
+
+        Útil para valores caros de manter a cada evento, como a profundidade
+        de filas, que só precisam estar corretos quando consultados.
+        """
+        self._collectors.append(collector)
+
+    def collect(self) -> None:
+        """Executa os coletores registrados."""
+        for collector in self._collectors:
+            collector()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Valores atuais de todas as métricas, por nome."""
+        self.collect()
+        return {
+            name: {
+                "type": metric.type,
+                "help": metric.documentation,
+                "values": [{"labels": labels, "value": value} for labels, value in metric.samples()]
+            }
+            for name, metric in sorted(self._metrics.items())
+        }
+
+    def clear(self) -> None:
+        """Zera os valores de todas as métricas, mantendo-as registradas."""
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def render_prometheus(self) -> str:
+        """Exporta as métricas no formato texto do Prometheus (versão 0.0.4)."""
+        self.collect()
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for labels, value in metric.samples():
+                if metric.type != "histogram":
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                for bound, count in value["buckets"].items():
+                    bucket_labels = {**labels, "le": _format_value(bound)}
+                    lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels.items()) + "}"
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+# Registro global usado pela instrumentação do Mangaba.AI
+metrics = MetricsRegistry()
+
+def render_prometheus(registry: Optional[MetricsRegistry] = None) -> str:
+    """Exporta o registro (o global, por padrão) no formato do Prometheus."""
+    return (registry or metrics).render_prometheus()
+
+def serve_metrics(port: int = 9464, host: str = "127.0.0.1", registry: Optional[MetricsRegistry] = None):
+    """Serve ``/metrics`` por HTTP em uma thread própria.
+
+    Retorna o servidor (``ThreadingHTTPServer``); chame ``shutdown()`` para
+    encerrá-lo.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    registry = registry or metrics
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="mangaba-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,361 @@
+"""
+Rastreamento distribuído do Mangaba.AI.
+
+Spans são abertos com ``tracer.span(nome)`` e encadeados pelo contexto
+assíncrono (``contextvars``); entre agentes, processos e nós o contexto
+viaja no formato W3C ``traceparent``. Os spans concluídos são exportados em
+lotes no JSON do OpenTelemetry (OTLP/JSON), para arquivo ou coletor.
+
+Sem exportadores configurados o rastreamento fica desligado e ``span()``
+não registra nada.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tipos de span do OTLP
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+
+class SpanContext(NamedTuple):
+    """Identificação de um span para propagação entre processos."""
+
+    trace_id: str
+    span_id: str
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+def extract(traceparent: Optional[str]) -> Optional[SpanContext]:
+    """Lê um cabeçalho ``traceparent``; retorna ``None`` se ausente ou inválido."""
+    if not traceparent:
+        return None
+    parts = traceparent.split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return SpanContext(parts[1], parts[2])
+
+class Span:
+    """Operação rastreada, com início, fim, atributos e status."""
+
+    def __init__(self, name: str, context: SpanContext, parent_id: Optional[str] = None,
+                 kind: str = "internal", attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.status = "unset"
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._start_perf = time.perf_counter_ns()
+
+    @property
+    def traceparent(self) -> str:
+        return self.context.traceparent
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, error: BaseException) -> None:
+        self.status = "error"
+        self.status_message = str(error)
+        self.attributes["exception.type"] = type(error).__name__
+
+    def end(self) -> None:
+        # Duração pelo relógio monotônico; o início segue o relógio de parede
+        self.end_ns = self.start_ns + (time.perf_counter_ns() - self._start_perf)
+
+    @property
+    def duration(self) -> float:
+        """Duração em segundos (``0`` enquanto aberto)."""
+        return (self.end_ns - self.start_ns) / 1e9 if self.end_ns else 0.0
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "name": self.name,
+            "kind": SPAN_KINDS.get(self.kind, 1),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": {"unset": 0, "ok": 1, "error": 2}[self.status]},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        encoded = {"boolValue": value}
+    elif isinstance(value, int):
+        encoded = {"intValue": str(value)}
+    elif isinstance(value, float):
+        encoded = {"doubleValue": value}
+    else:
+        encoded = {"stringValue": str(value)}
+    return {"key": key, "value": encoded}
+
+class _NoopSpan:
+    """Span usado com o rastreamento desligado: aceita e descarta tudo."""
+
+    traceparent = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_error(self, error: BaseException) -> None:
+        pass
+
+class _NoopScope:
+    def __enter__(self) -> _NoopSpan:
+        return NOOP_SPAN
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+NOOP_SPAN = _NoopSpan()
+_NOOP_SCOPE = _NoopScope()
+
+current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("mangaba_span", default=None)
+
+class _SpanScope:
+    """Torna o span o atual durante o bloco ``with`` e o encerra ao sair."""
+
+    def __init__(self, tracer: "Tracer", span: Span):
+        self.tracer = tracer
+        self.span = span
+        self._token = None
+
+    def __enter__(self) -> Span:
+        self._token = current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        if exc is not None:
+            self.span.set_error(exc)
+        current_span.reset(self._token)
+        self.span.end()
+        self.tracer._finish(self.span)
+        return False
+
+class Tracer:
+    """Cria spans e os entrega aos exportadores em lotes de ``batch_size``."""
+
+    def __init__(self, service_name: str = "mangaba_ai", batch_size: int = 256):
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.exporters: List[Any] = []
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+        self._atexit = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters)
+
+    def add_exporter(self, exporter: Any) -> None:
+        """Adiciona um exportador (com ``export(tracer, spans)`` e ``shutdown()``)."""
+        self.exporters.append(exporter)
+        if not self._atexit:
+            atexit.register(self.shutdown)
+            self._atexit = True
+
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None,
+             parent: Optional[SpanContext] = None, kind: str = "internal"):
+        """Abre um span filho de ``parent`` ou, na ausência dele, do span atual."""
+        if not self.exporters:
+            return _NOOP_SCOPE
+        if parent is None:
+            active = current_span.get()
+            parent = active.context if active is not None else None
+        # Identificadores do sistema operacional: processos criados por fork
+        # não repetem a sequência do processo pai
+        trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        context = SpanContext(trace_id, os.urandom(8).hex())
+        span = Span(name, context, parent.span_id if parent else None, kind, attributes)
+        return _SpanScope(self, span)
+
+    def current_traceparent(self) -> Optional[str]:
+        """``traceparent`` do span atual, para propagar a outro agente ou processo."""
+        if not self.exporters:
+            return None
+        active = current_span.get()
+        return active.traceparent if active is not None else None
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            self._buffer.append(span)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """Entrega aos exportadores os spans concluídos até agora."""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        for exporter in self.exporters:
+            try:
+                exporter.export(self, batch)
+            except Exception as e:
+                logger.warning(f"Falha ao exportar spans: {e}")
+
+    def shutdown(self) -> None:
+        """Exporta os spans pendentes e encerra os exportadores."""
+        self.flush()
+        for exporter in self.exporters:
+            exporter.shutdown()
+
+    def to_otlp(self, spans: List[Span]) -> Dict[str, Any]:
+        """Monta uma requisição ``ExportTraceServiceRequest`` em OTLP/JSON."""
+        from .. import __version__
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "mangaba_ai", "version": __version__},
+                    "spans": [span.to_otlp() for span in spans]
+                }]
+            }]
+        }
+
+class InMemorySpanExporter:
+    """Guarda os spans exportados em ``spans`` (útil em testes)."""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, tracer: Tracer, spans: List[Span]) -> None:
+        self.spans.extend(spans)
+
+    def shutdown(self) -> None:
+        pass
+
+class _QueuedExporter(ABC):
+    """Base dos exportadores que gravam os lotes em uma thread própria.
+
+    ``export`` apenas serializa o lote e o enfileira, sem bloquear o event
+    loop; lotes que não cabem na fila de ``max_queue`` posições são
+    descartados e contados em ``dropped``.
+    """
+
+    thread_name = "mangaba-spans"
+
+    def __init__(self, timeout: float = 10.0, max_queue: int = 64):
+        self.timeout = timeout
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def _ensure_worker(self) -> None:
+        # Após um fork a thread não existe no processo filho
+        if self._thread is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+
+    def export(self, tracer: Tracer, spans: List[Span]) -> None:
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(json.dumps(tracer.to_otlp(spans), ensure_ascii=False))
+        except queue.Full:
+            self.dropped += len(spans)
+
+    @abstractmethod
+    def _write(self, line: str) -> None:
+        """Grava (ou envia) uma linha de OTLP/JSON; roda na thread do exportador."""
+
+    def _run(self) -> None:
+        while True:
+            line = self._queue.get()
+            try:
+                if line is None:
+                    return
+                self._write(line)
+            except Exception as e:
+                logger.warning(f"Falha ao exportar spans: {e}")
+            finally:
+                self._queue.task_done()
+
+    def shutdown(self) -> None:
+        """Aguarda a gravação dos lotes pendentes."""
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join(self.timeout)
+            self._thread = None
+
+class FileSpanExporter(_QueuedExporter):
+    """Acrescenta cada lote ao arquivo como uma linha de OTLP/JSON, em uma thread própria."""
+
+    thread_name = "mangaba-spans-file"
+
+    def __init__(self, path: str, max_queue: int = 1024):
+        super().__init__(max_queue=max_queue)
+        self.path = path
+
+    def _write(self, line: str) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+class OTLPHttpExporter(_QueuedExporter):
+    """Envia os lotes a um coletor OTLP/HTTP (``/v1/traces``) em uma thread própria.
+
+    O envio não bloqueia o event loop; lotes que não cabem na fila de
+    ``max_queue`` posições são descartados.
+    """
+
+    thread_name = "mangaba-otlp"
+
+    def __init__(self, endpoint: str = "http://localhost:4318/v1/traces",
+                 headers: Optional[Mapping[str, str]] = None, timeout: float = 10.0,
+                 max_queue: int = 64):
+        super().__init__(timeout, max_queue)
+        self.endpoint = endpoint
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+
+    def _write(self, line: str) -> None:
+        import urllib.request
+
+        request = urllib.request.Request(self.endpoint, data=line.encode("utf-8"),
+                                         headers=self.headers, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+        except Exception as e:
+            logger.warning(f"Falha ao enviar spans para {self.endpoint}: {e}")
+
+# Rastreador global usado pela instrumentação do Mangaba.AI
+tracer = Tracer()
+
+def configure_tracing(file: Optional[str] = None, endpoint: Optional[str] = None,
+                      service_name: Optional[str] = None,
+                      headers: Optional[Mapping[str, str]] = None) -> Tracer:
+    """Liga o rastreamento exportando para ``file`` e/ou para o coletor ``endpoint``."""
+    if service_name:
+        tracer.service_name = service_name
+    if file:
+        tracer.add_exporter(FileSpanExporter(file))
+    if endpoint:
+        tracer.add_exporter(OTLPHttpExporter(endpoint, headers=headers))
+    return tracer
@@ -65,4 +65,8 @@ setup(
         "python-dotenv>=1.0.0",
         "aiohttp>=3.9.0",
     ],
+    extras_require={
+        # Recuperação de contexto por similaridade (core/vector_memory.py)
+        "vector": ["numpy>=1.22"],
+    },
 ) 
\ No newline at end of file
@@ -0,0 +1,149 @@
+"""
+Testes para os transportes A2A entre nós
+"""
+import asyncio
+import socket
+
+import pytest
+
+from mangaba_ai.core.a2a_transport import A2ATransport, InMemoryTransport, SocketTransport
+from mangaba_ai.core.models import Agent
+from mangaba_ai.core.protocols import A2AProtocol
+
+class EchoModel:
+    async def generate(self, prompt):
+        return "eco"
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def wait_for_messages(a2a, agent_id, count, timeout=5.0):
+    messages = []
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while len(messages) < count and loop.time() < deadline:
+        messages += await a2a.receive_messages(agent_id)
+        await asyncio.sleep(0.01)
+    return messages
+
+@pytest.mark.asyncio
+async def test_in_memory_round_trip_between_nodes():
+    hub = {}
+    first, second = A2AProtocol(), A2AProtocol()
+    Agent("analista", "Analista", EchoModel(), a2a=second)
+    await first.connect(InMemoryTransport("no-1", hub), routes={"analista": "no-2"})
+    await second.connect(InMemoryTransport("no-2", hub), routes={"usuario": "no-1"})
+
+    await first.send_message("usuario", "analista", "olá")
+    messages = await wait_for_messages(first, "usuario", 1)
+
+    assert [(m["sender"], m["content"], m["hops"]) for m in messages] == [("analista", "eco", 1)]
+    await first.close()
+    await second.close()
+
+@pytest.mark.asyncio
+async def test_in_memory_holds_messages_until_node_starts():
+    hub = {}
+    first, second = A2AProtocol(), A2AProtocol()
+    await first.connect(InMemoryTransport("no-1", hub), routes={"b": "no-2"})
+    await first.send_message("a", "b", "pendente")
+    await first.transport.flush()
+    await second.connect(InMemoryTransport("no-2", hub))
+
+    assert [m["content"] for m in await second.receive_messages("b")] == ["pendente"]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["tcp", "unix"])
+async def test_socket_transport_batches_and_acknowledges(kind, tmp_path):
+    if kind == "tcp":
+        address = f"tcp://127.0.0.1:{free_port()}"
+    else:
+        address = f"unix://{tmp_path / 'a2a.sock'}"
+    sender, receiver = A2AProtocol(), A2AProtocol()
+    await receiver.connect(SocketTransport(address))
+    await sender.connect(SocketTransport(f"tcp://127.0.0.1:{free_port()}"), routes={"b": address})
+
+    for i in range(200):
+        await sender.send_message("a", "b", f"m{i}")
+    await sender.transport.flush()
+
+    messages = await receiver.receive_messages("b")
+    assert sorted(m["content"] for m in messages) == sorted(f"m{i}" for i in range(200))
+    assert sender.transport.acked == 200
+    assert sender.transport._peers[address].frame_id < 200
+    await sender.close()
+    await receiver.close()
+
+@pytest.mark.asyncio
+async def test_socket_transport_reconnects_when_peer_comes_up():
+    address = f"tcp://127.0.0.1:{free_port()}"
+    sender, receiver = A2AProtocol(), A2AProtocol()
+    await sender.connect(SocketTransport(f"tcp://127.0.0.1:{free_port()}"), routes={"b": address})
+    await sender.send_message("a", "b", "antes")
+    await asyncio.sleep(0.2)
+    assert sender.transport.reconnects > 0
+
+    await receiver.connect(SocketTransport(address))
+    await asyncio.wait_for(sender.transport.flush(), 5)
+
+    assert [m["content"] for m in await receiver.receive_messages("b")] == ["antes"]
+    await sender.close()
+    await receiver.close()
+
+def failing_once(deliver):
+    """Entrega que falha na primeira tentativa de cada mensagem."""
+    failed = set()
+
+    async def flaky(message):
+        if message["id"] not in failed:
+            failed.add(message["id"])
+            raise RuntimeError("destino indisponível")
+        return await deliver(message)
+
+    return flaky
+
+@pytest.mark.asyncio
+async def test_in_memory_redelivers_after_failed_delivery():
+    hub = {}
+    first, second = A2AProtocol(), A2AProtocol()
+    await first.connect(InMemoryTransport("no-1", hub), routes={"b": "no-2"})
+    await second.connect(InMemoryTransport("no-2", hub))
+    second.transport._deliver = failing_once(second.transport._deliver)
+
+    for content in ("m1", "m2"):
+        await first.send_message("a", "b", content)
+    with pytest.raises(RuntimeError):
+        await first.transport.flush()
+    for _ in range(3):
+        try:
+            await first.transport.flush()
+        except RuntimeError:
+            pass
+
+    assert [m["content"] for m in await second.receive_messages("b")] == ["m1", "m2"]
+    assert first.transport.acked == 2
+
+@pytest.mark.asyncio
+async def test_socket_transport_redelivers_after_failed_delivery():
+    address = f"tcp://127.0.0.1:{free_port()}"
+    sender, receiver = A2AProtocol(), A2AProtocol()
+    await receiver.connect(SocketTransport(address))
+    receiver.transport._deliver = failing_once(receiver.transport._deliver)
+    await sender.connect(SocketTransport(f"tcp://127.0.0.1:{free_port()}"), routes={"b": address})
+
+    await sender.send_message("a", "b", "importante")
+    await asyncio.wait_for(sender.transport.flush(), 5)
+
+    assert [m["content"] for m in await receiver.receive_messages("b")] == ["importante"]
+    await sender.close()
+    await receiver.close()
+
+def test_incomplete_transport_fails_on_creation():
+    class SendOnly(A2ATransport):
+        async def send(self, address, message):
+            pass
+
+    with pytest.raises(TypeError, match="flush"):
+        SendOnly()
@@ -0,0 +1,109 @@
+"""
+Testes do índice aproximado (IVF) da memória vetorial
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from mangaba_ai.core.ann import IVFIndex
+from mangaba_ai.core.vector_memory import VectorMemory
+from mangaba_ai.utils.exceptions import MemoryError
+
+def clustered(n, dim=32, clusters=50, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    vectors = centers[rng.integers(clusters, size=n)] + 0.5 * rng.standard_normal((n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def recall(labels, exact):
+    return np.mean([len(set(found) & set(expected)) / len(expected) for found, expected in zip(labels, exact)])
+
+@pytest.fixture(scope="module")
+def dataset():
+    vectors = clustered(20000)
+    queries = clustered(100, seed=1)
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :10]
+    return vectors, queries, exact
+
+def test_recall_against_exact_search(dataset):
+    vectors, queries, exact = dataset
+    index = IVFIndex(32, min_train_size=5000)
+    index.add(vectors, np.arange(len(vectors)))
+    assert index.is_trained and index.n_lists == int(np.sqrt(len(vectors)))
+
+    recalls = {nprobe: recall(index.search(queries, 10, nprobe=nprobe)[1], exact) for nprobe in (1, 16)}
+    assert recalls[1] < recalls[16]
+    assert recalls[16] >= 0.9
+    scores, labels = index.search(queries, 10, nprobe=index.n_lists)
+    assert recall(labels, exact) == 1.0
+    assert np.all(np.diff(scores, axis=1) <= 0)
+
+def test_incremental_insertion_and_removal(dataset):
+    vectors, _, _ = dataset
+    index = IVFIndex(32, n_lists=20, min_train_size=1000)
+    for start in range(0, 3000, 500):
+        index.add(vectors[start:start + 500], np.arange(start, start + 500))
+    assert index.is_trained and len(index) == 3000
+
+    _, [[nearest, *_]] = index.search(vectors[2999], 5)
+    assert nearest == 2999
+    index.remove([2999])
+    _, [labels] = index.search(vectors[2999], 5)
+    assert 2999 not in labels and len(index) == 2999
+    index.compact()
+    assert len(index) == 2999
+
+    small = IVFIndex(32)
+    small.add(vectors[:3], [7, 8, 9])
+    scores, labels = small.search(vectors[0], 5)
+    assert not small.is_trained
+    assert labels[0, :3].tolist()[0] == 7 and labels[0, 3:].tolist() == [-1, -1]
+
+def test_save_and_load(dataset, tmp_path):
+    vectors, queries, _ = dataset
+    index = IVFIndex(32, min_train_size=2000, nprobe=4)
+    index.add(vectors[:5000], np.arange(5000))
+    index.remove([0, 1])
+    index.save(str(tmp_path / "indice.npz"))
+
+    loaded = IVFIndex.load(str(tmp_path / "indice.npz"))
+    assert loaded.nprobe == 4 and loaded.n_lists == index.n_lists and len(loaded) == len(index)
+    for expected, found in zip(index.search(queries, 10), loaded.search(queries, 10)):
+        assert np.array_equal(expected, found)
+
+    pending = IVFIndex(32, n_lists=8)
+    pending.add(vectors[:10], np.arange(10))
+    pending.save(str(tmp_path / "pendente.npz"))
+    assert np.array_equal(IVFIndex.load(str(tmp_path / "pendente.npz")).search(queries, 3)[1],
+                          pending.search(queries, 3)[1])
+
+def test_vector_memory_uses_trained_index(dataset):
+    vectors, _, _ = dataset
+    memory = VectorMemory(lambda texts: vectors[[int(text) for text in texts]],
+                          index=IVFIndex(32, min_train_size=2000))
+    ids = memory.add_many([str(i) for i in range(4000)])
+    assert memory.index.is_trained
+
+    assert memory.search("123", k=1)[0].text == "123"
+    memory.delete(ids[123])
+    assert all(match.text != "123" for match in memory.search("123", k=10))
+    assert memory.search("3999", k=1)[0].text == "3999"
+
+def test_vector_memory_round_trip_with_index(dataset, tmp_path):
+    vectors, _, _ = dataset
+    embedder = lambda texts: vectors[[int(text) for text in texts]]
+    memory = VectorMemory(embedder, index=IVFIndex(32, min_train_size=2000))
+    ids = memory.add_many([str(i) for i in range(3000)], [{"i": i} for i in range(3000)])
+    memory.delete(ids[7])
+    memory.save(str(tmp_path / "memoria.npz"))
+
+    loaded = VectorMemory.load(str(tmp_path / "memoria.npz"), embedder)
+    assert len(loaded) == len(memory) == len(loaded.index) and loaded.index.is_trained
+    assert loaded.search("42", k=3) == memory.search("42", k=3)
+    new_id = loaded.add("3500", {"i": 3500})
+    assert loaded.search("3500", k=1)[0] == (new_id, "3500", pytest.approx(1.0), {"i": 3500})
+    assert loaded.delete(ids[42]) and all(match.id != ids[42] for match in loaded.search("42", k=10))
+    assert len(loaded.index) == len(loaded) == 2999
+
+    with pytest.raises(MemoryError):
+        VectorMemory(embedder, index=loaded.index)
@@ -0,0 +1,143 @@
+"""
+Testes para os backends de modelo
+"""
+import asyncio
+import time
+
+import pytest
+
+from mangaba_ai.core.backends import ModelBackend, SimulatedBackend
+from mangaba_ai.core.models import Agent
+from mangaba_ai.main import MangabaAI
+from mangaba_ai.utils.exceptions import APIError, ConfigurationError, RateLimitError
+
+def test_same_seed_repeats_latencies_and_failures():
+    def draws(seed):
+        backend = SimulatedBackend(latency=0.1, latency_distribution="lognormal",
+                                   failure_rate=0.3, seed=seed)
+        latencies = [backend.sample_latency() for _ in range(20)]
+        failures = []
+        for _ in range(20):
+            try:
+                backend._check_failure()
+                failures.append(False)
+            except APIError:
+                failures.append(True)
+        return latencies, failures
+
+    assert draws(7) == draws(7)
+    assert draws(7) != draws(8)
+
+@pytest.mark.parametrize("distribution", SimulatedBackend.DISTRIBUTIONS)
+def test_latency_distribution_has_configured_mean(distribution):
+    backend = SimulatedBackend(latency=0.1, latency_distribution=distribution, seed=1)
+    samples = [backend.sample_latency() for _ in range(5000)]
+
+    assert sum(samples) / len(samples) == pytest.approx(0.1, rel=0.1)
+    assert min(samples) >= 0
+
+@pytest.mark.asyncio
+async def test_cached_prefix_is_not_processed_again():
+    backend = SimulatedBackend(latency=0, prefill_tokens_per_second=10_000)
+    prefix = "instruções fixas " * 500
+    handle = await backend.create_cached_prefix(prefix, ttl=60)
+    processed = backend.prompt_tokens
+
+    assert await backend.generate("pergunta", cached_prefix=handle) == await backend.generate(prefix + "pergunta")
+    assert backend.cached_tokens == backend.count_tokens(prefix)
+    assert backend.prompt_tokens - processed == 2 * backend.count_tokens("pergunta") + backend.count_tokens(prefix)
+
+    expired = await backend.create_cached_prefix(prefix, ttl=0)
+    with pytest.raises(APIError) as error:
+        await backend.generate("pergunta", cached_prefix=expired)
+    assert error.value.error_code == "404"
+
+@pytest.mark.asyncio
+async def test_agent_registers_preamble_once_and_sends_only_the_task():
+    def run(min_cached_prefix_tokens):
+        backend = SimulatedBackend(latency=0, prefill_tokens_per_second=50_000,
+                                   min_cached_prefix_tokens=min_cached_prefix_tokens)
+        agent = Agent("redator", "Redator", backend=backend, goal="Seguir o guia de estilo: " + "regra " * 1000)
+        return backend, agent
+
+    cached_backend, cached_agent = run(0)
+    plain_backend, plain_agent = run(10 ** 9)
+    for agent in (cached_agent, plain_agent):
+        start = time.perf_counter()
+        for i in range(5):
+            await agent.execute(f"escrever seção {i}")
+        agent.elapsed = time.perf_counter() - start
+
+    assert len(cached_backend.prefixes) == 1
+    assert cached_backend.cached_tokens == 5 * cached_backend.count_tokens(cached_agent.preamble)
+    assert cached_backend.prompt_tokens < plain_backend.prompt_tokens / 3
+    assert cached_agent.elapsed < plain_agent.elapsed
+
+    # Prefixo descartado pelo backend: registrado de novo na chamada seguinte
+    cached_backend.prefixes.clear()
+    await cached_agent.execute("escrever conclusão")
+    assert len(cached_backend.prefixes) == 1
+    await cached_agent.model.close()
+    assert cached_backend.prefixes == {}
+
+@pytest.mark.asyncio
+async def test_responses_are_deterministic_and_streamed():
+    backend = SimulatedBackend(latency=0, response_tokens=20, chunk_tokens=8)
+    text = await backend.generate("olá")
+    chunks = [chunk async for chunk in backend.stream("olá")]
+
+    assert text == await backend.generate("olá") != await backend.generate("tchau")
+    assert len(chunks) == 3
+    assert "".join(chunks) == text
+    assert backend.count_tokens(text) == 20
+
+@pytest.mark.asyncio
+async def test_failure_rates_raise_model_errors():
+    backend = SimulatedBackend(latency=0, rate_limit_rate=0.5, failure_rate=0.5, retry_after=2, seed=3)
+    errors = []
+    for _ in range(50):
+        try:
+            await backend.generate("x")
+        except (APIError, RateLimitError) as e:
+            errors.append(e)
+
+    assert len(errors) == backend.failures == 50
+    assert {type(e) for e in errors} == {APIError, RateLimitError}
+    assert all(e.retry_after == 2 for e in errors if isinstance(e, RateLimitError))
+
+@pytest.mark.asyncio
+async def test_max_concurrency_limits_parallel_calls():
+    backend = SimulatedBackend(latency=0.05, max_concurrency=2)
+    start = time.perf_counter()
+    await asyncio.gather(*(backend.generate(f"p{i}") for i in range(4)))
+
+    assert backend.max_in_flight == 2
+    assert time.perf_counter() - start >= 0.1
+
+@pytest.mark.asyncio
+async def test_mangaba_runs_offline_with_simulated_backend():
+    backend = SimulatedBackend(latency=0.01, seed=0)
+    mangaba = MangabaAI(backend=backend)
+    agent = mangaba.create_agent("analista", "Analista", "Analisar")
+    results = await mangaba.execute([mangaba.create_task(f"tarefa {i}", agent) for i in range(5)])
+
+    assert len(results) == 5
+    assert not any(result.startswith("Erro") for result in results.values())
+    assert backend.calls == 5
+
+@pytest.mark.asyncio
+async def test_agent_accepts_backend():
+    agent = Agent("analista", "Analista", backend=SimulatedBackend(latency=0))
+    assert await agent.execute("tarefa")
+
+def test_mangaba_requires_key_or_backend():
+    with pytest.raises(ConfigurationError):
+        MangabaAI()
+
+def test_incomplete_backend_fails_on_creation():
+    class OnlyGenerate(ModelBackend):
+        async def generate(self, prompt, generation_config=None, cached_prefix=None):
+            return "texto"
+
+    with pytest.raises(TypeError, match="stream"):
+        OnlyGenerate()
@@ -0,0 +1,176 @@
+"""
+Testes para o cache de respostas do Mangaba.AI
+"""
+import asyncio
+import multiprocessing
+import sqlite3
+
+import pytest
+
+from mangaba_ai.core.cache import ResponseCache, SQLiteResponseCache, make_cache_key
+from mangaba_ai.core.backends import SimulatedBackend
+from mangaba_ai.core.models import GeminiModel
+from mangaba_ai.main import MangabaAI
+from mangaba_ai.utils.config_validator import ConfigValidator
+
+class FakeTransport:
+    """Substitui o transporte HTTP contando as chamadas."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, model_name, prompt, generation_config=None):
+        self.calls += 1
+        return f"resposta {self.calls}"
+
+def test_lru_evicts_least_recently_used():
+    cache = ResponseCache(max_size=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+def test_ttl_expires_entries(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("mangaba_ai.core.cache.time.monotonic", lambda: now[0])
+    cache = ResponseCache(ttl=10)
+    cache.set("a", "1")
+    now[0] = 11
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+def test_stats_count_hits_and_misses():
+    cache = ResponseCache()
+    cache.set("a", "1")
+    cache.get("a")
+    cache.get("b")
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+def test_key_depends_on_generation_config():
+    assert make_cache_key("m", "p", {"temperature": 0.1}) != make_cache_key("m", "p", {"temperature": 0.2})
+    assert make_cache_key("m", "p", {"a": 1, "b": 2}) == make_cache_key("m", "p", {"b": 2, "a": 1})
+
+@pytest.mark.asyncio
+async def test_generate_serves_repeated_prompt_from_cache():
+    model = GeminiModel("test-key", transport=FakeTransport())
+
+    first = await model.generate("Olá")
+    model.mcp.clear_context(model.model_id)
+    second = await model.generate("Olá")
+
+    assert first == second
+    assert model.transport.calls == 1
+    assert model.cache.stats()["hits"] == 1
+
+@pytest.mark.asyncio
+async def test_generate_can_bypass_cache():
+    model = GeminiModel("test-key", transport=FakeTransport())
+
+    await model.generate("Olá")
+    model.mcp.clear_context(model.model_id)
+    await model.generate("Olá", use_cache=False)
+
+    assert model.transport.calls == 2
+
+@pytest.mark.asyncio
+async def test_mangaba_close_closes_sqlite_cache(tmp_path):
+    config = ConfigValidator().get_default_config()
+    config["memory"]["cache_path"] = str(tmp_path / "cache.db")
+    mangaba = MangabaAI(config=config, backend=SimulatedBackend(latency=0))
+    agent = mangaba.create_agent("pesquisador", "Pesquisador", "Pesquisar")
+    await agent.execute("Pesquisar IA")
+    assert isinstance(mangaba.model.cache, SQLiteResponseCache) and mangaba.model.cache._conn is not None
+
+    await mangaba.close()
+    assert mangaba.model.cache._conn is None
+
+def _write_entries(path, prefix):
+    cache = SQLiteResponseCache(path)
+    for i in range(50):
+        cache.set(f"{prefix}{i}", f"valor {i}")
+    cache.close()
+
+def test_sqlite_cache_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteResponseCache(path)
+    cache.set("a", "1")
+    cache.close()
+
+    reopened = SQLiteResponseCache(path)
+    assert reopened.get("a") == "1"
+    assert reopened.stats()["hits"] == 1
+
+def test_sqlite_cache_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "cache.db")
+    workers = [multiprocessing.Process(target=_write_entries, args=(path, p)) for p in "ab"]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    cache = SQLiteResponseCache(path)
+    assert len(cache) == 100
+    assert cache.get("b49") == "valor 49"
+
+def test_processes_can_open_a_new_database_together(tmp_path):
+    for attempt in range(5):
+        path = str(tmp_path / f"novo-{attempt}.db")
+        workers = [multiprocessing.Process(target=_write_entries, args=(path, p)) for p in "abcdef"]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert [worker.exitcode for worker in workers] == [0] * 6
+        assert len(SQLiteResponseCache(path)) == 300
+
+def test_sqlite_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("mangaba_ai.core.cache.time.time", lambda: now[0])
+    cache = SQLiteResponseCache(str(tmp_path / "cache.db"), max_size=3)
+    for key in "abcd":
+        now[0] += 1
+        cache.set(key, key)
+    now[0] += 1
+    cache.get("a")
+    cache.compact()
+
+    assert len(cache) == 3
+    assert cache.get("b") is None
+    assert cache.get("a") == "a"
+
+def test_sqlite_cache_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("mangaba_ai.core.cache.time.time", lambda: now[0])
+    cache = SQLiteResponseCache(str(tmp_path / "cache.db"), ttl=10)
+    cache.set("a", "1")
+    now[0] += 11
+
+    assert cache.get("a") is None
+
+@pytest.mark.asyncio
+async def test_sqlite_cache_waits_for_lock_off_the_event_loop(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteResponseCache(path, timeout=5)
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN EXCLUSIVE")
+
+    write = asyncio.ensure_future(cache.aset("a", "1"))
+    ticks = 0
+    for _ in range(10):
+        await asyncio.sleep(0.01)
+        ticks += 1
+    assert ticks == 10 and not write.done()
+
+    other.execute("COMMIT")
+    other.close()
+    await write
+    assert await cache.aget("a") == "1"
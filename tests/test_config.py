@@ -0,0 +1,100 @@
+"""
+Testes da configuração imutável e da recarga a quente
+"""
+import asyncio
+import json
+import os
+
+import pytest
+
+from mangaba_ai.core.backends import SimulatedBackend
+from mangaba_ai.main import MangabaAI
+from mangaba_ai.utils.config import Config, ConfigWatcher
+from mangaba_ai.utils.config_validator import ConfigValidator, _compiled_validator
+from mangaba_ai.utils.exceptions import ConfigurationError, ValidationError
+
+def default_config():
+    return ConfigValidator().get_default_config()
+
+def write_config(path, config, bump=0):
+    path.write_text(json.dumps(config), encoding="utf-8")
+    # Garante uma nova data de modificação mesmo em sistemas de arquivos lentos
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + bump * 1_000_000_000))
+
+def test_schema_and_validator_are_shared():
+    assert ConfigValidator().schema is ConfigValidator().schema
+    assert _compiled_validator() is _compiled_validator()
+    config = default_config()
+    config["agents"]["max_concurrent_tasks"] = "muitas"
+    with pytest.raises(ValidationError):
+        ConfigValidator().validate(config)
+
+def test_config_is_immutable_mapping():
+    config = Config.load(default_config())
+    assert config["agents"]["max_concurrent_tasks"] == 5
+    assert config.get("context_fusion", {}).get("max_contexts") == 10
+    assert config["communication"]["priority_levels"] == ("high", "medium", "low")
+    with pytest.raises(TypeError):
+        config["agents"]["max_retries"] = 10
+    assert config.to_dict() == default_config()
+
+    updated = config.replace(agents={**config["agents"], "max_retries": 10})
+    assert updated["agents"]["max_retries"] == 10 and config["agents"]["max_retries"] == 3
+    assert updated["models"] is config["models"]
+
+def test_watcher_reloads_hot_sections_and_keeps_the_rest(tmp_path):
+    path = tmp_path / "config.json"
+    config = default_config()
+    write_config(path, config)
+    watcher = ConfigWatcher(str(path))
+    received = []
+    watcher.subscribe(received.append)
+    assert not watcher.check()
+
+    config["memory"]["cache_size"] = 50
+    config["communication"]["max_messages"] = 1
+    write_config(path, config, bump=1)
+    assert watcher.check()
+    assert received == [watcher.current]
+    assert watcher.current["memory"]["cache_size"] == 50
+    assert watcher.current["communication"]["max_messages"] == 1000
+
+    config["agents"]["max_concurrent_tasks"] = 0
+    write_config(path, config, bump=2)
+    assert not watcher.check()
+    assert watcher.current["agents"]["max_concurrent_tasks"] == 5
+
+    with pytest.raises(ConfigurationError):
+        ConfigWatcher(str(tmp_path / "ausente.json"))
+
+@pytest.mark.asyncio
+async def test_running_workflow_keeps_its_snapshot(tmp_path):
+    path = tmp_path / "config.json"
+    config = default_config()
+    write_config(path, config)
+    mangaba = MangabaAI(backend=SimulatedBackend(latency=0.05), config=config)
+    agent = mangaba.create_agent("recarregado", "Analista", "Analisar")
+    watcher = mangaba.watch_config(str(path), interval=0.01)
+
+    running = asyncio.ensure_future(mangaba.execute([mangaba.create_task("longa", agent)]))
+    await asyncio.sleep(0)
+    old_scheduler = mangaba.scheduler
+    config["agents"]["max_concurrent_tasks"] = 2
+    config["agents"]["max_retries"] = 7
+    config["models"]["gemini"]["temperature"] = 0.1
+    write_config(path, config, bump=1)
+    for _ in range(100):
+        if mangaba.config["agents"]["max_concurrent_tasks"] == 2:
+            break
+        await asyncio.sleep(0.01)
+
+    assert watcher.current is mangaba.config
+    assert mangaba.scheduler is not old_scheduler
+    assert mangaba.scheduler.max_concurrent_tasks == 2
+    assert old_scheduler.max_concurrent_tasks == 5
+    assert agent.retry_policy.max_retries == 7
+    assert mangaba.model.generation_config["temperature"] == 0.1
+    assert not (await running)["longa"].startswith("Erro")
+    await mangaba.close()
+    assert mangaba.config_watcher is None
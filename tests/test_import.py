@@ -0,0 +1,53 @@
+"""
+Testes do tempo e dos efeitos colaterais de ``import mangaba_ai``
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Orçamento generoso para máquinas lentas de CI; a importação leva dezenas de ms
+IMPORT_BUDGET = 0.5
+
+HEAVY_MODULES = ["google.generativeai", "aiohttp", "jsonschema", "dotenv", "pip"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import mangaba_ai
+package = time.perf_counter() - start
+from mangaba_ai import MangabaAI
+total = time.perf_counter() - start
+print(json.dumps({
+    "package": package,
+    "total": total,
+    "loaded": [name for name in %r if name in sys.modules],
+    "handlers": [type(h).__name__ for h in __import__("logging").getLogger().handlers],
+}))
+""" % (HEAVY_MODULES,)
+
+def run_probe(cwd: Path) -> dict:
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    output = subprocess.run([sys.executable, "-c", PROBE], cwd=cwd, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+def test_import_is_fast_and_side_effect_free(tmp_path):
+    # A melhor de três medições descarta ruído de disco frio e do sistema
+    probes = [run_probe(tmp_path) for _ in range(3)]
+    best = min(probes, key=lambda probe: probe["total"])
+
+    assert best["total"] < IMPORT_BUDGET, best
+    assert best["loaded"] == []
+    assert best["handlers"] == []
+    assert list(tmp_path.iterdir()) == []
+
+def test_lazy_attributes_are_exported():
+    import mangaba_ai
+    from mangaba_ai.main import MangabaAI
+
+    assert mangaba_ai.MangabaAI is MangabaAI
+    assert {"Agent", "Task", "GeminiModel", "MangabaAI"} <= set(dir(mangaba_ai))
@@ -0,0 +1,111 @@
+"""
+Testes do pipeline de logs do Mangaba.AI
+"""
+import json
+import logging
+import queue
+
+import pytest
+
+from mangaba_ai.core.models import Task
+from mangaba_ai.core.scheduler import TaskScheduler
+from mangaba_ai.utils.context import current_agent, current_task
+from mangaba_ai.utils.exceptions import APIError
+from mangaba_ai.utils.logging import DebugSampler, QueueingHandler, configure_logging, logger
+from mangaba_ai.utils.tracing import InMemorySpanExporter, tracer
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "logs" / "mangaba.jsonl"
+    yield path
+    logger.shutdown()
+
+def read_records(path):
+    logger.flush()
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+@pytest.fixture
+def exporter():
+    memory = InMemorySpanExporter()
+    tracer.exporters.append(memory)
+    yield memory
+    tracer.flush()
+    tracer.exporters.remove(memory)
+
+def test_json_records_carry_agent_trace_and_extras(log_file, exporter):
+    configure_logging(file=str(log_file), json_format=True, console_level=None)
+    assert not log_file.parent.exists()
+
+    token = current_agent.set("pesquisador")
+    try:
+        with tracer.span("busca") as span:
+            logging.getLogger("mangaba_ai.teste").info("consulta %s", "feita", extra={"tokens": 42})
+    finally:
+        current_agent.reset(token)
+    try:
+        raise ValueError("falhou")
+    except ValueError:
+        logging.getLogger("mangaba_ai.teste").exception("erro")
+
+    first, second = read_records(log_file)
+    assert first["message"] == "consulta feita"
+    assert first["level"] == "INFO" and first["logger"] == "mangaba_ai.teste"
+    assert first["agent"] == "pesquisador" and first["tokens"] == 42
+    assert first["trace_id"] == span.context.trace_id and first["span_id"] == span.context.span_id
+    assert "agent" not in second
+    assert "ValueError: falhou" in second["exception"]
+
+def test_size_rotation_keeps_backups(log_file):
+    configure_logging(file=str(log_file), console_level=None, max_bytes=200, backup_count=2)
+    for i in range(50):
+        logging.getLogger("mangaba_ai.teste").info(f"registro {i}")
+    logger.flush()
+
+    assert sorted(path.name for path in log_file.parent.iterdir()) == [
+        "mangaba.jsonl", "mangaba.jsonl.1", "mangaba.jsonl.2"
+    ]
+    assert "registro 49" in log_file.read_text(encoding="utf-8")
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = QueueingHandler(queue.Queue(maxsize=1))
+    log = logging.getLogger("mangaba_ai.fila")
+    for i in range(3):
+        handler.handle(log.makeRecord(log.name, logging.INFO, __file__, 1, "m%d", (i,), None))
+    assert handler.dropped == 2
+    assert handler.queue.get_nowait().getMessage() == "m0"
+
+def test_debug_sampling_is_per_call_site():
+    sampler = DebugSampler(0.25)
+
+    def record(level, lineno):
+        return logging.LogRecord("mangaba_ai", level, __file__, lineno, "m", (), None)
+
+    kept = [sampler.filter(record(logging.DEBUG, 10)) for _ in range(9)]
+    assert kept == [True, False, False, False, True, False, False, False, True]
+    assert sampler.filter(record(logging.DEBUG, 20))
+    assert all(sampler.filter(record(logging.INFO, 10)) for _ in range(5))
+    assert not DebugSampler(0).filter(record(logging.DEBUG, 30))
+
+@pytest.mark.asyncio
+async def test_scheduler_tags_records_with_task(log_file):
+    configure_logging(file=str(log_file), json_format=True, console_level=None, async_mode=False)
+
+    class LoggingAgent:
+        name = "registrador"
+
+        async def execute(self, description, context=None):
+            logging.getLogger("mangaba_ai.teste").info(description)
+            return description
+
+    first, second = Task("primeira", LoggingAgent()), Task("segunda", LoggingAgent())
+    assert first.id != second.id
+    await TaskScheduler().run([first, second])
+
+    tasks = {record["message"]: record["task"] for record in read_records(log_file)}
+    assert tasks == {"primeira": first.id, "segunda": second.id}
+    assert current_task.get() == ""
+
+def test_exceptions_are_not_logged_on_construction(caplog):
+    with caplog.at_level(logging.DEBUG, logger="mangaba_ai"):
+        APIError("indisponível", "503")
+    assert caplog.records == []
@@ -0,0 +1,97 @@
+"""
+Testes da memória contextual compartilhada pelos agentes
+"""
+import asyncio
+
+import pytest
+
+from mangaba_ai.core import memory as memory_module
+from mangaba_ai.core.backends import SimulatedBackend
+from mangaba_ai.core.memory import ContextualMemory
+from mangaba_ai.main import MangabaAI
+from mangaba_ai.utils.metrics import metrics
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(memory_module.time, "monotonic", lambda: now[0])
+    return now
+
+def test_least_recently_used_entry_is_evicted():
+    memory = ContextualMemory(max_size=2)
+    memory.add("a", 1)
+    memory.add("b", 2)
+    assert memory.get("a") == 1
+    memory.add("c", 3)
+
+    assert memory.get("b") is None
+    assert memory.get("a") == 1 and memory.get("c") == 3
+    assert len(memory) == 2
+
+def test_entries_expire_with_their_own_ttl(clock):
+    memory = ContextualMemory(ttl=10)
+    memory.add("padrao", "x")
+    memory.add("curto", "y", ttl=1)
+    memory.add("eterno", "z", ttl=0)
+    memory.cache("resultado", "r", ttl=5)
+
+    clock[0] += 2
+    assert "curto" not in memory
+    assert memory.get("padrao") == "x"
+    clock[0] += 9
+    assert memory.purge_expired() == 2
+    assert memory.get("eterno") == "z"
+    assert memory.get_cached("resultado") is None
+
+@pytest.mark.asyncio
+async def test_background_sweeper_removes_expired_entries():
+    memory = ContextualMemory(ttl=0.01, cleanup_interval=0.01)
+    for i in range(10):
+        memory.add(f"chave {i}", i)
+    await asyncio.sleep(0.1)
+
+    assert len(memory) == 0
+    assert memory.footprint()["context"] == {"entries": 0, "bytes": 0}
+    await memory.close()
+
+def test_footprint_is_bounded_and_reported():
+    memory = ContextualMemory(max_size=100, cache_size=10, max_history=5)
+    for i in range(1000):
+        memory.add(f"chave {i}", "v" * 100)
+        memory.cache(f"cache {i}", {"resultado": [i, i]})
+        memory.add_to_history("ação", f"resultado {i}", {"i": i})
+
+    footprint = memory.footprint()
+    assert footprint["context"]["entries"] == 100
+    assert footprint["cache"]["entries"] == 10
+    assert footprint["history"]["entries"] == 5
+    assert footprint["context"]["bytes"] >= 100 * 100
+    assert footprint["bytes"] == sum(footprint[store]["bytes"] for store in ("context", "cache", "history"))
+    assert [entry["result"] for entry in memory.get_history(limit=2)] == ["resultado 998", "resultado 999"]
+
+    metrics.collect()
+    assert metrics.get("mangaba_memory_entries").value(store="context") >= 100
+
+    memory.clear()
+    assert memory.footprint()["bytes"] == 0
+
+@pytest.mark.asyncio
+async def test_agents_share_memory_and_follow_config_reload():
+    mangaba = MangabaAI(backend=SimulatedBackend(latency=0))
+    first = mangaba.create_agent("primeiro", "Pesquisador", "Pesquisar")
+    second = mangaba.create_agent("segundo", "Analista", "Analisar")
+    first.memory.add("descoberta", "dados")
+    assert second.memory.get("descoberta") == "dados"
+
+    task = mangaba.create_task("Pesquisar IA", first)
+    [result] = (await mangaba.execute([task])).values()
+    [entry] = second.memory.get_history()
+    assert entry["action"] == "Pesquisar IA" and entry["result"] == result
+    assert entry["metadata"] == {"agent": "primeiro", "task": task.id}
+
+    for i in range(10):
+        mangaba.memory.add(f"chave {i}", i)
+    memory_config = {**mangaba.config["memory"], "max_size": 3}
+    mangaba.apply_config(mangaba.config.replace(memory=memory_config))
+    assert len(mangaba.memory) == 3 and mangaba.memory.get("chave 9") == 9
+    await mangaba.close()
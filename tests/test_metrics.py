@@ -0,0 +1,134 @@
+"""
+Testes das métricas e da instrumentação do Mangaba.AI
+"""
+import urllib.request
+
+import pytest
+
+from mangaba_ai.core.backends import SimulatedBackend
+from mangaba_ai.core.models import Agent, LanguageModel
+from mangaba_ai.core.protocols import A2AProtocol
+from mangaba_ai.core.retry import RetryPolicy
+from mangaba_ai.core.tokens import token_usage
+from mangaba_ai.main import MangabaAI
+from mangaba_ai.utils.metrics import MetricsRegistry, metrics, serve_metrics
+
+def value(name, **labels):
+    return metrics.get(name).value(**labels)
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latencia_seconds", "Latência", ("rota",), buckets=(0.1, 1))
+    for observation in (0.05, 0.5, 0.7, 3):
+        histogram.observe(observation, rota="/a")
+
+    [sample] = registry.snapshot()["latencia_seconds"]["values"]
+    assert sample["labels"] == {"rota": "/a"}
+    assert sample["value"]["buckets"] == {0.1: 1, 1: 3, float("inf"): 4}
+    assert sample["value"]["count"] == 4
+    assert sample["value"]["sum"] == pytest.approx(4.25)
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    registry.counter("pedidos_total", "Pedidos\natendidos", ("status",)).inc(3, status='o"k')
+    registry.gauge("fila", "Profundidade").set(2)
+    registry.histogram("duracao_seconds", "Duração", buckets=(1,)).observe(0.5)
+
+    text = registry.render_prometheus()
+    assert "# HELP pedidos_total Pedidos\\natendidos\n# TYPE pedidos_total counter\n" in text
+    assert 'pedidos_total{status="o\\"k"} 3\n' in text
+    assert "fila 2\n" in text
+    assert 'duracao_seconds_bucket{le="1"} 1\n' in text
+    assert 'duracao_seconds_bucket{le="+Inf"} 1\n' in text
+    assert "duracao_seconds_count 1\n" in text
+
+def test_registry_reuses_metrics_by_name():
+    registry = MetricsRegistry()
+    assert registry.counter("x_total", "X") is registry.counter("x_total", "X")
+    with pytest.raises(ValueError):
+        registry.gauge("x_total", "X")
+
+@pytest.mark.asyncio
+async def test_workflow_is_instrumented_per_agent_and_model():
+    backend = SimulatedBackend(latency=0, model_name="sim-metricas")
+    mangaba = MangabaAI(backend=backend)
+    agent = mangaba.create_agent("metricas", "Analista", "Analisar")
+    tasks_before = value("mangaba_tasks_total", outcome="ok")
+
+    await mangaba.execute([mangaba.create_task(f"tarefa {i}", agent) for i in range(3)])
+
+    labels = {"model": "sim-metricas", "agent": "metricas"}
+    assert value("mangaba_model_requests_total", outcome="ok", **labels) == 3
+    assert metrics.get("mangaba_model_request_seconds").count(**labels) == 3
+    assert value("mangaba_model_tokens_total", direction="out", **labels) == 3 * backend.response_tokens
+    assert value("mangaba_model_tokens_total", direction="in", **labels) > 0
+    assert value("mangaba_model_in_flight", **labels) == 0
+    assert value("mangaba_agent_tasks_total", agent="metricas", outcome="ok") == 3
+    assert value("mangaba_tasks_total", outcome="ok") - tasks_before == 3
+    assert value("mangaba_tasks_running") == 0
+
+@pytest.mark.asyncio
+async def test_streamed_tasks_are_attributed_to_the_agent():
+    backend = SimulatedBackend(latency=0, model_name="sim-stream")
+    agent = Agent("transmissor", "Redator", backend=backend, goal="Escrever")
+    before = token_usage.usage("transmissor")
+
+    chunks = [chunk async for chunk in agent.execute_stream("Escrever resumo")]
+
+    labels = {"model": "sim-stream", "agent": "transmissor"}
+    assert value("mangaba_model_requests_total", outcome="ok", **labels) == 1
+    assert value("mangaba_model_tokens_total", direction="out", **labels) == backend.response_tokens
+    assert value("mangaba_agent_tasks_total", agent="transmissor", outcome="ok") == 1
+    assert value("mangaba_agent_in_flight", agent="transmissor") == 0
+    assert token_usage.usage("transmissor")["calls"] - before["calls"] == 1
+    assert agent.memory.get_history()[-1]["result"] == "".join(chunks)
+
+@pytest.mark.asyncio
+async def test_cache_hits_and_misses_are_counted():
+    model = LanguageModel(SimulatedBackend(latency=0, model_name="sim-cache"))
+    await model.generate("pergunta")
+    model.mcp.clear_context(model.model_id)
+    await model.generate("pergunta")
+
+    assert value("mangaba_cache_requests_total", model="sim-cache", result="miss") == 1
+    assert value("mangaba_cache_requests_total", model="sim-cache", result="hit") == 1
+
+@pytest.mark.asyncio
+async def test_retries_are_counted_per_agent():
+    backend = SimulatedBackend(latency=0, failure_rate=0.5, seed=4, model_name="sim-retry")
+    agent = Agent("repetidor", "Agente", backend=backend,
+                  retry_policy=RetryPolicy(max_retries=20, base_delay=0))
+    for i in range(5):
+        await agent.execute(f"tarefa {i}")
+
+    assert backend.failures > 0
+    assert value("mangaba_retries_total", agent="repetidor", error="APIError") == backend.failures
+    assert value("mangaba_model_requests_total", model="sim-retry", agent="repetidor",
+                 outcome="error") == backend.failures
+
+@pytest.mark.asyncio
+async def test_a2a_queue_depth_and_outcomes():
+    a2a = A2AProtocol(max_messages=2, overflow="reject")
+    rejected = value("mangaba_a2a_messages_total", outcome="rejected")
+    for i in range(3):
+        await a2a.send_message("a", "fila-metricas", f"m{i}")
+
+    metrics.collect()
+    assert value("mangaba_a2a_queue_depth", agent="fila-metricas", queue="mailbox") == 2
+    assert value("mangaba_a2a_messages_total", outcome="rejected") - rejected == 1
+    await a2a.receive_messages("fila-metricas")
+    metrics.collect()
+    assert value("mangaba_a2a_queue_depth", agent="fila-metricas", queue="mailbox") == 0
+
+def test_metrics_endpoint_serves_prometheus_text():
+    registry = MetricsRegistry()
+    registry.counter("chamadas_total", "Chamadas").inc()
+    server = serve_metrics(port=0, registry=registry)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "chamadas_total 1" in response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,178 @@
+"""
+Testes para os protocolos A2A e MCP do Mangaba.AI
+"""
+import asyncio
+import inspect
+import time
+
+import pytest
+
+from mangaba_ai.core.models import Agent
+from mangaba_ai.core.protocols import A2AProtocol, ContextWindow, MCPProtocol
+from mangaba_ai.main import MangabaAI
+
+@pytest.mark.asyncio
+async def test_fuse_context_does_not_nest_previous_prompts():
+    """O prompt fundido não deve conter prompts fundidos anteriores."""
+    mcp = MCPProtocol(max_contexts=3)
+    for i in range(20):
+        fused = await mcp.fuse_context(f"pergunta {i}", "m")
+        mcp.update_context("m", f"pergunta {i}", f"resposta {i}")
+
+    assert fused.count("Contexto anterior:") == 1
+    assert "pergunta 16" in fused
+    assert "pergunta 15" not in fused
+    assert len(mcp.context["m"].turns) == 3
+
+@pytest.mark.asyncio
+async def test_first_prompt_is_sent_unchanged():
+    """Sem contexto, o prompt deve ser enviado como está."""
+    mcp = MCPProtocol()
+    assert await mcp.fuse_context("olá", "m") == "olá"
+
+def test_token_budget_evicts_oldest_turns():
+    """O orçamento de tokens deve descartar os turnos mais antigos primeiro."""
+    window = ContextWindow(max_contexts=100, max_tokens=50)
+    for i in range(10):
+        window.append(f"entrada {i} " + "x" * 40)
+
+    assert window.tokens <= 50
+    assert "entrada 9" in window.render()
+    assert "entrada 0" not in window.render()
+
+def test_ttl_expires_turns(monkeypatch):
+    """Turnos mais antigos que o TTL devem ser descartados."""
+    now = [1000.0]
+    monkeypatch.setattr("mangaba_ai.core.protocols.time.monotonic", lambda: now[0])
+    window = ContextWindow(context_ttl=10)
+    window.append("antigo")
+    now[0] += 5
+    window.append("novo")
+    now[0] += 6
+
+    assert window.render() == "Entrada: novo"
+
+@pytest.mark.asyncio
+async def test_messages_are_received_by_priority():
+    a2a = A2AProtocol()
+    await a2a.send_message("a", "b", "baixa", priority="low")
+    await a2a.send_message("a", "b", "alta", priority="high")
+    await a2a.send_message("a", "b", "média")
+
+    messages = await a2a.receive_messages("b")
+    assert [m["content"] for m in messages] == ["alta", "média", "baixa"]
+    assert a2a.pending("b") == 0
+
+@pytest.mark.asyncio
+async def test_queue_depth_is_bounded():
+    a2a = A2AProtocol(max_messages=3)
+    for i in range(10):
+        await a2a.send_message("a", "b", f"m{i}", priority="low")
+    assert await a2a.send_message("a", "b", "urgente", priority="high")
+
+    assert a2a.pending("b") == 3
+    assert a2a.dropped == 8
+    contents = [m["content"] for m in await a2a.receive_messages("b")]
+    assert contents == ["urgente", "m8", "m9"]
+
+@pytest.mark.asyncio
+async def test_reject_policy_refuses_new_messages():
+    a2a = A2AProtocol(max_messages=1, overflow="reject")
+    assert await a2a.send_message("a", "b", "primeira")
+    assert not await a2a.send_message("a", "b", "segunda", priority="high")
+
+@pytest.mark.asyncio
+async def test_expired_messages_are_dropped(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("mangaba_ai.core.protocols.time.monotonic", lambda: now[0])
+    a2a = A2AProtocol(message_ttl=10)
+    await a2a.send_message("a", "b", "velha")
+    now[0] = 20
+    await a2a.send_message("a", "b", "nova")
+
+    assert [m["content"] for m in await a2a.receive_messages("b")] == ["nova"]
+    assert a2a.expired == 1
+
+def test_agents_created_by_mangaba_share_one_broker():
+    mangaba = MangabaAI("chave")
+    first = mangaba.create_agent("a", "A", "x")
+    second = mangaba.create_agent("b", "B", "y")
+
+    assert first.a2a is second.a2a is mangaba.a2a
+    assert mangaba.a2a.max_messages == mangaba.config["communication"]["max_messages"]
+
+class EchoModel:
+    """Modelo falso que responde após um atraso."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def generate(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return "eco"
+
+@pytest.mark.asyncio
+async def test_sender_does_not_wait_for_receiver_processing():
+    a2a = A2AProtocol()
+    Agent("b", "B", EchoModel(delay=0.5), a2a=a2a)
+
+    start = time.perf_counter()
+    assert await a2a.send_message("a", "b", "olá")
+    assert time.perf_counter() - start < 0.1
+    await a2a.close()
+
+@pytest.mark.asyncio
+async def test_agents_process_messages_in_parallel():
+    a2a = A2AProtocol()
+    for name in "bcde":
+        Agent(name, "Agente", EchoModel(delay=0.1), a2a=a2a)
+
+    start = time.perf_counter()
+    for name in "bcde":
+        await a2a.send_message("a", name, "olá")
+    await a2a.join()
+
+    assert time.perf_counter() - start < 0.3
+    assert [m["sender"] for m in await a2a.receive_messages("a")] == list("bcde")
+    await a2a.close()
+
+@pytest.mark.asyncio
+async def test_ping_pong_is_stopped_by_hop_limit_with_constant_stack():
+    a2a = A2AProtocol(max_hops=20)
+    depths = []
+    first = Agent("a", "A", EchoModel(), a2a=a2a)
+    Agent("b", "B", EchoModel(), a2a=a2a)
+    original = first.handle_message
+
+    async def handle_message(message):
+        depths.append(len(inspect.stack(0)))
+        await original(message)
+
+    a2a.register_callback("a", handle_message)
+    await a2a.send_message("b", "a", "começo")
+    await a2a.join()
+
+    assert len(depths) == 11
+    assert len(set(depths)) == 1
+    await a2a.close()
+
+@pytest.mark.asyncio
+async def test_full_inbox_applies_backpressure():
+    a2a = A2AProtocol(inbox_size=1, send_timeout=0.05)
+    release = asyncio.Event()
+
+    async def blocked(message):
+        await release.wait()
+
+    a2a.register_callback("b", blocked)
+    assert await a2a.send_message("a", "b", "1")
+    await asyncio.sleep(0)
+    assert await a2a.send_message("a", "b", "2")
+    assert not await a2a.send_message("a", "b", "3")
+    assert a2a.queue_depth("b") == 1
+
+    release.set()
+    await a2a.join()
+    await a2a.close()
@@ -0,0 +1,85 @@
+"""
+Testes para o limitador de taxa do Mangaba.AI
+"""
+import asyncio
+import time
+
+import pytest
+
+from mangaba_ai.core.models import GeminiModel
+from mangaba_ai.core.ratelimit import RateLimiter, get_rate_limiter
+from mangaba_ai.core.transport import GeminiTransport
+from mangaba_ai.utils.exceptions import RateLimitError
+
+@pytest.mark.asyncio
+async def test_requests_are_spread_over_time():
+    limiter = RateLimiter(requests_per_minute=1200, burst=1)
+    start = time.perf_counter()
+    await asyncio.gather(*[limiter.acquire() for _ in range(11)])
+
+    assert time.perf_counter() - start >= 0.45
+
+@pytest.mark.asyncio
+async def test_token_budget_is_enforced():
+    limiter = RateLimiter(requests_per_minute=100000, tokens_per_minute=6000)
+    await limiter.acquire(tokens=6000)
+    start = time.perf_counter()
+    await limiter.acquire(tokens=20)
+
+    assert time.perf_counter() - start >= 0.15
+
+@pytest.mark.asyncio
+async def test_cancelled_wait_returns_its_reservation():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600, burst=1)
+    await limiter.acquire(tokens=600)
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(limiter.acquire(tokens=300), timeout=0.05)
+
+    assert limiter.requests.reserve(1) < 1.0
+    assert limiter.tokens.reserve(300) < 31
+
+def test_rate_shrinks_on_429_and_recovers():
+    limiter = RateLimiter(requests_per_minute=600, cooldown=10)
+    limiter.on_rate_limited()
+    limiter.on_rate_limited()
+
+    assert limiter.scale == 0.5
+    assert limiter.stats()["requests_per_minute"] == 300
+
+    for _ in range(20):
+        limiter.on_success()
+    assert limiter.scale == 1.0
+
+@pytest.mark.asyncio
+async def test_retry_after_blocks_new_requests():
+    limiter = RateLimiter()
+    limiter.on_rate_limited(retry_after=0.2)
+    start = time.perf_counter()
+    await limiter.acquire()
+
+    assert time.perf_counter() - start >= 0.15
+
+def test_limiters_are_shared_per_api_key():
+    assert get_rate_limiter("chave-a") is get_rate_limiter("chave-a")
+    assert get_rate_limiter("chave-a") is not get_rate_limiter("chave-b")
+
+def test_retry_delay_is_parsed_from_429_body():
+    body = '{"error": {"code": 429, "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "17s"}]}}'
+    with pytest.raises(RateLimitError) as info:
+        GeminiTransport.raise_for_status(429, body)
+    assert info.value.retry_after == 17.0
+    assert GeminiTransport.parse_retry_after("", {"Retry-After": "3"}) == 3.0
+
+@pytest.mark.asyncio
+async def test_gemini_model_reports_429_to_limiter():
+    class ThrottledTransport:
+        async def generate(self, model_name, prompt, generation_config=None):
+            raise RateLimitError("cota excedida", "429", retry_after=1)
+
+    limiter = RateLimiter()
+    model = GeminiModel("chave", transport=ThrottledTransport(), rate_limiter=limiter)
+    with pytest.raises(RateLimitError):
+        await model.generate("olá")
+
+    assert limiter.scale == 0.5
+    assert limiter.blocked_until > time.monotonic()
@@ -0,0 +1,101 @@
+"""
+Testes para a política de novas tentativas e prazos
+"""
+import asyncio
+import time
+
+import pytest
+
+from mangaba_ai.core.models import Agent
+from mangaba_ai.core.retry import RetryPolicy, classify_error, current_deadline
+from mangaba_ai.main import MangabaAI
+from mangaba_ai.utils.config_validator import ConfigValidator
+from mangaba_ai.utils.exceptions import APIError, AuthenticationError, RateLimitError, TimeoutError
+
+def flaky(failures, error):
+    """Cria uma corrotina que falha ``failures`` vezes antes de responder."""
+    attempts = []
+
+    async def call():
+        attempts.append(time.perf_counter())
+        if len(attempts) <= failures:
+            raise error
+        return "ok"
+
+    return call, attempts
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried():
+    call, attempts = flaky(2, APIError("instável", "503"))
+    policy = RetryPolicy(max_retries=3, base_delay=0.01)
+
+    assert await policy.run(call) == "ok"
+    assert len(attempts) == 3
+    assert policy.retries == 2
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [AuthenticationError("chave inválida"), APIError("requisição inválida", "400")])
+async def test_permanent_errors_are_not_retried(error):
+    call, attempts = flaky(1, error)
+    with pytest.raises(type(error)):
+        await RetryPolicy(max_retries=3, base_delay=0.01).run(call)
+    assert len(attempts) == 1
+
+@pytest.mark.asyncio
+async def test_attempt_timeout_is_classified():
+    async def hang():
+        await asyncio.sleep(10)
+
+    with pytest.raises(TimeoutError):
+        await RetryPolicy(max_retries=0, timeout=0.05).run(hang)
+
+@pytest.mark.asyncio
+async def test_retry_after_is_respected():
+    call, attempts = flaky(1, RateLimitError("cota", "429", retry_after=0.2))
+    await RetryPolicy(max_retries=1, base_delay=0.001).run(call)
+
+    assert attempts[1] - attempts[0] >= 0.19
+
+@pytest.mark.asyncio
+async def test_workflow_deadline_stops_retries():
+    async def hang():
+        await asyncio.sleep(10)
+
+    token = current_deadline.set(asyncio.get_running_loop().time() + 0.1)
+    try:
+        start = time.perf_counter()
+        with pytest.raises(TimeoutError):
+            await RetryPolicy(max_retries=5, timeout=1).run(hang)
+    finally:
+        current_deadline.reset(token)
+
+    assert time.perf_counter() - start < 0.5
+
+def test_network_errors_are_classified():
+    assert isinstance(classify_error(ConnectionResetError("reset")), APIError)
+    assert isinstance(classify_error(asyncio.TimeoutError()), TimeoutError)
+
+@pytest.mark.asyncio
+async def test_hung_task_does_not_stall_batch():
+    class Model:
+        async def generate(self, prompt):
+            if "travar" in prompt:
+                await asyncio.sleep(10)
+            return "ok"
+
+    config = ConfigValidator().get_default_config()
+    config["agents"]["task_timeout"] = 1
+    config["workflow"]["timeout"] = 1
+    config["workflow"]["retry_attempts"] = 0
+    mangaba = MangabaAI("chave", config=config)
+    agent = Agent("a", "Agente", Model())
+
+    start = time.perf_counter()
+    results = await mangaba.execute([
+        mangaba.create_task("travar", agent),
+        mangaba.create_task("responder", agent)
+    ])
+
+    assert results["responder"] == "ok"
+    assert results["travar"].startswith("Erro:")
+    assert time.perf_counter() - start < 2
@@ -0,0 +1,103 @@
+"""
+Testes para o runtime de agentes em múltiplos processos
+"""
+import asyncio
+import os
+from collections import Counter
+
+import pytest
+import pytest_asyncio
+
+from mangaba_ai.core.models import Task
+from mangaba_ai.core.runtime import HashRing, ProcessRuntime
+from mangaba_ai.core.scheduler import TaskScheduler
+from mangaba_ai.utils.exceptions import WorkflowError
+
+class PidModel:
+    """Modelo falso que informa o processo em que foi executado."""
+
+    async def generate(self, prompt):
+        await asyncio.sleep(0.01)
+        return f"pid={os.getpid()}"
+
+class CrashingModel:
+    """Modelo falso que derruba o processo de trabalho."""
+
+    async def generate(self, prompt):
+        os._exit(3)
+
+def failing_factory():
+    raise RuntimeError("modelo indisponível")
+
+def test_hash_ring_is_balanced_and_stable():
+    ring = HashRing(range(4))
+    names = [f"agente_{i}" for i in range(2000)]
+    placement = {name: ring.get(name) for name in names}
+
+    assert min(Counter(placement.values()).values()) > 300
+    ring.add(4)
+    moved = sum(placement[name] != ring.get(name) for name in names)
+    assert moved < len(names) * 0.35
+
+@pytest_asyncio.fixture
+async def runtime():
+    runtime = ProcessRuntime(PidModel, workers=2)
+    yield runtime
+    await runtime.stop()
+
+@pytest.mark.asyncio
+async def test_agents_run_in_worker_processes(runtime):
+    agents = [runtime.add_agent(f"agente_{i}", "Agente") for i in range(8)]
+    await runtime.start()
+
+    results = await asyncio.gather(*[agent.execute("tarefa") for agent in agents])
+    pids = {result for result in results}
+
+    assert f"pid={os.getpid()}" not in pids
+    assert len(pids) == len({runtime.worker_of(agent.name) for agent in agents})
+
+@pytest.mark.asyncio
+async def test_remote_agents_work_with_scheduler(runtime):
+    first = runtime.add_agent("pesquisador", "Pesquisador")
+    second = runtime.add_agent("escritor", "Escritor")
+    await runtime.start()
+
+    pesquisa = Task("Pesquisar", first)
+    relatorio = Task("Escrever", second, dependencies=[pesquisa])
+    results = await TaskScheduler().run([pesquisa, relatorio])
+
+    assert all(result.startswith("pid=") for result in results.values())
+
+@pytest.mark.asyncio
+async def test_messages_cross_processes_and_reach_external_mailbox(runtime):
+    names = [f"agente_{i}" for i in range(6)]
+    for name in names:
+        runtime.add_agent(name, "Agente")
+    await runtime.start()
+
+    for name in names:
+        assert await runtime.send_message("usuario", name, "olá")
+
+    messages = []
+    for _ in range(100):
+        messages += await runtime.receive_messages("usuario")
+        if len(messages) == len(names):
+            break
+        await asyncio.sleep(0.05)
+
+    assert sorted(message["sender"] for message in messages) == names
+    assert all(message["hops"] == 1 for message in messages)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("factory", [failing_factory, CrashingModel])
+async def test_tasks_fail_when_worker_process_dies(factory):
+    runtime = ProcessRuntime(factory, workers=1)
+    agent = runtime.add_agent("agente", "Agente")
+    await runtime.start()
+    try:
+        with pytest.raises(WorkflowError, match="encerrou"):
+            await asyncio.wait_for(agent.execute("tarefa"), timeout=30)
+        with pytest.raises(WorkflowError):
+            await agent.execute("outra tarefa")
+    finally:
+        await asyncio.wait_for(runtime.stop(), timeout=30)
@@ -0,0 +1,117 @@
+"""
+Testes para o escalonador de tarefas do Mangaba.AI
+"""
+import asyncio
+import time
+
+import pytest
+
+from mangaba_ai.core.models import Agent, Task
+from mangaba_ai.core.scheduler import TaskScheduler
+from mangaba_ai.main import MangabaAI
+from mangaba_ai.utils.exceptions import WorkflowError
+
+class SlowModel:
+    """Modelo falso que responde após um atraso fixo."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.prompts = []
+
+    async def generate(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.delay)
+        return f"resposta {len(self.prompts)}"
+
+@pytest.fixture
+def model():
+    return SlowModel()
+
+@pytest.fixture
+def agent(model):
+    return Agent(name="tester", role="Testador", model=model, goal="Testar")
+
+@pytest.mark.asyncio
+async def test_independent_tasks_run_concurrently(agent):
+    """Tarefas independentes devem levar o tempo de uma única chamada."""
+    tasks = [Task(description=f"Tarefa {i}", agent=agent) for i in range(5)]
+    start = time.perf_counter()
+    results = await TaskScheduler(max_concurrent_tasks=5).run(tasks)
+    elapsed = time.perf_counter() - start
+
+    assert len(results) == 5
+    assert elapsed < 0.05 * 3
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_is_respected(agent):
+    """Nunca devem existir mais tarefas em execução que o limite configurado."""
+    active = 0
+    peak = 0
+
+    async def execute(task, context=None):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return task
+
+    agent.execute = execute
+    tasks = [Task(description=f"Tarefa {i}", agent=agent) for i in range(10)]
+    await TaskScheduler(max_concurrent_tasks=3).run(tasks)
+    assert peak == 3
+
+@pytest.mark.asyncio
+async def test_dependencies_receive_upstream_results(agent, model):
+    """Tarefas dependentes recebem o resultado das anteriores no prompt."""
+    pesquisa = Task(description="Pesquisar", agent=agent, priority=2)
+    analise = Task(description="Analisar", agent=agent, priority=1, dependencies=[pesquisa])
+
+    results = await TaskScheduler().run([analise, pesquisa])
+
+    assert results[1] == "resposta 1"
+    assert results[0] == "resposta 2"
+    assert "Pesquisar:\nresposta 1" in model.prompts[1]
+
+@pytest.mark.asyncio
+async def test_failed_dependency_skips_downstream(agent):
+    """Uma falha não deve executar as tarefas que dependem dela."""
+    calls = []
+
+    async def execute(task, context=None):
+        calls.append(task)
+        if task == "A":
+            raise RuntimeError("falhou")
+        return task
+
+    agent.execute = execute
+    a = Task(description="A", agent=agent)
+    b = Task(description="B", agent=agent, dependencies=[a])
+    results = await TaskScheduler().run([a, b])
+
+    assert isinstance(results[0], RuntimeError)
+    assert isinstance(results[1], WorkflowError)
+    assert calls == ["A"]
+
+def test_cycle_is_rejected(agent):
+    """Ciclos de dependência devem ser detectados antes da execução."""
+    a = Task(description="A", agent=agent)
+    b = Task(description="B", agent=agent, dependencies=[a])
+    a.dependencies.append(b)
+
+    with pytest.raises(WorkflowError):
+        asyncio.run(TaskScheduler().run([a, b]))
+
+@pytest.mark.asyncio
+async def test_mangaba_execute_scales_with_depth(agent):
+    """O tempo total deve acompanhar a profundidade do grafo."""
+    mangaba = MangabaAI("test-key")
+    roots = [mangaba.create_task(f"Raiz {i}", agent) for i in range(8)]
+    final = mangaba.create_task("Resumo", agent, dependencies=roots)
+
+    start = time.perf_counter()
+    results = await mangaba.execute(roots + [final])
+    elapsed = time.perf_counter() - start
+
+    assert set(results) == {task.description for task in roots + [final]}
+    assert elapsed < 0.05 * 5
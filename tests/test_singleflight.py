@@ -0,0 +1,75 @@
+"""
+Testes para a coalescência de chamadas idênticas
+"""
+import asyncio
+
+import pytest
+
+from mangaba_ai.core.models import GeminiModel
+from mangaba_ai.core.singleflight import SingleFlight
+
+class SlowTransport:
+    """Transporte falso que demora a responder e conta as chamadas."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.calls = 0
+
+    async def generate(self, model_name, prompt, generation_config=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return f"resposta para {len(prompt)} caracteres"
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    results = await asyncio.gather(*[flight.do("k", work) for _ in range(10)])
+
+    assert calls == 1
+    assert [value for value, _ in results] == ["ok"] * 10
+    assert sum(leader for _, leader in results) == 1
+    assert flight.stats() == {"calls": 1, "coalesced": 9, "in_flight": 0}
+
+@pytest.mark.asyncio
+async def test_errors_are_fanned_out_to_every_waiter():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("falhou")
+
+    results = await asyncio.gather(*[flight.do("k", fail) for _ in range(3)], return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+
+@pytest.mark.asyncio
+async def test_shared_call_survives_single_waiter_cancellation():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    first = asyncio.ensure_future(flight.do("k", work))
+    second = asyncio.ensure_future(flight.do("k", work))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == ("ok", False)
+
+@pytest.mark.asyncio
+async def test_gemini_model_coalesces_identical_prompts():
+    model = GeminiModel("chave", transport=SlowTransport())
+    results = await asyncio.gather(*[model.generate("mesmo prompt") for _ in range(20)])
+
+    assert len(set(results)) == 1
+    assert model.transport.calls == 1
+    assert model.singleflight.coalesced == 19
+    assert len(model.mcp.context[model.model_id].turns) == 1
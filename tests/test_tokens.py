@@ -0,0 +1,90 @@
+"""
+Testes da contagem de tokens e do ajuste de prompts à janela do modelo
+"""
+import pytest
+
+from mangaba_ai.core.backends import GeminiBackend, SimulatedBackend
+from mangaba_ai.core.models import Agent, LanguageModel
+from mangaba_ai.core.tokens import (
+    TRUNCATION_MARKER, PromptSegment, TokenCounter, fit_segments, token_usage
+)
+from mangaba_ai.core.transport import GeminiTransport
+from mangaba_ai.utils.exceptions import ModelError
+
+def test_counter_calibrates_with_real_counts():
+    counter = TokenCounter(smoothing=0.5)
+    assert counter.count("x" * 400) == 100
+    counter.calibrate("x" * 400, 200)
+    assert counter.chars_per_token == 3.0
+    assert counter.count("x" * 300) == 100
+    assert TokenCounter(tokenizer=lambda text: len(text.split())).count("um dois três") == 3
+
+def test_gemini_usage_metadata_calibrates_backend():
+    backend = GeminiBackend("chave", transport=GeminiTransport("chave"))
+    backend.transport.on_usage("x" * 400, {"promptTokenCount": 200})
+    assert backend.count_tokens("x" * 400) > 100
+
+def test_fit_drops_lowest_priority_and_truncates():
+    counter = TokenCounter()
+    segments = [
+        PromptSegment("a" * 400, required=True),
+        PromptSegment("b" * 400, priority=1),
+        PromptSegment("c" * 400, priority=0, keep="tail"),
+    ]
+    required, important, history = fit_segments(segments, 180, counter)
+    assert required == segments[0]
+    assert history is None
+    assert important.text.startswith("b") and important.text.endswith(TRUNCATION_MARKER)
+    assert counter.count(required.text) + counter.count(important.text) <= 180
+
+    [history] = fit_segments([segments[2]], 50, counter)
+    assert history.text.startswith(TRUNCATION_MARKER) and history.text.endswith("c")
+
+    with pytest.raises(ModelError):
+        fit_segments(segments, 50, counter)
+
+@pytest.mark.asyncio
+async def test_history_is_reduced_oldest_first():
+    backend = SimulatedBackend(latency=0, context_window=400)
+    model = LanguageModel(backend, model_id="janela", config={"context_fusion": {"max_contexts": 50}})
+    model.generation_config["max_output_tokens"] = 100
+    for i in range(20):
+        model.mcp.update_context("janela", f"pergunta {i} " + "x" * 100, "resposta")
+
+    prompt = await model._fuse("pergunta atual")
+    assert backend.count_tokens(prompt) <= model.max_prompt_tokens
+    assert "pergunta 19" in prompt and "pergunta 0 " not in prompt
+    assert prompt.endswith("considere o contexto anterior ao gerar sua resposta.")
+
+@pytest.mark.asyncio
+async def test_oversized_prompt_fails_before_calling_the_model():
+    backend = SimulatedBackend(latency=0, context_window=200)
+    model = LanguageModel(backend)
+    model.generation_config["max_output_tokens"] = 100
+
+    with pytest.raises(ModelError) as error:
+        await model.generate("x" * 1000)
+    assert error.value.error_code == "context_length"
+    assert backend.calls == 0
+
+@pytest.mark.asyncio
+async def test_agent_truncates_upstream_results_and_reports_usage():
+    backend = SimulatedBackend(latency=0, context_window=600)
+    agent = Agent("contador", "Analista", backend=backend, goal="Resumir")
+    agent.model.generation_config["max_output_tokens"] = 100
+    context = {"Pesquisar": "p" * 2000, "Analisar": "a" * 400}
+    before = token_usage.usage("contador")
+
+    prefix, prompt = agent._split_prompt("Resumir tudo", context)
+    prompt = prefix + prompt
+    assert backend.count_tokens(prompt) <= agent.model.max_prompt_tokens
+    assert "Tarefa atual: Resumir tudo" in prompt
+    assert "- Analisar:\n" + "a" * 400 in prompt
+    assert TRUNCATION_MARKER in prompt or "- Pesquisar" not in prompt
+
+    await agent.execute("Resumir tudo", context)
+    usage = token_usage.usage("contador")
+    assert usage["calls"] - before["calls"] == 1
+    assert usage["completion_tokens"] - before["completion_tokens"] == backend.response_tokens
+    assert usage["dropped_tokens"] > before["dropped_tokens"]
+    assert usage["total_tokens"] == usage["prompt_tokens"] + usage["completion_tokens"]
@@ -0,0 +1,165 @@
+"""
+Testes do rastreamento distribuído
+"""
+import json
+import threading
+
+import pytest
+
+from mangaba_ai.core.a2a_transport import InMemoryTransport
+from mangaba_ai.core.backends import SimulatedBackend
+from mangaba_ai.core.models import Agent
+from mangaba_ai.core.protocols import A2AProtocol
+from mangaba_ai.main import MangabaAI
+from mangaba_ai.utils.context import current_agent
+from mangaba_ai.utils.tracing import (
+    NOOP_SPAN, FileSpanExporter, InMemorySpanExporter, Tracer, _QueuedExporter, extract, tracer
+)
+
+@pytest.fixture
+def exporter():
+    memory = InMemorySpanExporter()
+    tracer.exporters.append(memory)
+    yield memory
+    tracer.exporters.remove(memory)
+
+def spans_by_name(exporter):
+    tracer.flush()
+    by_name = {}
+    for span in exporter.spans:
+        by_name.setdefault(span.name, []).append(span)
+    return by_name
+
+def test_disabled_tracer_records_nothing():
+    local = Tracer()
+    with local.span("x") as span:
+        assert span is NOOP_SPAN
+        assert local.current_traceparent() is None
+
+def test_nested_spans_share_trace_and_link_parents():
+    local = Tracer()
+    memory = InMemorySpanExporter()
+    local.exporters.append(memory)
+    with local.span("pai") as parent:
+        with local.span("filho") as child:
+            assert local.current_traceparent() == child.traceparent
+    with pytest.raises(ValueError):
+        with local.span("falha"):
+            raise ValueError("erro")
+    local.flush()
+
+    child, parent_span, failed = memory.spans
+    assert child.context.trace_id == parent.context.trace_id
+    assert child.parent_id == parent.context.span_id
+    assert parent_span.parent_id is None
+    assert failed.status == "error" and failed.attributes["exception.type"] == "ValueError"
+    assert extract(child.traceparent) == child.context
+
+@pytest.mark.asyncio
+async def test_workflow_spans_form_a_single_trace(exporter):
+    mangaba = MangabaAI(backend=SimulatedBackend(latency=0))
+    researcher = mangaba.create_agent("pesquisador", "Pesquisador", "Pesquisar")
+    writer = mangaba.create_agent("escritor", "Escritor", "Escrever")
+    research = mangaba.create_task("Pesquisar IA", researcher)
+    summary = mangaba.create_task("Resumir", writer, dependencies=[research])
+    await mangaba.execute([research, summary])
+
+    spans = spans_by_name(exporter)
+    [workflow] = spans["workflow"]
+    assert {span.context.trace_id for span in exporter.spans} == {workflow.context.trace_id}
+    tasks = {span.attributes["task.description"]: span for span in spans["task"]}
+    assert tasks["Resumir"].parent_id == workflow.context.span_id
+    assert summary.trace_context == tasks["Resumir"].traceparent
+    assert len(spans["agent.execute"]) == 2
+    assert len(spans["mcp.fuse_context"]) == len(spans["model.call"]) == 2
+    call = spans["model.call"][0]
+    assert call.attributes["tokens.out"] == 32
+    generate = {span.context.span_id: span for span in spans["model.generate"]}
+    assert call.parent_id in generate
+
+@pytest.mark.asyncio
+async def test_trace_follows_a2a_hops_across_nodes(exporter):
+    hub = {}
+    first, second = A2AProtocol(), A2AProtocol()
+    Agent("analista", "Analista", backend=SimulatedBackend(latency=0), a2a=second)
+    await first.connect(InMemoryTransport("no-1", hub), routes={"analista": "no-2"})
+    await second.connect(InMemoryTransport("no-2", hub), routes={"usuario": "no-1"})
+
+    with tracer.span("pedido") as root:
+        await first.send_message("usuario", "analista", "olá")
+    await first.transport.flush()
+    await second.join()
+    [reply] = await first.receive_messages("usuario")
+
+    spans = spans_by_name(exporter)
+    [receive] = spans["a2a.receive"]
+    assert receive.parent_id == root.context.span_id
+    assert receive.context.trace_id == root.context.trace_id
+    assert receive.attributes["a2a.receiver"] == "analista"
+    [execute] = spans["agent.execute"]
+    assert execute.parent_id == receive.context.span_id
+    assert extract(reply["trace"]).trace_id == root.context.trace_id
+    await first.close()
+    await second.close()
+
+def test_file_exporter_writes_in_background_thread(tmp_path):
+    exporter = FileSpanExporter(str(tmp_path / "spans.jsonl"))
+    writers = []
+    write = exporter._write
+    exporter._write = lambda line: (writers.append(threading.current_thread().name), write(line))
+    local = Tracer()
+    local.exporters.append(exporter)
+    for i in range(3):
+        with local.span(f"operacao {i}"):
+            pass
+        local.flush()
+    local.shutdown()
+
+    assert writers == ["mangaba-spans-file"] * 3
+    assert len((tmp_path / "spans.jsonl").read_text().splitlines()) == 3
+
+def test_incomplete_queued_exporter_fails_on_creation():
+    class NoWrite(_QueuedExporter):
+        pass
+
+    with pytest.raises(TypeError, match="_write"):
+        NoWrite()
+
+def test_file_exporter_writes_otlp_json(tmp_path):
+    path = tmp_path / "traces" / "spans.jsonl"
+    local = Tracer(service_name="teste")
+    local.exporters.append(FileSpanExporter(str(path)))
+    with local.span("operacao", {"tentativas": 2, "cache": True}):
+        pass
+    local.flush()
+    local.shutdown()
+
+    [line] = path.read_text().splitlines()
+    resource = json.loads(line)["resourceSpans"][0]
+    assert resource["resource"]["attributes"][0] == {"key": "service.name", "value": {"stringValue": "teste"}}
+    [span] = resource["scopeSpans"][0]["spans"]
+    assert span["name"] == "operacao"
+    assert len(span["traceId"]) == 32 and len(span["spanId"]) == 16
+    assert int(span["endTimeUnixNano"]) >= int(span["startTimeUnixNano"])
+    assert {"key": "tentativas", "value": {"intValue": "2"}} in span["attributes"]
+    assert {"key": "cache", "value": {"boolValue": True}} in span["attributes"]
+
+@pytest.mark.asyncio
+async def test_interrupted_stream_leaves_no_agent_or_span_behind(exporter):
+    agent = Agent("narrador", "Redator", backend=SimulatedBackend(latency=0), goal="Escrever")
+    with tracer.span("cliente") as client:
+        stream = agent.execute_stream("Escrever um texto longo")
+        async for _ in stream:
+            assert current_agent.get() == ""
+            assert tracer.current_traceparent() == client.traceparent
+            break
+        await stream.aclose()
+        assert current_agent.get() == ""
+        assert tracer.current_traceparent() == client.traceparent
+    assert current_agent.get() == ""
+    assert tracer.current_traceparent() is None
+
+    spans = spans_by_name(exporter)
+    [execute] = spans["agent.execute"]
+    assert execute.parent_id == client.context.span_id and execute.status == "error"
+    assert agent.memory.get_history() == []
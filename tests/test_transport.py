@@ -0,0 +1,173 @@
+"""
+Testes para o transporte HTTP assíncrono do Gemini
+"""
+import asyncio
+import json
+import threading
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from mangaba_ai.core.models import Agent, GeminiModel
+from mangaba_ai.core.transport import GeminiTransport
+from mangaba_ai.utils.exceptions import AuthenticationError, RateLimitError
+
+def make_app(delay: float = 0.0, status: int = 200):
+    """Cria um servidor falso com o contrato de ``generateContent``."""
+    state = {"requests": 0, "keys": set(), "bodies": [], "cached": {}}
+
+    async def generate(request):
+        state["requests"] += 1
+        state["keys"].add(request.headers.get("x-goog-api-key"))
+        body = await request.json()
+        state["bodies"].append(body)
+        await asyncio.sleep(delay)
+        if status != 200:
+            return web.json_response({"error": {"code": status}}, status=status)
+        text = body["contents"][0]["parts"][0]["text"]
+        return web.json_response({
+            "candidates": [{"content": {"parts": [{"text": "eco: "}, {"text": text}]}}],
+            "usageMetadata": {"topK": body.get("generationConfig", {}).get("topK")}
+        })
+
+    async def stream(request):
+        state["requests"] += 1
+        assert request.query.get("alt") == "sse"
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for word in ["um ", "dois ", "três"]:
+            payload = json.dumps({"candidates": [{"content": {"parts": [{"text": word}]}}]})
+            await response.write(f"data: {payload}\r\n\r\n".encode())
+            await asyncio.sleep(delay)
+        await response.write(b'data: {"usageMetadata": {}}\r\n\r\n')
+        await response.write_eof()
+        return response
+
+    async def create_cached(request):
+        body = await request.json()
+        name = f"cachedContents/c{len(state['cached'])}"
+        state["cached"][name] = body
+        return web.json_response({"name": name, "model": body["model"]})
+
+    async def delete_cached(request):
+        state["cached"].pop(f"cachedContents/{request.match_info['id']}")
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post("/models/{name}:generateContent", generate)
+    app.router.add_post("/models/{name}:streamGenerateContent", stream)
+    app.router.add_post("/cachedContents", create_cached)
+    app.router.add_delete("/cachedContents/{id}", delete_cached)
+    return app, state
+
+@pytest.mark.asyncio
+async def test_generate_round_trip():
+    app, state = make_app()
+    async with TestServer(app) as server:
+        transport = GeminiTransport("chave", base_url=str(server.make_url("")))
+        text = await transport.generate("gemini", "olá", {"top_k": 40})
+        await transport.close()
+
+    assert text == "eco: olá"
+    assert state["keys"] == {"chave"}
+
+@pytest.mark.asyncio
+async def test_concurrent_generations_do_not_use_threads():
+    app, state = make_app(delay=0.1)
+    async with TestServer(app) as server:
+        transport = GeminiTransport("chave", base_url=str(server.make_url("")))
+        threads_before = threading.active_count()
+        start = asyncio.get_running_loop().time()
+        results = await asyncio.gather(*[transport.generate("gemini", f"p{i}") for i in range(200)])
+        elapsed = asyncio.get_running_loop().time() - start
+        threads_after = threading.active_count()
+        await transport.close()
+
+    assert len(results) == 200
+    assert elapsed < 2.0
+    assert threads_after <= threads_before
+
+@pytest.mark.asyncio
+async def test_generation_can_be_cancelled():
+    app, _ = make_app(delay=5)
+    async with TestServer(app) as server:
+        transport = GeminiTransport("chave", base_url=str(server.make_url("")))
+        call = asyncio.ensure_future(transport.generate("gemini", "lento"))
+        await asyncio.sleep(0.05)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        await transport.close()
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status, error", [(429, RateLimitError), (403, AuthenticationError)])
+async def test_http_errors_are_classified(status, error):
+    app, _ = make_app(status=status)
+    async with TestServer(app) as server:
+        transport = GeminiTransport("chave", base_url=str(server.make_url("")))
+        with pytest.raises(error):
+            await transport.generate("gemini", "olá")
+        await transport.close()
+
+@pytest.mark.asyncio
+async def test_gemini_model_uses_transport():
+    app, state = make_app()
+    async with TestServer(app) as server:
+        transport = GeminiTransport("chave", base_url=str(server.make_url("")))
+        model = GeminiModel("chave", transport=transport)
+        assert await model.generate("olá") == "eco: olá"
+        await model.close()
+
+    assert state["requests"] == 1
+
+@pytest.mark.asyncio
+async def test_long_agent_preamble_is_sent_once_as_cached_content():
+    app, state = make_app()
+    async with TestServer(app) as server:
+        transport = GeminiTransport("chave", base_url=str(server.make_url("")))
+        model = GeminiModel("chave", transport=transport)
+        agent = Agent("revisor", "Revisor", model=model, goal="Revisar conforme o manual: " + "regra " * 1000)
+        await agent.execute("revisar capítulo 1")
+        await agent.execute("revisar capítulo 2")
+        [(name, cached)] = state["cached"].items()
+        await model.close()
+
+    assert cached["model"] == f"models/{model.model_name}"
+    assert cached["systemInstruction"]["parts"][0]["text"] == agent.preamble
+    for body in state["bodies"]:
+        assert body["cachedContent"] == name
+        assert "regra" not in body["contents"][0]["parts"][0]["text"]
+    assert state["cached"] == {}
+
+@pytest.mark.asyncio
+async def test_stream_yields_chunks_before_completion():
+    app, _ = make_app(delay=0.2)
+    async with TestServer(app) as server:
+        transport = GeminiTransport("chave", base_url=str(server.make_url("")))
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        chunks = []
+        first_chunk_at = None
+        async for chunk in transport.stream("gemini", "conte"):
+            first_chunk_at = first_chunk_at or loop.time() - start
+            chunks.append(chunk)
+        total = loop.time() - start
+        await transport.close()
+
+    assert chunks == ["um ", "dois ", "três"]
+    assert first_chunk_at < total / 2
+
+@pytest.mark.asyncio
+async def test_agent_stream_records_full_text_in_context():
+    app, _ = make_app()
+    async with TestServer(app) as server:
+        transport = GeminiTransport("chave", base_url=str(server.make_url("")))
+        model = GeminiModel("chave", transport=transport)
+        agent = Agent(name="narrador", role="Narrador", model=model)
+        chunks = [chunk async for chunk in agent.execute_stream("conte até três")]
+        await model.close()
+
+    assert "".join(chunks) == "um dois três"
+    assert "Resposta: um dois três" in model.mcp.get_context(model.model_id)
+    assert len(model.mcp.context[model.model_id].turns) == 1
@@ -0,0 +1,106 @@
+"""
+Testes da memória vetorial e da recuperação de contexto relevante
+"""
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from mangaba_ai.core.backends import SimulatedBackend
+from mangaba_ai.core.models import LanguageModel
+from mangaba_ai.core.protocols import MCPProtocol
+from mangaba_ai.core.vector_memory import HashingEmbedder, VectorMemory
+
+def random_embedder(dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = {}
+
+    def embed(texts):
+        return np.stack([vectors.setdefault(text, rng.standard_normal(dim)) for text in texts])
+
+    return embed
+
+def test_similar_texts_are_retrieved_first():
+    memory = VectorMemory()
+    memory.add_many([
+        "O mercado de energia solar cresceu em 2023",
+        "Receita de bolo de cenoura com cobertura de chocolate",
+        "Painéis solares ficaram mais baratos no Brasil",
+    ])
+    [first, second] = memory.search("energia solar no Brasil", k=2)
+    assert {first.text, second.text} == {
+        "O mercado de energia solar cresceu em 2023", "Painéis solares ficaram mais baratos no Brasil"
+    }
+    assert first.score >= second.score
+    assert memory.search("chocolate", k=1, min_score=0.99) == []
+
+def test_top_k_matches_exact_ranking():
+    embed = random_embedder()
+    memory = VectorMemory(embed, initial_capacity=4)
+    texts = [f"memória {i}" for i in range(500)]
+    memory.add_many(texts)
+    vectors = embed(texts)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    queries = [f"memória {i}" for i in (3, 250)]
+    for query, matches in zip(queries, memory.search_many(queries, k=10)):
+        query_vector = vectors[texts.index(query)]
+        expected = [texts[i] for i in np.argsort(-(vectors @ query_vector))[:10]]
+        assert [match.text for match in matches] == expected
+        assert matches[0].score == pytest.approx(1.0, abs=1e-5)
+
+def test_deletes_keep_matrix_consistent():
+    memory = VectorMemory(random_embedder(), max_size=3)
+    ids = memory.add_many(["a", "b", "c"])
+    assert memory.delete(ids[0]) and not memory.delete(ids[0])
+    assert [match.text for match in memory.search("c", k=1)] == ["c"]
+    memory.add("d")
+    memory.add("e")
+    assert len(memory) == 3 and ids[1] not in memory
+    assert {match.text for match in memory.search("c", k=5)} == {"c", "d", "e"}
+    assert memory.add("c", memory_id=ids[2]) == ids[2] and len(memory) == 3
+
+def test_hashing_embedder_is_deterministic():
+    embedder = HashingEmbedder(dim=64)
+    first, second = embedder(["agentes autônomos", "agentes autônomos"])
+    assert first.shape == (64,) and np.array_equal(first, second) and first.any()
+
+@pytest.mark.asyncio
+async def test_mcp_fuses_only_relevant_turns():
+    mcp = MCPProtocol(retrieval_k=2, max_contexts=100)
+    mcp.update_context("m", "Qual a capital da França?", "Paris")
+    for i in range(50):
+        mcp.update_context("m", f"Conte a piada número {i}", "haha")
+    mcp.update_context("m", "Qual a população da França?", "68 milhões")
+
+    fused = await mcp.fuse_context("Fale sobre a França", "m")
+    assert "Paris" in fused and "68 milhões" in fused
+    assert fused.index("Paris") < fused.index("68 milhões")
+    assert "piada" not in fused
+
+    mcp.clear_context("m")
+    assert await mcp.fuse_context("Fale sobre a França", "m") == "Fale sobre a França"
+
+@pytest.mark.asyncio
+async def test_model_reads_retrieval_settings_from_config():
+    config = {"context_fusion": {"retrieval_k": 3, "retrieval_max_memories": 10}}
+    model = LanguageModel(SimulatedBackend(latency=0), config=config)
+    for i in range(20):
+        await model.generate(f"pergunta {i}")
+    assert model.mcp.retrieval_k == 3
+    assert len(model.mcp.memories[model.model_id]) == 10
+
+def test_search_is_fast_for_tens_of_thousands_of_memories():
+    rng = np.random.default_rng(1)
+    matrix = rng.standard_normal((20000, 256)).astype(np.float32)
+    memory = VectorMemory(lambda texts: matrix[[int(text) for text in texts]])
+    memory.add_many([str(i) for i in range(20000)])
+
+    samples = []
+    for i in range(20):
+        start = time.perf_counter()
+        memory.search(str(i), k=10)
+        samples.append(time.perf_counter() - start)
+    # Folga para máquinas lentas; tipicamente bem abaixo de 1ms
+    assert sorted(samples)[len(samples) // 2] < 0.02